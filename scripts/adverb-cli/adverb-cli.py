@@ -6,6 +6,8 @@
 # * Process large files that cause web server timeouts.
 # * Automatically detect AMQP ports, or not.
 #   CLI switch disables autodetect to scan for 5672 only.
+# * Watch a live interface with --live. The html summary file is
+#   rewritten every few seconds and reloads itself in the browser.
 #
 # A pcapng file created during a run of qpid dispatch router self
 # test is processed by this script. The file sizes of each stage are:
@@ -41,6 +43,26 @@ class ExitStatus(Exception):
     """Raised if a command wants a non-0 exit status from the script"""
     def __init__(self, status): self.status = status
 
+#
+#
+def live_main_except(argv):
+    """Given an interface name, capture and analyze AMQP until interrupted"""
+    usagestr = 'Usage: %s --live interface [amqp-ports [html-file-name [refresh-seconds]]]' % argv[0]
+    if len(argv) < 3:
+        sys.exit(usagestr)
+
+    interface = argv[2]
+    portlist = argv[3].split(",") if len(argv) > 3 else ["5672"]
+    live_html_file = argv[4] if len(argv) > 4 else "adverb-live.html"
+    refresh_seconds = int(argv[5]) if len(argv) > 5 else 5
+
+    sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), os.pardir))
+    import adverb_live
+
+    print "Capturing on %s, AMQP ports %s" % (interface, portlist)
+    print "Open file://" + os.path.abspath(live_html_file) + " to view the analysis. Ctrl-C to stop."
+    adverb_live.run_live(interface, live_html_file, portlist, refresh_seconds)
+
 #
 #
 def main_except(argv):
@@ -51,11 +73,22 @@ def main_except(argv):
 
     if (sys.argv[1].startswith("-h") or sys.argv[1].startswith("--help")):
         print usagestr
+        print '       %s --live interface [amqp-ports [html-file-name [refresh-seconds]]]' % sys.argv[0]
         print
         print ' pcapng-file-name - required path to pcapng file'
         print ' autodetect-amqp-ports - optional switch whose presence disables autodetect.'
+        print
+        print ' --live - capture on a network interface instead of reading a file'
+        print ' interface - tshark capture interface name'
+        print ' amqp-ports - comma separated AMQP ports, default 5672'
+        print ' html-file-name - summary file rewritten while capturing, default adverb-live.html'
+        print ' refresh-seconds - summary rewrite interval, default 5'
         sys.exit(' ')
 
+    if sys.argv[1] == "--live":
+        live_main_except(sys.argv)
+        return
+
     arg_pcapng_file = sys.argv[1]
     enable_autodetect = (len(sys.argv) == 2)
 
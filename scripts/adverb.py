@@ -75,11 +75,15 @@
 # </div>
 # </div>
 
+import collections
+import hashlib
 import sys
 import xml.etree.ElementTree as ET
 import time
 import os
 import traceback
+from array import array
+import adverb_profile
 from adverb_name_shortener import *
 from adverb_strings import *
 
@@ -142,6 +146,79 @@ def colorize_bg(pattern):
         pattern_bg_color_map[pattern] = bg_color_of(pattern_bg_color_list.index(pattern))
     return "<span style=\"background-color:%s\">%s</span>" % (pattern_bg_color_map[pattern], pattern)
 
+#
+# Frame histories
+# Connection, session, and link details normally keep every frame they see.
+# A live capture never ends so it sets a history depth and then each
+# history is a ring buffer holding only the most recent frames. Session
+# dispositions likewise keep only the most recent delivery ids.
+frame_history_depth = None
+def new_frame_history():
+    '''
+    :return: an empty list, or a bounded deque if frame_history_depth is set
+    '''
+    if frame_history_depth is None:
+        return []
+    return collections.deque(maxlen=frame_history_depth)
+
+class DispositionHistory(collections.OrderedDict):
+    '''
+    Dispositions by delivery id that forgets the oldest delivery ids
+    once it holds more than depth of them
+    '''
+    def __init__(self, depth):
+        collections.OrderedDict.__init__(self)
+        self.depth = depth
+
+    def __setitem__(self, key, value):
+        collections.OrderedDict.__setitem__(self, key, value)
+        if len(self) > self.depth:
+            self.popitem(last=False)
+
+def new_disposition_history():
+    '''
+    :return: an empty dict, or a DispositionHistory if frame_history_depth is set
+    '''
+    if frame_history_depth is None:
+        return {}
+    return DispositionHistory(frame_history_depth)
+
+def credit_typecode():
+    '''
+    AMQP link credit is a uint32 and transfers can overdraw it below zero.
+    'q' is 64 bits where it exists. Python2 has only 'l', which is 64 bits
+    on LP64 systems. Elsewhere credit is kept in doubles, exact to 2**53.
+    :return: array typecode that holds any link credit value
+    '''
+    for code in ('q', 'l'):
+        try:
+            if array(code).itemsize >= 8:
+                return code
+        except ValueError:
+            pass
+    return 'd'
+
+CREDIT_TYPECODE = credit_typecode()
+
+def new_value_history(typecode):
+    '''
+    :param typecode: array typecode, CREDIT_TYPECODE or 'd'
+    :return: an empty typed array, or a bounded deque if frame_history_depth is set
+    '''
+    if frame_history_depth is None:
+        return array(typecode)
+    return collections.deque(maxlen=frame_history_depth)
+
+#
+# Pipeline stages
+# main_except announces each stage as it starts: parse, classify,
+# discover, and render. Benchmark and profiling tools set stage_callback
+# to a function of the stage name; None marks the end of the run.
+stage_callback = None
+def begin_stage(name):
+    if stage_callback is not None:
+        stage_callback(name)
+
 #
 # Globals
 #
@@ -262,7 +339,8 @@ class PerformativeInfo():
         self.settled = ""          # Disposition or Transfer settled field
         self.snd_settle_mode = ""  # Attach
         self.rcv_settle_mode = ""  # Attach
-        self.transfer_data = ""    # dehexified transfer data value
+        self.transfer_data = ""    # dehexified transfer data value, maybe shortened
+        self.transfer_digest = ""  # digest of the transfer data
 
     def __repr__(self):
         return self._representation()
@@ -289,6 +367,7 @@ class PerformativeInfo():
         all_lines.append("last : '%s'" % self.last)
         all_lines.append("settled : '%s'" % self.settled)
         all_lines.append("transfer_data : '%s'" % self.transfer_data)
+        all_lines.append("transfer_digest : '%s'" % self.transfer_digest)
         return ('\n'.join(all_lines))
 
     def isConsecutiveTransfer(self, candidate):
@@ -337,7 +416,7 @@ class ConnectionDetail():
 
         # count of AMQP performatives for this connection that are not accounted
         # properly in session and link processing
-        self.unaccounted_frame_proto_list = []
+        self.unaccounted_frame_proto_list = new_frame_history()
 
     def FindSession(self, channel, dst_is_broker):
         '''
@@ -403,8 +482,8 @@ class SessionDetail():
         # links for example
         self.seq_no = 0
 
-        self.frame_list = []
-        self.frame_proto_list = []
+        self.frame_list = new_frame_history()
+        self.frame_proto_list = new_frame_history()
 
         # link_list holds LinkDetail records
         # Links for a session are identified by the client-to-broker and
@@ -423,15 +502,15 @@ class SessionDetail():
 
         # count of AMQP performatives for this connection that are not accounted
         # properly in link processing
-        self.unaccounted_frame_proto_list = []
+        self.unaccounted_frame_proto_list = new_frame_history()
 
         # Session dispositions
         # dict[delivery-id] = ['disp info 0', 'disp info 1', ...]
-        self.dispositions_l2r = {} # client to broker
-        self.dispositions_r2l = {} # broker to client
+        self.dispositions_l2r = new_disposition_history() # client to broker
+        self.dispositions_r2l = new_disposition_history() # broker to client
         # summary is appended to transfer display lines
-        self.disposition_summary_l2r = {} # client to broker
-        self.disposition_summary_r2l = {} # broker to client
+        self.disposition_summary_l2r = new_disposition_history() # client to broker
+        self.disposition_summary_r2l = new_disposition_history() # broker to client
 
     def FrameCount(self):
         count = 0
@@ -536,22 +615,19 @@ class LinkDetail():
         self.receiver_source = "none"
         self.sender_target = "none"
 
-        self.frame_list = []
-        self.frame_proto_list = []
+        self.frame_list = new_frame_history()
+        self.frame_proto_list = new_frame_history()
 
         # account for credit. History[n] holds credit after processing frame n
+        # and times[n] holds the relative time of frame n
         self.link_credit = 0
-        self.link_credit_history = []
+        self.link_credit_history = new_value_history(CREDIT_TYPECODE)
+        self.link_credit_times = new_value_history('d')
 
         self.credit_went_zero_events = 0
         self.credit_went_negative_events = 0
         self.message_aborted_events = 0
 
-        self.credit_timing_in_progress = False
-        self.credit_timer = 0.0 # running with non-zero
-        self.time_with_no_credit = 0.0
-        self.time_with_credit = 0.0
-
     def GetId(self):
         return self.session_detail.GetId() + "_" + str(self.session_seq)
 
@@ -564,9 +640,50 @@ class LinkDetail():
     def GetLinkEventCount(self):
         return self.credit_went_zero_events + self.credit_went_negative_events + self.message_aborted_events
 
+    def RecordCredit(self, frame_time):
+        self.link_credit_history.append(self.link_credit)
+        self.link_credit_times.append(frame_time)
+
+    def GetCreditTimeline(self):
+        return CreditTimeline(self.link_credit_history, self.link_credit_times)
+
+class CreditTimeline():
+    '''
+    Summary of a link's credit history.
+    Time is counted from the first credit grant to the last frame on the link.
+    A stall is a run of frames during which the link has no credit.
+    '''
+    def __init__(self, credits, times):
+        self.time_with_credit = 0.0
+        self.time_with_no_credit = 0.0
+        self.stall_episodes = 0
+        self.longest_stall = 0.0
+
+        started = False
+        prev_credit = 0
+        prev_time = 0.0
+        stall_start = 0.0
+        for credit, t in zip(credits, times):
+            if started:
+                if prev_credit > 0:
+                    self.time_with_credit += t - prev_time
+                    if credit <= 0:
+                        self.stall_episodes += 1
+                        stall_start = t
+                else:
+                    self.time_with_no_credit += t - prev_time
+                    if credit > 0:
+                        self.longest_stall = max(self.longest_stall, t - stall_start)
+            elif credit > 0:
+                started = True
+            prev_credit = credit
+            prev_time = t
+        if started and prev_credit <= 0:
+            self.longest_stall = max(self.longest_stall, prev_time - stall_start)
+
 short_link_names = ShortNames("link")
 short_endp_names = ShortNames("endpoint")
-short_data_names = ShortNames("message_data")
+short_data_names = DigestShortNames("message_data")
 
 #
 #
@@ -884,443 +1001,421 @@ def safe_field_attr_extract(object, fieldname, attrname, default):
         pass
     return res
 
-def amqp_discover_inner_workings(frames, conn_details_map, global_vars):
+def amqp_discover_frame(frame, conn_details, global_vars):
     '''
-    Follow connections, sessions, and links to discover details
-    :param frames: the amqp packets
-    :param conn_details_map: storage for details
+    Follow one frame's connection, session, and link state changes.
+    The connection state is kept entirely in conn_details so frames may be
+    fed one at a time as they arrive.
+    :param frame: an amqp packet
+    :param conn_details: the ConnectionDetail for the frame's connection
     :return: None
     '''
-    for frame in frames:
-        cid = connection_id(frame, global_vars)
-        conn_details = conn_details_map[cid]
-        assert conn_details is not None, "can't find connection details"
-        f_id = frame_id(frame)  # f123
-        f_idc = f_id + "c"  # f123c - frame's contents
-        dst_is_broker = connection_dst_is_broker(frame, global_vars)
-        protos = frame.findall('proto')
-        proto_index = 0
-        for proto in protos:
-            if proto.get("name") == "amqp":
-                proto_id = f_idc + str(proto_index) + "d"
-                proto_index += 1
-                pname = get_performative_name(proto)
-                if pname == 'none' or pname == 'open' or pname == 'close':
-                    # not all protos have a channel and these we don't care about
-                    conn_details.unaccounted_frame_proto_list.append((frame, proto))
-                    continue
-
-                channel = proto.find("./field[@name='amqp.channel']").get("show")
-                assert channel is not None and len(channel) > 0, "amqp proto must have a channel"
-                args = proto.find("./field[@name='amqp.method.arguments']")
-                frame_time = float(frame_time_relative(frame))
-                if pname == 'begin':
-                    # session establishment
-                    remote = args.find("./field[@name='amqp.performative.arguments.remoteChannel']")
-                    remote = field_show_value_or_null(remote)
-                    if remote == 'null':
-                        # Creating a new session from scratch
-                        ns = SessionDetail(conn_details, conn_details.GetSeqNo(), frame_time_relative(frame))
-                        conn_details.session_list.append(ns)
+    assert conn_details is not None, "can't find connection details"
+    f_id = frame_id(frame)  # f123
+    f_idc = f_id + "c"  # f123c - frame's contents
+    dst_is_broker = connection_dst_is_broker(frame, global_vars)
+    protos = frame.findall('proto')
+    proto_index = 0
+    for proto in protos:
+        if proto.get("name") == "amqp":
+            proto_id = f_idc + str(proto_index) + "d"
+            proto_index += 1
+            pname = get_performative_name(proto)
+            if pname == 'none' or pname == 'open' or pname == 'close':
+                # not all protos have a channel and these we don't care about
+                conn_details.unaccounted_frame_proto_list.append((frame, proto))
+                continue
+
+            channel = proto.find("./field[@name='amqp.channel']").get("show")
+            assert channel is not None and len(channel) > 0, "amqp proto must have a channel"
+            args = proto.find("./field[@name='amqp.method.arguments']")
+            frame_time = float(frame_time_relative(frame))
+            if pname == 'begin':
+                # session establishment
+                remote = args.find("./field[@name='amqp.performative.arguments.remoteChannel']")
+                remote = field_show_value_or_null(remote)
+                if remote == 'null':
+                    # Creating a new session from scratch
+                    ns = SessionDetail(conn_details, conn_details.GetSeqNo(), frame_time_relative(frame))
+                    conn_details.session_list.append(ns)
 
+                    if dst_is_broker:
+                        # client is creating a new session
+                        conn_details.EndClientChannel(channel)
+                        conn_details.client_to_broker_chan_map[channel] = ns
+                        ns.client_chan = channel
+                        ns.originated_by_client = True
+                    else:
+                        # broker is creating a new session
+                        conn_details.EndBrokerChannel(channel)
+                        conn_details.broker_to_client_chan_map[channel] = ns
+                        ns.broker_chan = channel
+                        ns.originated_by_client = False
+                else:
+                    # Second half of session creation. Completes a pending session.
+                    ns = conn_details.FindSession(remote, not dst_is_broker)
+                    if not ns is None:
                         if dst_is_broker:
-                            # client is creating a new session
-                            conn_details.EndClientChannel(channel)
-                            conn_details.client_to_broker_chan_map[channel] = ns
+                            # Client is completing session created by broker
                             ns.client_chan = channel
-                            ns.originated_by_client = True
+                            conn_details.client_to_broker_chan_map[channel] = ns
                         else:
-                            # broker is creating a new session
-                            conn_details.EndBrokerChannel(channel)
-                            conn_details.broker_to_client_chan_map[channel] = ns
+                            # Broker is completing session created by client
                             ns.broker_chan = channel
-                            ns.originated_by_client = False
+                            conn_details.broker_to_client_chan_map[channel] = ns
                     else:
-                        # Second half of session creation. Completes a pending session.
-                        ns = conn_details.FindSession(remote, not dst_is_broker)
-                        if not ns is None:
-                            if dst_is_broker:
-                                # Client is completing session created by broker
-                                ns.client_chan = channel
-                                conn_details.client_to_broker_chan_map[channel] = ns
-                            else:
-                                # Broker is completing session created by client
-                                ns.broker_chan = channel
-                                conn_details.broker_to_client_chan_map[channel] = ns
+                        # peer's channel does not exist. Create a new session and supply both channels
+                        ns = SessionDetail(conn_details, conn_details.GetSeqNo(), frame_time_relative(frame))
+                        if dst_is_broker:
+                            ns.client_chan = channel
+                            ns.broker_chan = remote
+                            conn_details.client_to_broker_chan_map[channel] = ns
+                            conn_details.broker_to_client_chan_map[remote] = ns
                         else:
-                            # peer's channel does not exist. Create a new session and supply both channels
-                            ns = SessionDetail(conn_details, conn_details.GetSeqNo(), frame_time_relative(frame))
-                            if dst_is_broker:
-                                ns.client_chan = channel
-                                ns.broker_chan = remote
-                                conn_details.client_to_broker_chan_map[channel] = ns
-                                conn_details.broker_to_client_chan_map[remote] = ns
-                            else:
-                                ns.broker_chan = channel
-                                ns.client_chan = remote
-                                conn_details.client_to_broker_chan_map[channel] = ns
-                                conn_details.client_to_broker_chan_map[remote] = ns
+                            ns.broker_chan = channel
+                            ns.client_chan = remote
+                            conn_details.client_to_broker_chan_map[channel] = ns
+                            conn_details.client_to_broker_chan_map[remote] = ns
 
+                if frame not in ns.frame_list:
+                    ns.frame_list.append(frame)
+                ns.frame_proto_list.append((frame, proto))
+                ns.time_end = frame_time_relative(frame)
+
+            elif pname == 'end':
+                # session teardown
+                ns = conn_details.FindSession(channel, dst_is_broker)
+                if not ns is None:
+                    if dst_is_broker:
+                        conn_details.EndClientChannel(channel)
+                    else:
+                        conn_details.EndBrokerChannel(channel)
                     if frame not in ns.frame_list:
                         ns.frame_list.append(frame)
-                    ns.frame_proto_list.append((frame, proto))
+                    ns.frame_proto_list.append((frame,proto))
                     ns.time_end = frame_time_relative(frame)
+                else:
+                    # an End with no session
+                    conn_details.unaccounted_frame_proto_list.append((frame, proto))
 
-                elif pname == 'end':
-                    # session teardown
-                    ns = conn_details.FindSession(channel, dst_is_broker)
-                    if not ns is None:
-                        if dst_is_broker:
-                            conn_details.EndClientChannel(channel)
-                        else:
-                            conn_details.EndBrokerChannel(channel)
-                        if frame not in ns.frame_list:
-                            ns.frame_list.append(frame)
-                        ns.frame_proto_list.append((frame,proto))
-                        ns.time_end = frame_time_relative(frame)
+            elif pname == 'attach':
+                # link establishment
+                # Find the session
+                ns = conn_details.FindSession(channel, dst_is_broker)
+                if ns is None:
+                    conn_details.unaccounted_frame_proto_list.append((frame, proto))
+                    continue
+
+                pi = amqp_decode(proto, global_vars)
+                args = proto.find("./field[@name='amqp.method.arguments']")
+
+                link_name_field = args.find("./field[@name='amqp.performative.arguments.name']")
+                assert link_name_field is not None, "Link name is required"
+                link_name = extract_name(link_name_field.get('showname'))
+
+                handle_field = args.find("./field[@name='amqp.performative.arguments.handle']")
+                assert handle_field is not None, "Link handle is required"
+                handle = handle_field.get('show')
+
+                role_field = args.find("./field[@name='amqp.performative.arguments.role']")
+                assert role_field is not None, "Link role is required"
+                role_is_receiver = role_field.get('value') == '41'
+
+                source = "undefined"
+                target = "undefined"
+                if role_is_receiver:
+                    source_field = args.find("./field[@name='amqp.performative.arguments.source']")
+                    if source_field is not None: # "Source required for receiver"?
+                        address_field = source_field.find("./field[@name='amqp.performative.arguments.address.string']")
+                        source = address_field.get('show') if address_field is not None else "none"
+                else:
+                    target_field = args.find("./field[@name='amqp.performative.arguments.target']")
+                    if target_field is not None: # "Target required for sender"?
+                        address_field = target_field.find("./field[@name='amqp.performative.arguments.address.string']")
+                        target = address_field.get('show') if address_field is not None else "none"
+
+                nl = ns.FindLinkByName(link_name)
+                if nl is None:
+                    # Creating a new link from scratch resulting in a half attached link
+                    nl = LinkDetail(ns, ns.GetSeqNo(), link_name, frame_time_relative(frame))
+                    ns.link_list.append(nl)
+                    ns.link_name_to_detail_map[link_name] = nl
+
+                    if dst_is_broker:
+                        # client is creating a new link
+                        ns.DetachClientHandle(handle)
+                        ns.client_to_broker_link_map[handle] = nl
+                        nl.client_handle = handle
+                        nl.originated_by_client = True
+                        nl.originator_is_receiver = role_is_receiver
                     else:
-                        # an End with no session
-                        conn_details.unaccounted_frame_proto_list.append((frame, proto))
-
-                elif pname == 'attach':
-                    # link establishment
-                    # Find the session
-                    ns = conn_details.FindSession(channel, dst_is_broker)
-                    if ns is None:
-                        conn_details.unaccounted_frame_proto_list.append((frame, proto))
-                        continue
-
-                    pi = amqp_decode(proto, global_vars)
-                    args = proto.find("./field[@name='amqp.method.arguments']")
-
-                    link_name_field = args.find("./field[@name='amqp.performative.arguments.name']")
-                    assert link_name_field is not None, "Link name is required"
-                    link_name = extract_name(link_name_field.get('showname'))
-
-                    handle_field = args.find("./field[@name='amqp.performative.arguments.handle']")
-                    assert handle_field is not None, "Link handle is required"
-                    handle = handle_field.get('show')
-
-                    role_field = args.find("./field[@name='amqp.performative.arguments.role']")
-                    assert role_field is not None, "Link role is required"
-                    role_is_receiver = role_field.get('value') == '41'
-
-                    source = "undefined"
-                    target = "undefined"
-                    if role_is_receiver:
-                        source_field = args.find("./field[@name='amqp.performative.arguments.source']")
-                        if source_field is not None: # "Source required for receiver"?
-                            address_field = source_field.find("./field[@name='amqp.performative.arguments.address.string']")
-                            source = address_field.get('show') if address_field is not None else "none"
+                        # broker is creating a new link
+                        ns.DetachBrokerHandle(handle)
+                        ns.broker_to_client_link_map[handle] = nl
+                        nl.broker_handle = handle
+                        nl.originated_by_client = False
+                        nl.originator_is_receiver = role_is_receiver
+
+                    nl.receiver_source = source
+                    nl.sender_target = target
+                    # link creator sets settle modes?
+                    # sender link creator sets definitive snd mode, begs for rcv mode
+                    #   peer link creator does best effort for other half
+                    # these are the proposed settle modes
+                    nl.rcv_settle_mode = pi.rcv_settle_mode
+                    nl.snd_settle_mode = pi.snd_settle_mode
+
+                else:
+                    if dst_is_broker:
+                        ns.client_to_broker_link_map[handle] = nl
+                        nl.client_handle = handle
                     else:
-                        target_field = args.find("./field[@name='amqp.performative.arguments.target']")
-                        if target_field is not None: # "Target required for sender"?
-                            address_field = target_field.find("./field[@name='amqp.performative.arguments.address.string']")
-                            target = address_field.get('show') if address_field is not None else "none"
-
-                    nl = ns.FindLinkByName(link_name)
-                    if nl is None:
-                        # Creating a new link from scratch resulting in a half attached link
-                        nl = LinkDetail(ns, ns.GetSeqNo(), link_name, frame_time_relative(frame))
-                        ns.link_list.append(nl)
-                        ns.link_name_to_detail_map[link_name] = nl
+                        ns.broker_to_client_link_map[handle] = nl
+                        nl.broker_handle = handle
 
-                        if dst_is_broker:
-                            # client is creating a new link
-                            ns.DetachClientHandle(handle)
-                            ns.client_to_broker_link_map[handle] = nl
-                            nl.client_handle = handle
-                            nl.originated_by_client = True
-                            nl.originator_is_receiver = role_is_receiver
+                    if role_is_receiver:
+                        if nl.snd_settle_mode != pi.snd_settle_mode:
+                            nl.snd_settle_mode += ' (modified?)'
+                        if nl.rcv_settle_mode == pi.rcv_settle_mode:
+                            nl.rcv_settle_mode = pi.rcv_settle_mode
                         else:
-                            # broker is creating a new link
-                            ns.DetachBrokerHandle(handle)
-                            ns.broker_to_client_link_map[handle] = nl
-                            nl.broker_handle = handle
-                            nl.originated_by_client = False
-                            nl.originator_is_receiver = role_is_receiver
-
-                        nl.receiver_source = source
-                        nl.sender_target = target
-                        # link creator sets settle modes?
-                        # sender link creator sets definitive snd mode, begs for rcv mode
-                        #   peer link creator does best effort for other half
-                        # these are the proposed settle modes
-                        nl.rcv_settle_mode = pi.rcv_settle_mode
-                        nl.snd_settle_mode = pi.snd_settle_mode
-
+                            nl.rcv_settle_mode = pi.rcv_settle_mode + ' (overridden)'
                     else:
-                        if dst_is_broker:
-                            ns.client_to_broker_link_map[handle] = nl
-                            nl.client_handle = handle
+                        if nl.rcv_settle_mode != pi.rcv_settle_mode:
+                            nl.rcv_settle_mode += ' (modofied)'
+                        if nl.snd_settle_mode == pi.snd_settle_mode:
+                            nl.snd_settle_mode = pi.snd_settle_mode
                         else:
-                            ns.broker_to_client_link_map[handle] = nl
-                            nl.broker_handle = handle
-
-                        if role_is_receiver:
-                            if nl.snd_settle_mode != pi.snd_settle_mode:
-                                nl.snd_settle_mode += ' (modified?)'
-                            if nl.rcv_settle_mode == pi.rcv_settle_mode:
-                                nl.rcv_settle_mode = pi.rcv_settle_mode
-                            else:
-                                nl.rcv_settle_mode = pi.rcv_settle_mode + ' (overridden)'
+                            nl.snd_settle_mode = pi.snd_settle_mode + ' (overridden)'
+
+                if frame not in nl.frame_list:
+                    nl.frame_list.append(frame)
+
+                nl.frame_proto_list.append((frame, proto))
+                nl.time_end = frame_time_relative(frame)
+                nl.RecordCredit(frame_time)
+
+            elif pname == 'detach':
+                # Find the sessionframe_id
+                ns = conn_details.FindSession(channel, dst_is_broker)
+                if ns is None:
+                    conn_details.unaccounted_frame_proto_list.append((frame, proto))
+                    continue
+
+                handle_field = args.find("./field[@name='amqp.performative.arguments.handle']")
+                assert handle_field is not None, "Link handle is required"
+                handle = handle_field.get('show')
+
+                nl = ns.FindLinkByHandle(handle, dst_is_broker)
+                if nl is None:
+                    ns.unaccounted_frame_proto_list.append((frame, proto))
+                    continue
+
+                ns.DetachHandle(handle, dst_is_broker)
+
+                if frame not in nl.frame_list:
+                    nl.frame_list.append(frame)
+                nl.frame_proto_list.append((frame, proto))
+                nl.time_end = frame_time_relative(frame)
+                nl.RecordCredit(frame_time)
+
+            elif pname == 'flow':
+                ns = conn_details.FindSession(channel, dst_is_broker)
+                if ns is None:
+                    conn_details.unaccounted_frame_proto_list.append((frame, proto))
+                    continue
+
+                handle = args.find("./field[@name='amqp.performative.arguments.handle']").get("show")
+
+                nl = ns.FindLinkByHandle(handle, dst_is_broker)
+                if nl is None:
+                    ns.unaccounted_frame_proto_list.append((frame, proto))
+                    continue
+
+                if frame not in nl.frame_list:
+                    nl.frame_list.append(frame)
+                nl.frame_proto_list.append((frame, proto))
+                nl.time_end = frame_time_relative(frame)
+
+                # account for credit
+                # Does this flow carry a normal credit?
+                #   Link created by  Link type  Who sends flow with credit?
+                #   ---------------  ---------  ---------------------------
+                # 1 client           receiver   client
+                # 2 client           sender     server
+                # 3 server           receiver   server
+                # 4 server           sender     client
+                afc = False
+                if dst_is_broker:
+                    # client sending this flow
+                    if nl.originated_by_client:
+                        # client created this link
+                        if nl.originator_is_receiver:
+                            # client created a receiver
+                            afc = True # case 1
                         else:
-                            if nl.rcv_settle_mode != pi.rcv_settle_mode:
-                                nl.rcv_settle_mode += ' (modofied)'
-                            if nl.snd_settle_mode == pi.snd_settle_mode:
-                                nl.snd_settle_mode = pi.snd_settle_mode
-                            else:
-                                nl.snd_settle_mode = pi.snd_settle_mode + ' (overridden)'
-
-                    if frame not in nl.frame_list:
-                        nl.frame_list.append(frame)
-
-                    nl.frame_proto_list.append((frame, proto))
-                    nl.time_end = frame_time_relative(frame)
-                    nl.link_credit_history.append(nl.link_credit)
-
-                elif pname == 'detach':
-                    # Find the sessionframe_id
-                    ns = conn_details.FindSession(channel, dst_is_broker)
-                    if ns is None:
-                        conn_details.unaccounted_frame_proto_list.append((frame, proto))
-                        continue
-
-                    handle_field = args.find("./field[@name='amqp.performative.arguments.handle']")
-                    assert handle_field is not None, "Link handle is required"
-                    handle = handle_field.get('show')
-
-                    nl = ns.FindLinkByHandle(handle, dst_is_broker)
-                    if nl is None:
-                        ns.unaccounted_frame_proto_list.append((frame, proto))
-                        continue
-
-                    ns.DetachHandle(handle, dst_is_broker)
-
-                    if frame not in nl.frame_list:
-                        nl.frame_list.append(frame)
-                    nl.frame_proto_list.append((frame, proto))
-                    nl.time_end = frame_time_relative(frame)
-                    nl.link_credit_history.append(nl.link_credit)
-
-                    # shut off link timers on first detach
-                    if nl.credit_timer > 0.0:
-                        # was running. apply trailing time accumulation
-                        if nl.link_credit > 0:
-                            nl.time_with_credit += frame_time - nl.credit_timer
+                            pass # back channel
+                    else:
+                        # server created this link
+                        if nl.originator_is_receiver:
+                            pass # back channel
                         else:
-                            nl.time_with_no_credit += frame_time - nl.credit_timer
-                        nl.credit_timer = 0.0
-
-                elif pname == 'flow':
-                    ns = conn_details.FindSession(channel, dst_is_broker)
-                    if ns is None:
-                        conn_details.unaccounted_frame_proto_list.append((frame, proto))
-                        continue
-
-                    handle = args.find("./field[@name='amqp.performative.arguments.handle']").get("show")
-
-                    nl = ns.FindLinkByHandle(handle, dst_is_broker)
-                    if nl is None:
-                        ns.unaccounted_frame_proto_list.append((frame, proto))
-                        continue
-
-                    if frame not in nl.frame_list:
-                        nl.frame_list.append(frame)
-                    nl.frame_proto_list.append((frame, proto))
-                    nl.time_end = frame_time_relative(frame)
-
-                    # account for credit
-                    # Does this flow carry a normal credit?
-                    #   Link created by  Link type  Who sends flow with credit?
-                    #   ---------------  ---------  ---------------------------
-                    # 1 client           receiver   client
-                    # 2 client           sender     server
-                    # 3 server           receiver   server
-                    # 4 server           sender     client
-                    afc = False
-                    if dst_is_broker:
-                        # client sending this flow
-                        if nl.originated_by_client:
-                            # client created this link
-                            if nl.originator_is_receiver:
-                                # client created a receiver
-                                afc = True # case 1
-                            else:
-                                pass # back channel
+                            afc = True # case 4
+                else:
+                    # server sending this flow
+                    if nl.originated_by_client:
+                        # client created this link
+                        if nl.originator_is_receiver:
+                            # client created a receiver
+                            pass # back channel
                         else:
-                            # server created this link
-                            if nl.originator_is_receiver:
-                                pass # back channel
-                            else:
-                                afc = True # case 4
+                            afc = True # case 2
                     else:
-                        # server sending this flow
-                        if nl.originated_by_client:
-                            # client created this link
-                            if nl.originator_is_receiver:
-                                # client created a receiver
-                                pass # back channel
-                            else:
-                                afc = True # case 2
-                        else:
-                            # server created this link
-                            if nl.originator_is_receiver:
-                                afc = True # case 3
-                            else:
-                                pass # back channel
-
-                    if afc:
-                        credit = args.find("./field[@name='amqp.performative.arguments.linkCredit']").get("show")
-                        credit = int(credit)
-                        if credit > 0:
-                            # positive non-zero credit is granted
-                            if not nl.credit_timing_in_progress:
-                                # this is the first credit to come along
-                                nl.credit_timing_in_progress = True
-                                nl.credit_timer = frame_time
-                            else:
-                                # timer is running
-                                if nl.link_credit > 0:
-                                    # already had credit and still do
-                                    pass
-                                else:
-                                    # had no credit and now have some
-                                    nl.time_with_no_credit += frame_time - nl.credit_timer
-                                    nl.credit_timer = frame_time # timer is measuring with-credit state
+                        # server created this link
+                        if nl.originator_is_receiver:
+                            afc = True # case 3
                         else:
-                            # no credit granted. Who would do this?
-                            pass
+                            pass # back channel
 
-                        nl.link_credit = credit
+                if afc:
+                    credit = args.find("./field[@name='amqp.performative.arguments.linkCredit']").get("show")
+                    nl.link_credit = int(credit)
 
-                    nl.link_credit_history.append(nl.link_credit)
+                nl.RecordCredit(frame_time)
 
 
 
-                elif pname == 'transfer':
+            elif pname == 'transfer':
 
-                    ns = conn_details.FindSession(channel, dst_is_broker)
-                    if ns is None:
-                        conn_details.unaccounted_frame_proto_list.append((frame, proto))
-                        continue
-
-                    handle = args.find("./field[@name='amqp.performative.arguments.handle']").get("show")
-
-                    nl = ns.FindLinkByHandle(handle, dst_is_broker)
-                    if nl is None:
-                        ns.unaccounted_frame_proto_list.append((frame, proto))
-                        continue
+                ns = conn_details.FindSession(channel, dst_is_broker)
+                if ns is None:
+                    conn_details.unaccounted_frame_proto_list.append((frame, proto))
+                    continue
 
-                    if frame not in nl.frame_list:
-                        nl.frame_list.append(frame)
-                    nl.frame_proto_list.append((frame, proto))
-                    nl.time_end = frame_time_relative(frame)
+                handle = args.find("./field[@name='amqp.performative.arguments.handle']").get("show")
 
-                    # account for credit
-                    count_credit = False
-                    v_more = args.find("./field[@name='amqp.performative.arguments.more']")
-                    if not v_more is None:
-                        vv_more = v_more.get("show")
-                        if vv_more == '1':
-                            pass   # more is true: don't count this transfer against credit
-                        else:
-                            count_credit = True
-
-                    v_aborted = args.find("./field[@name='amqp.performative.arguments.aborted']")
-                    if not v_aborted is None:
-                        vv_aborted = v_aborted.get("show")
-                        if vv_aborted == '1':
-                            # tranfer is aborted
-                            count_credit = True
-                            nl.message_aborted_events += 1
-
-                    if count_credit:
-                        nl.link_credit -= 1
-                        if nl.link_credit == -1:
-                            # in-flight transfers arriving after credit exhaustion
-                            nl.credit_went_negative_events += 1
-                        if nl.link_credit == 0:
-                            # link had credit and now has none
-                            nl.credit_went_zero_events += 1
-                            nl.time_with_credit += frame_time - nl.credit_timer
-                            nl.credit_timer = frame_time   # timer is measuring no-credit state
-                    nl.link_credit_history.append(nl.link_credit)
-
-                elif pname == "disposition":
-                    ns = conn_details.FindSession(channel, dst_is_broker)
-                    if ns is None:
-                        conn_details.unaccounted_frame_proto_list.append((frame, proto))
-                        continue
-                    # put proto into session frame list despite upcoming accounting
-                    if frame not in ns.frame_list:
-                        ns.frame_list.append(frame)
-                    ns.frame_proto_list.append((frame,proto))
+                nl = ns.FindLinkByHandle(handle, dst_is_broker)
+                if nl is None:
+                    ns.unaccounted_frame_proto_list.append((frame, proto))
+                    continue
 
-                    # delivery state
-                    dstate = "no-delivery-state"
-                    state = args.find("./field[@name='amqp.delivery-state.accepted']")
+                if frame not in nl.frame_list:
+                    nl.frame_list.append(frame)
+                nl.frame_proto_list.append((frame, proto))
+                nl.time_end = frame_time_relative(frame)
+
+                # account for credit
+                count_credit = False
+                v_more = args.find("./field[@name='amqp.performative.arguments.more']")
+                if not v_more is None:
+                    vv_more = v_more.get("show")
+                    if vv_more == '1':
+                        pass   # more is true: don't count this transfer against credit
+                    else:
+                        count_credit = True
+
+                v_aborted = args.find("./field[@name='amqp.performative.arguments.aborted']")
+                if not v_aborted is None:
+                    vv_aborted = v_aborted.get("show")
+                    if vv_aborted == '1':
+                        # tranfer is aborted
+                        count_credit = True
+                        nl.message_aborted_events += 1
+
+                if count_credit:
+                    nl.link_credit -= 1
+                    if nl.link_credit == -1:
+                        # in-flight transfers arriving after credit exhaustion
+                        nl.credit_went_negative_events += 1
+                    if nl.link_credit == 0:
+                        # link had credit and now has none
+                        nl.credit_went_zero_events += 1
+                nl.RecordCredit(frame_time)
+
+            elif pname == "disposition":
+                ns = conn_details.FindSession(channel, dst_is_broker)
+                if ns is None:
+                    conn_details.unaccounted_frame_proto_list.append((frame, proto))
+                    continue
+                # put proto into session frame list despite upcoming accounting
+                if frame not in ns.frame_list:
+                    ns.frame_list.append(frame)
+                ns.frame_proto_list.append((frame,proto))
+
+                # delivery state
+                dstate = "no-delivery-state"
+                state = args.find("./field[@name='amqp.delivery-state.accepted']")
+                if not state is None:
+                    dstate = "accepted"
+                else:
+                    state = args.find("./field[@name='amqp.delivery-state.rejected']")
                     if not state is None:
-                        dstate = "accepted"
+                        dstate = "rejected"
                     else:
-                        state = args.find("./field[@name='amqp.delivery-state.rejected']")
+                        state = args.find("./field[@name='amqp.delivery-state.released']")
                         if not state is None:
-                            dstate = "rejected"
+                            dstate = "released"
                         else:
-                            state = args.find("./field[@name='amqp.delivery-state.released']")
+                            state = args.find("./field[@name='amqp.delivery-state.modified']")
                             if not state is None:
-                                dstate = "released"
-                            else:
-                                state = args.find("./field[@name='amqp.delivery-state.modified']")
-                                if not state is None:
-                                    dstate = "modified"
-
-                    pi = amqp_decode(proto, global_vars)
-                    fnum = frame_num(frame)
-                    dirarrow = r_arrow_str() if dst_is_broker else l_arrow_str()
-                    i_start = int(pi.first)
-                    if pi.last == 'null':
-                        i_end = i_start
+                                dstate = "modified"
+
+                pi = amqp_decode(proto, global_vars)
+                fnum = frame_num(frame)
+                dirarrow = r_arrow_str() if dst_is_broker else l_arrow_str()
+                i_start = int(pi.first)
+                if pi.last == 'null':
+                    i_end = i_start
+                else:
+                    i_end = int(pi.last)
+
+                # Choose where this disposition applies
+                # a normal disposition is a 'receiver' sending a disp back to a sender
+                #   this type applies to the opposite direction of the original transfer
+                # a 'receive settle second' disposition is the sender sending a disp
+                #   in the same direction as the initial transfer
+
+                for i in range(i_start, i_end+1):
+                    if dst_is_broker == (pi.role == 'receiver'):
+                        if not i in ns.dispositions_l2r:
+                            ns.dispositions_l2r[i] = []
+                            ns.disposition_summary_l2r[i] = ""
+                        info = "disposition id:%d  %.6f Frame: %d %s role: %s, settled: %s, %s" % \
+                               (i, frame_time, fnum, dirarrow, pi.role, pi.settled, dstate)
+                        ns.dispositions_l2r[i].append(info)
+                        info = "(DISP:%s settled:%s, %s)" % (dirarrow, pi.settled, dstate)
+                        ns.disposition_summary_l2r[i] += info
                     else:
-                        i_end = int(pi.last)
-
-                    # Choose where this disposition applies
-                    # a normal disposition is a 'receiver' sending a disp back to a sender
-                    #   this type applies to the opposite direction of the original transfer
-                    # a 'receive settle second' disposition is the sender sending a disp
-                    #   in the same direction as the initial transfer
-
-                    for i in range(i_start, i_end+1):
-                        if dst_is_broker == (pi.role == 'receiver'):
-                            if not i in ns.dispositions_l2r:
-                                ns.dispositions_l2r[i] = []
-                                ns.disposition_summary_l2r[i] = ""
-                            info = "disposition id:%d  %.6f Frame: %d %s role: %s, settled: %s, %s" % \
-                                   (i, frame_time, fnum, dirarrow, pi.role, pi.settled, dstate)
-                            ns.dispositions_l2r[i].append(info)
-                            info = "(DISP:%s settled:%s, %s)" % (dirarrow, pi.settled, dstate)
-                            ns.disposition_summary_l2r[i] += info
-                        else:
-                            if not i in ns.dispositions_r2l:
-                                ns.dispositions_r2l[i] = []
-                                ns.disposition_summary_r2l[i] = ""
-                            info = "disposition id:%d  %.6f Frame: %d %s role: %s, settled: %s, %s" % \
-                                   (i, frame_time, fnum, dirarrow, pi.role, pi.settled, dstate)
-                            ns.dispositions_r2l[i].append(info)
-                            info = "(DISP:%s settled:%s, %s)" % (dirarrow, pi.settled, dstate)
-                            ns.disposition_summary_r2l[i] += info
+                        if not i in ns.dispositions_r2l:
+                            ns.dispositions_r2l[i] = []
+                            ns.disposition_summary_r2l[i] = ""
+                        info = "disposition id:%d  %.6f Frame: %d %s role: %s, settled: %s, %s" % \
+                               (i, frame_time, fnum, dirarrow, pi.role, pi.settled, dstate)
+                        ns.dispositions_r2l[i].append(info)
+                        info = "(DISP:%s settled:%s, %s)" % (dirarrow, pi.settled, dstate)
+                        ns.disposition_summary_r2l[i] += info
 
+            else:
+                # other performatives: using the channel in due course
+                ns = conn_details.FindSession(channel, dst_is_broker)
+                if ns is not None:
+                    if frame not in ns.frame_list:
+                        ns.frame_list.append(frame)
+                    ns.frame_proto_list.append((frame,proto))
                 else:
-                    # other performatives: using the channel in due course
-                    ns = conn_details.FindSession(channel, dst_is_broker)
-                    if ns is not None:
-                        if frame not in ns.frame_list:
-                            ns.frame_list.append(frame)
-                        ns.frame_proto_list.append((frame,proto))
-                    else:
-                        # TODO: Count a stray
-                        conn_details.unaccounted_frame_proto_list.append((frame, proto))
-                        pass
+                    # TODO: Count a stray
+                    conn_details.unaccounted_frame_proto_list.append((frame, proto))
+                    pass
+
+def amqp_discover_inner_workings(frames, conn_details_map, global_vars):
+    '''
+    Follow connections, sessions, and links to discover details
+    :param frames: the amqp packets
+    :param conn_details_map: storage for details
+    :return: None
+    '''
+    for frame in frames:
+        amqp_discover_frame(frame, conn_details_map[connection_id(frame, global_vars)], global_vars)
 
 def amqp_other_decode(proto):
     '''
@@ -1510,7 +1605,7 @@ def amqp_decode(proto, global_vars, arg_display_xfer=False, count_anomalies=Fals
             aborted = " <span style=\"background-color:yellow\">aborted</span>" if vv_aborted == '1' else ""
         res.web_show_str  = "<strong>%s</strong>  %s (%s) %s" % (res.name, colorize_bg(res.channel_handle), res.transfer_id, aborted)
         if arg_display_xfer:
-            res.transfer_data = get_transfer_data(proto)
+            res.transfer_digest, res.transfer_data = get_transfer_data(proto)
 
     elif perf == '15':
         # Performative: disposition [channel] (role first-last)
@@ -1571,8 +1666,7 @@ def show_fields(parent, level):
         showascii = ""
         if (childname == "amqp.data" or childname == "amqp.amqp_value" or childname == "amqp.value"):
             try:
-                asascii   = dehexify_no_control_chars(valuetext)
-                asascii   = short_data_names.translate(asascii)
+                digest, asascii = translate_data_field(valuetext)
                 showascii = " <span style=\"background-color:white\">\'" + asascii + "\'</span>"
             except:
                 pass
@@ -1584,19 +1678,29 @@ def show_fields(parent, level):
 
 #
 #
+def translate_data_field(valuetext):
+    '''
+    Given the hex text of a data field return its digest and display text.
+    The whole value is digested but only a preview is dehexified and kept.
+    :param valuetext: hex string from the pdml field value
+    :return: (digest, printable and possibly shortened text)
+    '''
+    digest = hashlib.sha1(valuetext).hexdigest()
+    preview = dehexify_no_control_chars(valuetext[:2 * short_data_names.preview_len])
+    return digest, short_data_names.translate_digest(digest, preview, len(valuetext) // 2)
+
 def get_transfer_data(parent):
     '''
     Find transfer proto's amqp.data or amqp.amqp_value field as printable text
+    :return: (digest, text) or ('', '') if there is no data field
     '''
-    global short_data_names
-    result = ''
+    result = ('', '')
     for child in parent:
         childname = child.get("name")
         valuetext = child.get("value")
         if (childname == "amqp.data" or childname == "amqp.amqp_value" or childname == "amqp.value"):
             try:
-                result = dehexify_no_control_chars(valuetext)
-                result = short_data_names.translate(result)
+                result = translate_data_field(valuetext)
             except:
                 pass
             break
@@ -1624,8 +1728,14 @@ def show_flow_list(title, flow_list, label):
 def main_except(argv):
     #pdb.set_trace()
     """Given a pdml file name, send the javascript web page to stdout"""
+    global stage_callback
+    profiler = adverb_profile.from_args("adverb.py", sys.argv)
+    if profiler.enabled:
+        stage_callback = profiler.begin
+
     if len(sys.argv) < 5:
-        sys.exit('Usage: %s pdml-file-name trace-file-display-name broker-ports displayXferCorrelation' % sys.argv[0])
+        sys.exit('Usage: %s [--profile[=json-file]] [--profile-stage=stage[:prof-file]] '
+                 'pdml-file-name trace-file-display-name broker-ports displayXferCorrelation' % sys.argv[0])
 
     arg_pdml_file    = sys.argv[1]
     arg_display_name = sys.argv[2]
@@ -1646,10 +1756,13 @@ def main_except(argv):
     #    print " port %s = %s<br>" % (x, global_broker_ports_list[x])
 
     # parse the pdml file
+    begin_stage("parse")
     tree = ET.parse(arg_pdml_file)
     root = tree.getroot()
     packets = root.findall("packet")
 
+    begin_stage("classify")
+
     # Discover probable/possible ampq flows not marked as AMQP.
     # The trick here is to look for 'fake-field-wrapper' proto types which
     # identify frames for which wireshark has no decoder. Then if the payload
@@ -1690,17 +1803,16 @@ def main_except(argv):
     amqp_packets = []
     for packet in packets:
         amqp_frame = packet.find("./proto[@name='amqp']")
-        if __name__ == '__main__':
-            if amqp_frame is not None:
-                # Decoding malformed AMQP frames is risky.
-                # Wireshark calls many packets malformed when they are fine
-                # and hiding them is not great. On the other hand, some
-                # malformed frames can not be decoded. For now, accept all
-                # frames and fix the decoders as the errors show up.
-                mal_frame = packet.find("./proto[@name='_ws.malformed']")
-                if not mal_frame is None:
-                    global_vars.malformed_amqp_packets.append(packet)
-                amqp_packets.append(packet)
+        if amqp_frame is not None:
+            # Decoding malformed AMQP frames is risky.
+            # Wireshark calls many packets malformed when they are fine
+            # and hiding them is not great. On the other hand, some
+            # malformed frames can not be decoded. For now, accept all
+            # frames and fix the decoders as the errors show up.
+            mal_frame = packet.find("./proto[@name='_ws.malformed']")
+            if not mal_frame is None:
+                global_vars.malformed_amqp_packets.append(packet)
+            amqp_packets.append(packet)
 
     # calculate a list of connections and a map
     # of {internal name: formal display name}
@@ -1755,11 +1867,16 @@ def main_except(argv):
 
     # Fill in connection details with info about sessions.
     # Manage sessions as they are found.
+    begin_stage("discover")
     amqp_discover_inner_workings(amqp_packets, conn_details_map, global_vars)
 
-    # create a map of transfer performatives. key=transfer data, value=list of frames sending that data
-    transfer_data = {}
-    transfer_data_list = []
+    begin_stage("render")
+
+    # create an index of transfer performatives.
+    # key=digest of transfer data, val=(data display text, list of frames sending that data)
+    # Frames are listed without the data so memory use does not depend on payload size.
+    transfer_index = {}
+    transfer_index_order = []
 
     # start up the web stuff
     print "<html>"
@@ -2111,10 +2228,15 @@ Generated from PDML on <b>'''
                        link.FrameCount(), link.ProtoCount(), get_link_event_display_string(lec))
                 print "<div width=\"100%%\" id=\"%s_link_details\" style=\"display:none\">" % (lid)
                 if lec > 0:
+                    timeline = link.GetCreditTimeline()
                     print "%s%.6f S - Elapsed time with no link credit<br>" % \
-                          (leading(5), link.time_with_no_credit)
+                          (leading(5), timeline.time_with_no_credit)
                     print "%s%.6f S - Elapsed time with link credit<br>" % \
-                          (leading(5), link.time_with_credit)
+                          (leading(5), timeline.time_with_credit)
+                    print "%s%d - Link credit stalls<br>" % \
+                          (leading(5), timeline.stall_episodes)
+                    print "%s%.6f S - Longest link credit stall<br>" % \
+                          (leading(5), timeline.longest_stall)
                     print "%s%d - Link credit went to zero<br>" % \
                           (leading(5), link.credit_went_zero_events)
                     print "%s%d - Link credit went below zero<br>" % \
@@ -2271,13 +2393,14 @@ Generated from PDML on <b>'''
                 print "</div>"                                                 # end level:3
                 # Emit cross indexed transfer data info
                 if arg_display_xfer and decoded_proto.name == "transfer":
-                    info = "%s, %s, %s, %s, %s, %s, %s, %s, \"%s\"" % (frame_num(packet), frame_time_relative(packet), connection_src_string(packet),
-                                                                   connection_dst_string(packet), decoded_proto.channel, decoded_proto.handle,
-                                                                   decoded_proto.delivery_id, decoded_proto.delivery_tag, decoded_proto.transfer_data)
-                    if not decoded_proto.transfer_data in transfer_data:
-                        transfer_data[decoded_proto.transfer_data] = []
-                        transfer_data_list.append(decoded_proto.transfer_data)
-                    transfer_data[decoded_proto.transfer_data].append(info)
+                    info = "%s, %s, %s, %s, %s, %s, %s, %s" % (frame_num(packet), frame_time_relative(packet), connection_src_string(packet),
+                                                               connection_dst_string(packet), decoded_proto.channel, decoded_proto.handle,
+                                                               decoded_proto.delivery_id, decoded_proto.delivery_tag)
+                    digest = decoded_proto.transfer_digest
+                    if not digest in transfer_index:
+                        transfer_index[digest] = (decoded_proto.transfer_data, [])
+                        transfer_index_order.append(digest)
+                    transfer_index[digest][1].append(info)
 
         print "</div>"                                                         # end level:2
         print "</div>"                                                         # end level:1
@@ -2358,16 +2481,18 @@ You may use your browser's Ctrl-F search feature to search for text on the scree
     if arg_display_xfer:
         print "<h3>Indexed content</h3>"
         print ("Frame, Time, Src, Dst, Channel, Handle, DeliveryId, DeliveryTag, Data<br>")
-        for key in transfer_data_list:
-            hits = transfer_data[key]
+        for digest in transfer_index_order:
+            data, hits = transfer_index[digest]
             for hit in hits:
-                print ("%s<br>" % (hit))
+                print ("%s, \"%s\"<br>" % (hit, data))
 
     # close the html page
     print '''</body>
 </html>
 '''
     # all done
+    begin_stage(None)
+    profiler.report()
 
 def main(argv):
     try:
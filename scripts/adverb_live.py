@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+#
+# Adverb live capture analysis
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Live mode watches AMQP traffic as it happens.
+#
+# tshark runs a live capture and writes pdml to a pipe. Each <packet>
+# element is parsed as soon as its closing tag arrives and is fed to
+# adverb's connection/session/link state machine one frame at a time.
+# A summary report is rewritten every few seconds.
+#
+# A live capture never ends so memory is bounded:
+#  * session and link frame histories are ring buffers
+#    (adverb.frame_history_depth)
+#  * each connection keeps a ring buffer of its most recent frame summaries
+#  * session dispositions are kept for the most recent delivery ids only
+#  * retired sessions and links are pruned down to a few of the latest
+#  * the least recently active connections are dropped when there are
+#    too many of them
+#  * the link, endpoint, and message data name tables are cleared when
+#    they grow too big
+
+import collections
+import os
+import subprocess
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+import Queue
+
+import adverb
+from adverb_strings import *
+
+
+def pdml_packets(stream):
+    '''
+    Generate ElementTree packets from a pdml text stream.
+    Packets are yielded as soon as the closing tag is read so a
+    live tshark pipe is not held up waiting for the end of the document.
+    :param stream: file-like object producing pdml lines
+    :return: generator of packet elements
+    '''
+    chunk = []
+    in_packet = False
+    for line in iter(stream.readline, ''):
+        stripped = line.strip()
+        if stripped == "<packet>":
+            in_packet = True
+            chunk = []
+        if in_packet:
+            chunk.append(line)
+            if stripped == "</packet>":
+                in_packet = False
+                try:
+                    yield ET.fromstring(''.join(chunk))
+                except ET.ParseError:
+                    sys.stderr.write("WARNING: discarding unparsable pdml packet\n")
+                chunk = []
+
+
+def prune_retired(conn_details, keep):
+    '''
+    Discard all but the 'keep' most recent retired sessions and links.
+    Sessions still in the channel maps and their links still in the
+    handle maps are active and are never discarded.
+    :param conn_details: ConnectionDetail
+    :param keep: number of retired items to keep per list
+    :return: None
+    '''
+    active_sessions = set(conn_details.client_to_broker_chan_map.values()) | \
+                      set(conn_details.broker_to_client_chan_map.values())
+    retired = [s for s in conn_details.session_list if s not in active_sessions]
+    if len(retired) > keep:
+        drop = set(retired[:len(retired) - keep])
+        conn_details.session_list = [s for s in conn_details.session_list if s not in drop]
+    for session in conn_details.session_list:
+        # links of an ended session are retired even if never detached
+        active = set()
+        if session in active_sessions:
+            active = set(session.client_to_broker_link_map.values()) | \
+                     set(session.broker_to_client_link_map.values())
+        retired = [l for l in session.link_list if l not in active]
+        if len(retired) > keep:
+            drop = set(retired[:len(retired) - keep])
+            session.link_list = [l for l in session.link_list if l not in drop]
+            for name, link in session.link_name_to_detail_map.items():
+                if link in drop:
+                    del session.link_name_to_detail_map[name]
+
+
+class LiveAnalyzer():
+    '''
+    Incremental connection, session, and link analysis of a frame stream
+    '''
+    def __init__(self, global_vars, history=100, retired=10, max_connections=1000, max_names=10000):
+        self.global_vars = global_vars
+        self.history = history                  # recent frames per connection
+        self.retired = retired                  # retired sessions/links kept
+        self.max_connections = max_connections  # connections tracked at once
+        self.max_names = max_names              # names kept per name table
+
+        # key=connection id, val=ConnectionDetail
+        self.conn_details_map = {}
+        # key=connection id, val=display name
+        self.conn_id_to_name_map = {}
+        # key=connection id, val=total frames seen
+        self.conn_frame_count = {}
+        # key=connection id, val=deque of recent frame summary strings
+        self.conn_recent_frames = {}
+        # key=connection id, val=frame number of latest frame
+        self.conn_last_frame = {}
+
+        self.n_frames = 0
+        self.n_dropped_connections = 0
+        self.start_time = time.time()
+
+    def add_packet(self, packet):
+        '''
+        Fold one pdml packet into the running analysis
+        :param packet: ElementTree packet
+        :return: True if the packet held AMQP
+        '''
+        if packet.find("./proto[@name='amqp']") is None:
+            return False
+        gv = self.global_vars
+        cid = adverb.connection_id(packet, gv)
+        if cid not in self.conn_details_map:
+            self.conn_details_map[cid] = adverb.ConnectionDetail(cid)
+            self.conn_id_to_name_map[cid] = adverb.connection_name(packet, gv)
+            self.conn_frame_count[cid] = 0
+            self.conn_recent_frames[cid] = collections.deque(maxlen=self.history)
+        adverb.amqp_discover_frame(packet, self.conn_details_map[cid], gv)
+
+        dir_arrow = r_arrow_str() if adverb.connection_dst_is_broker(packet, gv) else l_arrow_str()
+        performatives = []
+        for proto in packet.findall('proto'):
+            if proto.get("name") == "amqp":
+                performatives.append(adverb.amqp_decode(proto, gv, False, count_anomalies=True).web_show_str)
+        self.conn_recent_frames[cid].append("Frame: %s %s %s %s" %
+                                            (adverb.frame_num_str(packet), adverb.frame_time_relative(packet),
+                                             dir_arrow, ("," + nbsp()).join(performatives)))
+        self.conn_frame_count[cid] += 1
+        self.conn_last_frame[cid] = self.n_frames
+        self.n_frames += 1
+        return True
+
+    def prune(self):
+        '''
+        Hold memory use steady: trim retired sessions and links,
+        forget the least recently active connections, and clear
+        name tables that have grown too big.
+        :return: None
+        '''
+        for conn_details in self.conn_details_map.values():
+            prune_retired(conn_details, self.retired)
+        excess = len(self.conn_details_map) - self.max_connections
+        if excess > 0:
+            by_age = sorted(self.conn_last_frame.items(), key=lambda kv: kv[1])
+            for cid, last in by_age[:excess]:
+                del self.conn_details_map[cid]
+                del self.conn_id_to_name_map[cid]
+                del self.conn_frame_count[cid]
+                del self.conn_recent_frames[cid]
+                del self.conn_last_frame[cid]
+                self.n_dropped_connections += 1
+        # the report shows long names in popups so renumbering them is harmless
+        for names in (adverb.short_link_names, adverb.short_endp_names, adverb.short_data_names):
+            if len(names.longnames) > self.max_names:
+                names.clear()
+
+    def show_html(self, title, refresh_seconds):
+        '''
+        Print the summary report to stdout
+        :param title: capture display name
+        :param refresh_seconds: browser auto-reload interval
+        :return: None
+        '''
+        print "<html>"
+        print "<head>"
+        print "<meta http-equiv=\"refresh\" content=\"%d\">" % refresh_seconds
+        print "<title>%s - Adverb Live Analysis</title>" % title
+        print '''<script type="text/javascript">
+function toggle_node(id)
+{
+  var node = document.getElementById(id);
+  if(!node) return;
+  node.style.display = (node.style.display == "block") ? 'none' : 'block';
+}
+</script>
+</head>
+<body>
+<style>
+    * { font-family: sans-serif; }
+</style>'''
+        print "Live capture: <b>%s</b><br>" % title
+        print "Updated: <b>%s</b>, running %d S<br>" % (time.asctime(time.localtime(time.time())),
+                                                      time.time() - self.start_time)
+        print "AMQP frames: <b>%d</b>, connections: <b>%d</b>, connections no longer tracked: <b>%d</b><br>" % \
+              (self.n_frames, len(self.conn_details_map), self.n_dropped_connections)
+
+        print "<h3>Connections</h3>"
+        for cid in sorted(self.conn_details_map.keys(), key=lambda c: self.conn_last_frame[c], reverse=True):
+            conn_detail = self.conn_details_map[cid]
+            print "<a href=\"javascript:toggle_node('%s_live')\">%s%s</a>" % (cid, lozenge(), nbsp())
+            print "%s%s(nFrames=%d) %s<br>" % (self.conn_id_to_name_map[cid], nbsp() * 2, self.conn_frame_count[cid],
+                                               adverb.get_link_event_display_string(conn_detail.GetLinkEventCount()))
+            print "<div width=\"100%%\" id=\"%s_live\" style=\"display:none\">" % cid
+            for session in conn_detail.session_list:
+                print "%sSession %s: Channels: client: %s, server: %s; Time: start %s, end %s %s<br>" % \
+                      (leading(1), session.conn_epoch, session.client_chan, session.broker_chan,
+                       session.time_start, session.time_end,
+                       adverb.get_link_event_display_string(session.GetLinkEventCount()))
+                for link in session.link_list:
+                    info = "client " if link.originated_by_client else "server "
+                    info += "%s %s" % ("receiver ", link.receiver_source) if link.originator_is_receiver else \
+                        "%s %s" % ("sender ", link.sender_target)
+                    print "%sLink %s: %s %s; credit: %d; Time: start %s, end %s %s<br>" % \
+                          (leading(2), link.session_seq, adverb.short_link_names.translate(link.name), info,
+                           link.link_credit, link.time_start, link.time_end,
+                           adverb.get_link_event_display_string(link.GetLinkEventCount()))
+            print "%sMost recent frames:<br>" % leading(1)
+            for summary in self.conn_recent_frames[cid]:
+                print "%s%s<br>" % (leading(2), summary)
+            print "</div>"
+        print "</body>"
+        print "</html>"
+
+    def write_report(self, filename, title, refresh_seconds):
+        '''
+        Replace the report file. The new report is written to a temporary
+        file and renamed so a browser never sees a partial page.
+        :return: None
+        '''
+        tmpname = filename + ".tmp"
+        saved_stdout = sys.stdout
+        with open(tmpname, 'w') as f:
+            sys.stdout = f
+            try:
+                self.show_html(title, refresh_seconds)
+            finally:
+                sys.stdout = saved_stdout
+        os.rename(tmpname, filename)
+
+
+def tshark_live_args(interface, portlist):
+    '''
+    :return: tshark command line for a line-buffered live amqp pdml capture
+    '''
+    args = ["tshark", "-l", "-i", interface, "-Y", "amqp", "-T", "pdml"]
+    for port in portlist:
+        if not port == "amqp":
+            args.append("-d")
+            args.append("tcp.port==" + port + ",amqp")
+    return args
+
+
+def run_live(interface, report_file, portlist, refresh_seconds=5, history=100):
+    '''
+    Capture on an interface until interrupted, rewriting the report file
+    every refresh_seconds.
+    :param interface: capture interface name given to tshark -i
+    :param report_file: html summary file name
+    :param portlist: list of port strings to decode as AMQP
+    :param refresh_seconds: report rewrite interval
+    :param history: frames kept per connection, session, and link
+    :return: None
+    '''
+    adverb.frame_history_depth = history
+    global_vars = adverb.GlobalVars()
+    adverb.process_port_args(' '.join(portlist), global_vars)
+    analyzer = LiveAnalyzer(global_vars, history)
+
+    tshark = subprocess.Popen(tshark_live_args(interface, portlist), stdout=subprocess.PIPE)
+
+    # The reader thread blocks on the pipe so that the report
+    # still refreshes while the link is quiet.
+    packets = Queue.Queue(maxsize=10000)
+    def reader():
+        for packet in pdml_packets(tshark.stdout):
+            packets.put(packet)
+        packets.put(None)
+    thread = threading.Thread(target=reader)
+    thread.daemon = True
+    thread.start()
+
+    next_report = time.time() + refresh_seconds
+    try:
+        while True:
+            try:
+                packet = packets.get(timeout=max(0.1, next_report - time.time()))
+                if packet is None:
+                    break
+                analyzer.add_packet(packet)
+            except Queue.Empty:
+                pass
+            if time.time() >= next_report:
+                analyzer.prune()
+                analyzer.write_report(report_file, interface, refresh_seconds)
+                next_report = time.time() + refresh_seconds
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if tshark.poll() is None:
+            tshark.terminate()
+        analyzer.prune()
+        analyzer.write_report(report_file, interface, refresh_seconds)
+
+
+if __name__ == "__main__":
+    import StringIO
+    pdml = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "test", "data", "t1-amqp.pdml")).read()
+    packets = list(pdml_packets(StringIO.StringIO(pdml)))
+    assert len(packets) == pdml.count("<packet>") == 26
+    # text between packets is skipped and a broken packet is discarded
+    sys.stderr = StringIO.StringIO()
+    try:
+        mixed = "<pdml>\n<packet>\n<proto name=\"amqp\">\n</packet>\n" + pdml
+        assert len(list(pdml_packets(StringIO.StringIO(mixed)))) == 26
+        assert "discarding" in sys.stderr.getvalue()
+    finally:
+        sys.stderr = sys.__stderr__
+
+    global_vars = adverb.GlobalVars()
+    adverb.process_port_args("amqp", global_vars)
+    analyzer = LiveAnalyzer(global_vars)
+    for packet in packets[:20]:
+        analyzer.add_packet(packet)
+    assert len(analyzer.conn_details_map) == 1
+    conn_details = analyzer.conn_details_map.values()[0]
+    session = conn_details.session_list[0]
+    active = session.client_to_broker_link_map.values()[0]
+    assert len(session.link_list) == 3 and session.link_list[-1] is active
+    # the session and its attached link are active, the oldest retired link goes
+    newest_retired = session.link_list[1]
+    prune_retired(conn_details, 1)
+    assert conn_details.session_list == [session]
+    assert session.link_list == [newest_retired, active]
+    assert sorted(session.link_name_to_detail_map.values()) == sorted(session.link_list)
+    prune_retired(conn_details, 0)
+    assert session.link_list == [active]
+    # once the session ends it and its links are retired too
+    for packet in packets[20:]:
+        analyzer.add_packet(packet)
+    prune_retired(conn_details, 1)
+    assert conn_details.session_list == [session] and session.link_list == [active]
+    prune_retired(conn_details, 0)
+    assert conn_details.session_list == []
+
+    # dispositions and name tables stay bounded on a long lived session
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "test"))
+    import pdml_gen
+    trace = StringIO.StringIO()
+    pdml_gen.PdmlGenerator(trace, links=30).generate(1000)
+    adverb.frame_history_depth = 50
+    analyzer = LiveAnalyzer(global_vars, 50, max_names=20)
+    for packet in pdml_packets(StringIO.StringIO(trace.getvalue())):
+        analyzer.add_packet(packet)
+    session = analyzer.conn_details_map.values()[0].session_list[0]
+    assert len(session.dispositions_r2l) == len(session.disposition_summary_r2l) == 50
+    assert max(session.dispositions_r2l) == max(session.disposition_summary_r2l) > 400
+    assert len(session.dispositions_l2r) == 0
+    assert len(adverb.short_link_names.longnames) > 20 and len(adverb.short_endp_names.longnames) > 20
+    analyzer.prune()
+    assert len(adverb.short_link_names.longnames) == len(adverb.short_endp_names.longnames) == 0
+    print "OK"
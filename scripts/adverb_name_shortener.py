@@ -19,6 +19,8 @@
 # under the License.
 #
 
+import name_table
+
 class ShortNames():
     '''
     Name shortener.
@@ -29,7 +31,8 @@ class ShortNames():
     Each class has a prefix used when the table is dumped as HTML
     '''
     def __init__(self, prefixText):
-        self.longnames = []
+        self.names = name_table.NameTable()
+        self.longnames = self.names.names
         self.prefix = prefixText
         self.threshold = 25
 
@@ -41,17 +44,20 @@ class ShortNames():
         :return: If shortened HTML string of shortened name with popup containing long name else
         not-so-long name.
         '''
-        idx = 0
-        try:
-            idx = self.longnames.index(lname)
-        except:
-            self.longnames.append(lname)
-            idx = self.longnames.index(lname)
+        idx = self.names.intern(lname)
         # return as-given if short enough
         if len(lname) < self.threshold:
             return lname
         return "<span title=\"" + lname + "\">" + self.prefix + "_" + str(idx) + "</span>"
 
+    def clear(self):
+        '''
+        Forget all names. Short names given out later start again from index 0.
+        :return: null
+        '''
+        self.names = name_table.NameTable()
+        self.longnames = self.names.names
+
     def htmlDump(self):
         '''
         Print the name table as an unnumbered list to stdout
@@ -64,5 +70,46 @@ class ShortNames():
                 print ("<li> " + self.prefix + "_" + str(i) + " - " + self.longnames[i] + "</li>")
             print "</ul>"
 
+class DigestShortNames(ShortNames):
+    '''
+    Name shortener for bulky data such as message payloads.
+    Names are remembered by a fixed size digest and only a preview of
+    each is kept so memory use does not grow with the size of the data.
+    '''
+    def __init__(self, prefixText, preview_len=200):
+        ShortNames.__init__(self, prefixText)
+        self.preview_len = preview_len
+
+    def translate_digest(self, digest, preview, length):
+        '''
+        Translate data known by its digest into a short name, maybe.
+        :param digest: fixed size digest of the full data
+        :param preview: the leading characters of the data, up to preview_len
+        :param length: length of the full data
+        :return: If shortened HTML string of shortened name with popup containing
+        the preview else the data.
+        '''
+        if length > len(preview):
+            preview += "...(%d bytes)" % length
+        idx = self.names.intern(preview, digest)
+        # return as-given if short enough
+        if length < self.threshold:
+            return preview
+        return "<span title=\"" + preview + "\">" + self.prefix + "_" + str(idx) + "</span>"
+
 if __name__ == "__main__":
-    pass
+    sn = DigestShortNames("data", 30)
+    assert sn.translate_digest("d1", "short", 5) == "short"
+    long1 = sn.translate_digest("d2", "x" * 30, 1000000)
+    assert long1 == "<span title=\"" + "x" * 30 + "...(1000000 bytes)\">data_1</span>", long1
+    assert sn.translate_digest("d2", "x" * 30, 1000000) == long1
+    assert len(sn.longnames) == 2
+    sn = ShortNames("link")
+    assert sn.translate("a_name_that_is_long_enough_to_shorten") == "<span title=\"a_name_that_is_long_enough_to_shorten\">link_0</span>"
+    assert sn.translate("short") == "short"
+    assert sn.translate("a_name_that_is_long_enough_to_shorten").endswith(">link_0</span>")
+    assert sn.longnames == ["a_name_that_is_long_enough_to_shorten", "short"]
+    sn.clear()
+    assert sn.longnames == []
+    assert sn.translate("another_name_that_is_long_enough").endswith(">link_0</span>")
+    print "OK"
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Pipeline stage profiler shared by adverb.py and adverbl.
+#
+# A program calls begin(name) as each stage starts and begin(None) when
+# it is done. A stage may be entered more than once; its figures add up.
+# For each stage the profiler records wall seconds, cpu seconds, and the
+# process peak RSS when the stage ended. Under python3 the tracemalloc
+# peak of python allocations within the stage is recorded too.
+#
+# Command line switches, removed from argv by from_args():
+#   --profile               report to stderr
+#   --profile=FILE          write the report to FILE as JSON
+#   --profile-stage=NAME    cProfile stage NAME, stats to NAME.prof
+#   --profile-stage=NAME:FILE
+#                           cProfile stage NAME, stats to FILE
+
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+
+import cProfile
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+def cpu_seconds():
+    t = os.times()
+    return t[0] + t[1]
+
+
+def peak_rss_kb():
+    '''
+    :return: process high water RSS in KB, or 0 where unknown
+    '''
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        rss //= 1024  # bytes on macOS
+    return rss
+
+
+class StageProfiler():
+    '''
+    Wall, cpu, and memory figures per pipeline stage
+    '''
+    def __init__(self, program, enabled=False, json_file=None, cprofile_stage=None, cprofile_file=None):
+        self.program = program
+        self.enabled = enabled
+        self.json_file = json_file
+        self.cprofile_stage = cprofile_stage
+        self.cprofile_file = cprofile_file
+        self.cprofiler = None
+
+        # stage names in order of first appearance
+        self.stage_names = []
+        # key=stage name, val=dict of figures
+        self.stages = {}
+
+        self.current = None
+        self.t_wall = 0.0
+        self.t_cpu = 0.0
+        self.start_wall = time.time()
+        self.start_cpu = cpu_seconds()
+        self.start_rss = peak_rss_kb()
+        if self.enabled and tracemalloc is not None:
+            tracemalloc.start()
+
+    def begin(self, name):
+        '''
+        End the current stage, if any, and start stage 'name'
+        :param name: stage name, or None for the end of the run
+        :return: None
+        '''
+        if not self.enabled:
+            return
+        now_wall = time.time()
+        now_cpu = cpu_seconds()
+        if self.current is not None:
+            stage = self.stages[self.current]
+            stage["wall"] += now_wall - self.t_wall
+            stage["cpu"] += now_cpu - self.t_cpu
+            stage["peak_rss_kb"] = peak_rss_kb()
+            if tracemalloc is not None:
+                stage["py_peak_kb"] = max(stage.get("py_peak_kb", 0), tracemalloc.get_traced_memory()[1] // 1024)
+            if self.current == self.cprofile_stage:
+                self.cprofiler.disable()
+        if name is not None:
+            if name not in self.stages:
+                self.stage_names.append(name)
+                self.stages[name] = {"wall": 0.0, "cpu": 0.0, "entries": 0}
+            self.stages[name]["entries"] += 1
+            if tracemalloc is not None and hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            if name == self.cprofile_stage:
+                if self.cprofiler is None:
+                    self.cprofiler = cProfile.Profile()
+                self.cprofiler.enable()
+        self.current = name
+        self.t_wall = time.time()
+        self.t_cpu = cpu_seconds()
+
+    def result(self):
+        '''
+        :return: the report as a dict
+        '''
+        stages = []
+        for name in self.stage_names:
+            stage = dict(self.stages[name])
+            stage["name"] = name
+            stages.append(stage)
+        return {"program": self.program,
+                "stages": stages,
+                "total": {"wall": time.time() - self.start_wall,
+                          "cpu": cpu_seconds() - self.start_cpu,
+                          "peak_rss_kb": peak_rss_kb(),
+                          "start_rss_kb": self.start_rss}}
+
+    def report(self):
+        '''
+        Write the report to the json file or stderr, and the cProfile stats
+        :return: None
+        '''
+        if not self.enabled:
+            return
+        if self.current is not None:
+            self.begin(None)
+        if self.cprofiler is not None:
+            self.cprofiler.dump_stats(self.cprofile_file)
+        res = self.result()
+        if self.json_file is not None:
+            with open(self.json_file, "w") as f:
+                f.write(json.dumps(res, sort_keys=True, indent=2))
+            return
+        err = sys.stderr
+        err.write("%s profile\n" % self.program)
+        err.write("%-18s %6s %10s %10s %12s %12s\n" %
+                  ("stage", "count", "wall s", "cpu s", "peak rss MB", "py peak MB"))
+        for stage in res["stages"]:
+            err.write("%-18s %6d %10.3f %10.3f %12.1f %12s\n" %
+                      (stage["name"], stage["entries"], stage["wall"], stage["cpu"],
+                       stage.get("peak_rss_kb", 0) / 1024.0,
+                       ("%.1f" % (stage["py_peak_kb"] / 1024.0)) if "py_peak_kb" in stage else "-"))
+        total = res["total"]
+        err.write("%-18s %6s %10.3f %10.3f %12.1f\n" %
+                  ("total", "", total["wall"], total["cpu"], total["peak_rss_kb"] / 1024.0))
+        if self.cprofiler is not None:
+            err.write("cProfile stats for stage '%s' written to %s\n" % (self.cprofile_stage, self.cprofile_file))
+
+
+def from_args(program, argv):
+    '''
+    Remove the --profile switches from argv
+    :param program: program name for the report
+    :param argv: command line list, modified in place
+    :return: a StageProfiler, disabled if no switch was given
+    '''
+    enabled = False
+    json_file = None
+    cprofile_stage = None
+    cprofile_file = None
+    i = 1
+    while i < len(argv):
+        a = argv[i]
+        if a == "--profile":
+            enabled = True
+        elif a.startswith("--profile="):
+            enabled = True
+            json_file = a[len("--profile="):]
+        elif a.startswith("--profile-stage="):
+            enabled = True
+            cprofile_stage = a[len("--profile-stage="):]
+            if ":" in cprofile_stage:
+                cprofile_stage, cprofile_file = cprofile_stage.split(":", 1)
+            else:
+                cprofile_file = cprofile_stage + ".prof"
+        else:
+            i += 1
+            continue
+        del argv[i]
+    return StageProfiler(program, enabled, json_file, cprofile_stage, cprofile_file)
+
+
+if __name__ == "__main__":
+    argv = ["prog", "--profile-stage=two", "x", "--profile"]
+    p = from_args("selftest", argv)
+    assert argv == ["prog", "x"]
+    assert p.enabled and p.json_file is None
+    assert p.cprofile_stage == "two" and p.cprofile_file == "two.prof"
+    p.cprofile_file = os.devnull
+    p.begin("one")
+    p.begin("two")
+    sum(range(10000))
+    p.begin("one")
+    p.begin(None)
+    res = p.result()
+    assert [s["name"] for s in res["stages"]] == ["one", "two"]
+    assert res["stages"][0]["entries"] == 2
+    assert not from_args("selftest", ["prog", "x"]).enabled
+    print("OK")
@@ -400,6 +400,14 @@ class AllDetails():
                             result += ", sndr: absent"
         return result
 
+    def link_attaches(self, link_name):
+        '''
+        Attach frames for a link name in this router instance, on any connection
+        :param link_name: link short name, as in plf.data.link_short_name
+        :return: list of attach plf lines in log order
+        '''
+        return self.rtr.attaches_by_name.get(link_name, [])
+
     def __init__(self, _router, _common):
         self.rtr = _router
         self.comn = _common
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Splitter.split micro-benchmark
+#
+# Times Splitter.split against the original character-at-a-time splitter
+# over the lines in test_data/test_data.txt and over a synthetic corpus
+# built from them. Before timing, every line is checked to split to the
+# same fields, of the same string type, or to fail the same way.
+#
+#   bench_splitter.py [--lines N] [--seed S]
+
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+
+import argparse
+import random
+import sys
+import time
+
+import splitter
+import test_data as td
+
+
+def reference_split(line):
+    """
+    The original Splitter.split, kept as the reference for the checks.
+    """
+    result = []
+    indqs = False
+    pending_comma = False
+    res = ""
+    for i in range(len(line)):
+        c = line[i]
+        if c == '\"':
+            if pending_comma:
+                res += ','
+                pending_comma = False
+            indqs = not indqs
+            res += c
+        elif c == ',':
+            if pending_comma:
+                res += c
+            pending_comma = True
+        elif c == ' ':
+            if indqs:
+                if pending_comma:
+                    res += ','
+                    pending_comma = False
+                res += c
+            else:
+                if res != '':
+                    if pending_comma:
+                        pending_comma = False
+                    result.append(res)
+                    res = ''
+        else:
+            res += c
+    if res != '':
+        result.append(str(res))
+    if indqs:
+        raise ValueError("SPLIT ODD QUOTES: %s", line)
+    return result
+
+
+def split_body(line):
+    """
+    Reduce a log line to the text parse_dtype_line gives the splitter:
+    the described type fields inside the outer brackets.
+    """
+    start = line.find('[', line.find('@'))
+    end = line.rfind(']')
+    if start < 0 or end <= start:
+        return None
+    return str(line[start + 1:end])
+
+
+def sample_bodies():
+    """
+    The described type fields of the test_data lines other than transfers
+    """
+    samples = [split_body(line) for line in td.TestData().data() if "transfer" not in line]
+    return [s for s in samples if s]
+
+
+def synthetic_corpus(samples, n_lines, seed):
+    """
+    Make n_lines lines from the sample lines with some fields altered
+    to hold quoted strings, runs of commas, and runs of spaces.
+    """
+    rng = random.Random(seed)
+    extras = [str(x) for x in ['"a b, c"', ',,', 'x,,y', '  ', '"q,"', '",",', 'k="v w",', ',', '""', 'z,']]
+    lines = []
+    for i in range(n_lines):
+        fields = rng.choice(samples).split(' ')
+        if rng.random() < 0.25:
+            fields.insert(rng.randrange(len(fields) + 1), rng.choice(extras))
+        lines.append(str(' '.join(fields)))
+    return lines
+
+
+def outcome(split, line):
+    try:
+        return [(type(f), f) for f in split(line)]
+    except ValueError as e:
+        return ("ValueError", str(e))
+
+
+def check(lines):
+    bad = 0
+    for line in lines:
+        if outcome(splitter.Splitter.split, line) != outcome(reference_split, line):
+            bad += 1
+            if bad <= 5:
+                print("MISMATCH: %r" % line)
+    return bad
+
+
+def timed(split, lines):
+    start = time.time()
+    for line in lines:
+        try:
+            split(line)
+        except ValueError:
+            pass
+    return time.time() - start
+
+
+def report(name, lines):
+    t_ref = timed(reference_split, lines)
+    t_new = timed(splitter.Splitter.split, lines)
+    print("%-10s %9d lines  reference %8.3fs  Splitter.split %8.3fs  speedup x%.1f" %
+          (name, len(lines), t_ref, t_new, t_ref / t_new if t_new > 0 else 0.0))
+
+
+def main(argv):
+    p = argparse.ArgumentParser(description="Benchmark Splitter.split")
+    p.add_argument("--lines", type=int, default=1000000, help="synthetic corpus size (default 1000000)")
+    p.add_argument("--seed", type=int, default=1, help="random seed for the synthetic corpus")
+    args = p.parse_args(argv[1:])
+
+    samples = sample_bodies()
+    corpus = synthetic_corpus(samples, args.lines, args.seed)
+
+    bad = check(samples) + check(corpus)
+    if bad > 0:
+        print("ERROR: %d lines split differently" % bad)
+        return 1
+
+    report("test_data", samples * max(1, 10000 // len(samples)))
+    report("synthetic", corpus)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
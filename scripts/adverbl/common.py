@@ -21,6 +21,8 @@
 
 # Common data storage and utilities
 
+import datetime
+import heapq
 import sys
 
 import nicknamer
@@ -46,6 +48,28 @@ class Common():
     # the output still shows connections, links, and link state costs.
     arg_index_data = True
 
+    # arg - lazy parsing or not
+    # With program arg --lazy the first pass over a log file only finds
+    # the AMQP lines and their time, connection, and performative. A line
+    # is parsed in full only when some report needs more than that.
+    arg_lazy = False
+
+    # arg - time window or not
+    # With program args --start and --end only the log lines in the
+    # window are parsed. (start, end) microseconds since 1970, either
+    # may be None.
+    arg_window = None
+
+    # arg - parse time filters or not
+    # With program args --router, --conn, --peer, and --performative
+    # only the AMQP lines that pass a parser.LineFilter are parsed.
+    arg_filter = None
+
+    # arg - parsed log cache directory or not
+    # With program arg --cache=DIR each log's parse is saved in DIR and
+    # a later run on the unchanged log takes it from there.
+    arg_cache = None
+
     # analysis_level_ludicrous
     # Adverbl tries too hard to cross reference data
     # Use these switchs to turn some of the biggest offenders off
@@ -104,6 +128,22 @@ class Common():
     # when --no-data is in effect, how many log lines were skipped?
     data_skipped = 0
 
+    # router.RouterIndex of the routers lists
+    router_index = None
+
+    # NoteworthyIndex of the merged log lines
+    noteworthy = None
+
+    # transfers_by_name - merged Router.transfers_by_name
+    # key = message short name
+    # val = list of transfer plf lines in time order
+    transfers_by_name = {}
+
+    # attaches_by_name - merged Router.attaches_by_name
+    # key = link short name
+    # val = list of attach plf lines in time order
+    attaches_by_name = {}
+
     def router_id_index(self, id):
         """
         Given a router full container name, return the index in router_ids table
@@ -114,27 +154,186 @@ class Common():
         return self.router_ids.index(id)
 
 
+LOG_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
 def log_letter_of(idx):
     '''
-    Return the letter A, B, C, ... from the index 0..n
+    Return the log id A, B, ... Z, AA, AB, ... ZZ, AAA, ... from the index 0..n
     :param idx:
-    :return: A..Z
+    :return: one or more letters A..Z
     '''
-    if idx >= 26:
-        sys.exit('ERROR: too many log files')
-    return "ABCDEFGHIJKLMNOPQRSTUVWXYZ"[idx]
+    res = ""
+    idx += 1
+    while idx > 0:
+        idx, rem = divmod(idx - 1, 26)
+        res = LOG_LETTERS[rem] + res
+    return res
 
 def index_of_log_letter(letter):
     '''
-    Return the index 0..25 of the firster letter of the 'letter' string
-    Raise error if out of range
+    Return the index 0..n of the log id letters that begin the 'letter' string.
+    'B0_3' gives 1 and 'AB0_3' gives 27.
+    Raise error if the string does not begin with a letter
     :param letter:
     :return:
     '''
-    val = "ABCDEFGHIJKLMNOPQRSTUVWXYZ".find(letter[0].upper())
-    if val < 0 or val > 25:
+    val = 0
+    for ch in letter:
+        i = LOG_LETTERS.find(ch.upper())
+        if i < 0:
+            break
+        val = val * 26 + i + 1
+    if val == 0:
         raise ValueError("index_of_log_letter Invalid log letter: %s", letter)
-    return val
+    return val - 1
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+# Log timestamps have a fixed layout: '2018-07-20 10:58:40.179187'.
+# Lines near each other share the date and hour so the datetime for
+# each 'YYYY-MM-DD HH' prefix is kept here.
+# key=timestamp text through the hour, val=(datetime, epoch_us_of(datetime))
+timestamp_hours = {}
+
+def epoch_us_of(dt):
+    '''
+    Return integer microseconds since 1970-01-01 for a naive datetime
+    :param dt:
+    :return:
+    '''
+    delta = dt - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+def parse_timestamp(text):
+    '''
+    Parse the timestamp at the head of a log line without strptime.
+    Gives the same datetime as strptime(text[:26], '%Y-%m-%d %H:%M:%S.%f')
+    when the timestamp has every digit. Anything else is left to strptime.
+    :param text: log line
+    :return: (datetime, microseconds since 1970-01-01), or None if the text is not in the layout
+    '''
+    if len(text) < 26 or text[13] != ':' or text[16] != ':' or text[19] != '.':
+        return None
+    prefix = text[:13]
+    hour = timestamp_hours.get(prefix)
+    if hour is None:
+        if not (prefix[4] == '-' and prefix[7] == '-' and prefix[10] == ' ' and
+                (prefix[0:4] + prefix[5:7] + prefix[8:10] + prefix[11:13]).isdigit()):
+            return None
+        try:
+            dt = datetime.datetime(int(prefix[0:4]), int(prefix[5:7]), int(prefix[8:10]), int(prefix[11:13]))
+        except ValueError:
+            return None
+        hour = (dt, epoch_us_of(dt))
+        timestamp_hours[prefix] = hour
+    if not (text[14:16] + text[17:19] + text[20:26]).isdigit():
+        return None
+    minute = int(text[14:16])
+    second = int(text[17:19])
+    usec = int(text[20:26])
+    if minute > 59 or second > 59:
+        return None
+    return (hour[0].replace(minute=minute, second=second, microsecond=usec),
+            hour[1] + (minute * 60 + second) * 1000000 + usec)
+
+def in_time_order(facts):
+    '''
+    :param facts: list of objects with an epoch_us attribute
+    :return: True if no fact is earlier than the one before it
+    '''
+    for i in range(1, len(facts)):
+        if facts[i].epoch_us < facts[i - 1].epoch_us:
+            return False
+    return True
+
+def _time_keyed(stream_index, facts):
+    for i, fact in enumerate(facts):
+        yield (fact.epoch_us, stream_index, i, fact)
+
+def time_merge(streams):
+    '''
+    Merge lists that are each in time order into one time ordered stream.
+    Facts with equal times come out in stream order and then list order,
+    just as sorted() of the concatenated lists would give them.
+    :param streams: lists of objects with an epoch_us attribute
+    :return: generator of the objects in time order
+    '''
+    for keyed in heapq.merge(*[_time_keyed(i, s) for i, s in enumerate(streams)]):
+        yield keyed[3]
+
+class TimeLine():
+    '''
+    Time ordered view of the per-router lists of log facts.
+    The merged order is not stored. Each pass over the timeline merges
+    the router lists again, k ways for k router instances.
+    '''
+    def __init__(self, streams):
+        self.streams = []
+        for s in streams:
+            # A router's lines are in time order unless its host clock stepped back.
+            self.streams.append(s if in_time_order(s) else sorted(s, key=lambda fact: fact.epoch_us))
+
+    def __iter__(self):
+        return time_merge(self.streams)
+
+    def __len__(self):
+        return sum(len(s) for s in self.streams)
+
+def merge_time_indexes(indexes):
+    '''
+    Merge per-router indexes of log facts into one index
+    :param indexes: dicts, key=anything, val=list of objects with an epoch_us attribute
+    :return: dict, key=every key in the indexes, val=list of the key's objects from all indexes in time order
+    '''
+    streams = {}
+    for index in indexes:
+        for key, facts in dict_iteritems(index):
+            if key not in streams:
+                streams[key] = []
+            streams[key].append(facts)
+    merged = {}
+    for key, lists in dict_iteritems(streams):
+        merged[key] = list(TimeLine(lists))
+    return merged
+
+class NoteworthyIndex():
+    '''
+    Log lines that are hard to find by hand: errors, presettled transfers,
+    and so on. Lines are kept in time order per category, named for the
+    LogLineData flag that selects them.
+    '''
+    categories = ["amqp_error", "transfer_settled", "transfer_more",
+                  "transfer_resume", "transfer_aborted", "flow_drain"]
+
+    def __init__(self, plfs=()):
+        '''
+        :param plfs: ParsedLogLines in time order
+        '''
+        # key=category, val=list of ParsedLogLine
+        self.lines = {}
+        for category in self.categories:
+            self.lines[category] = []
+        for plf in plfs:
+            self.add(plf)
+
+    def add(self, plf):
+        data = plf.data
+        if data.amqp_error:
+            self.lines["amqp_error"].append(plf)
+        if data.transfer_settled:
+            self.lines["transfer_settled"].append(plf)
+        if data.transfer_more:
+            self.lines["transfer_more"].append(plf)
+        if data.transfer_resume:
+            self.lines["transfer_resume"].append(plf)
+        if data.transfer_aborted:
+            self.lines["transfer_aborted"].append(plf)
+        if data.flow_drain:
+            self.lines["flow_drain"].append(plf)
+
+    def count(self, category):
+        return len(self.lines[category])
 
 class RestartRec():
     def __init__(self, _id, _router, _event, _datetime):
@@ -143,3 +342,53 @@ class RestartRec():
         self.event = _event
         self.datetime = _datetime
 
+
+
+if __name__ == "__main__":
+    import random
+    rng = random.Random(1)
+    samples = ["2018-07-20 10:58:40.179187 -0400 SERVER (trace) [2]:0 -> @begin(17)",
+               "2018-11-18 11:31:08.269 -0500 SERVER (trace) [1]:0",
+               "2018-02-30 10:58:40.179187", "2018-13-20 10:58:40.179187",
+               "2018-07-20 24:58:40.179187", "2018-07-20 10:60:40.179187",
+               "2018-07-20 10:58:60.179187", "2018-07-20 10:58:40,179187",
+               "2018-07-20 1:58:40.1791870", "no timestamp at all on this line"]
+    for i in range(2000):
+        t = EPOCH + datetime.timedelta(microseconds=rng.randrange(60 * 365 * 86400 * 1000000))
+        samples.append(t.strftime('%Y-%m-%d %H:%M:%S.%f') + " -0400 SERVER (trace)")
+    for text in samples:
+        try:
+            expect = datetime.datetime.strptime(text[:26], '%Y-%m-%d %H:%M:%S.%f')
+        except ValueError:
+            expect = None
+        got = parse_timestamp(text)
+        if got is None:
+            # strptime must handle it
+            continue
+        assert got[0] == expect, text
+        assert got[1] == epoch_us_of(expect), text
+    assert parse_timestamp(samples[0]) is not None
+
+    class Fact():
+        def __init__(self, epoch_us):
+            self.epoch_us = epoch_us
+    streams = [[Fact(rng.randrange(50)) for j in range(rng.randrange(30))] for i in range(6)]
+    streams[0].sort(key=lambda f: f.epoch_us)
+    streams[1].sort(key=lambda f: f.epoch_us)
+    expect = sorted([f for s in streams for f in s], key=lambda f: f.epoch_us)
+    assert list(time_merge([sorted(s, key=lambda f: f.epoch_us) for s in streams])) == expect
+    timeline = TimeLine(streams)
+    assert list(timeline) == expect and list(timeline) == expect
+    assert len(timeline) == len(expect)
+    index = merge_time_indexes([{"a": streams[0], "b": streams[2]}, {"a": streams[1]}])
+    assert sorted(index.keys()) == ["a", "b"]
+    assert index["a"] == sorted(streams[0] + streams[1], key=lambda f: f.epoch_us)
+    assert index["b"] == sorted(streams[2], key=lambda f: f.epoch_us)
+    assert parse_timestamp(samples[1]) is None
+
+    assert [log_letter_of(i) for i in [0, 25, 26, 27, 51, 52, 701, 702]] == \
+        ["A", "Z", "AA", "AB", "AZ", "BA", "ZZ", "AAA"]
+    for i in range(1000):
+        assert index_of_log_letter(log_letter_of(i) + "0_3") == i
+    assert index_of_log_letter("b1") == 1
+    print("OK")
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Link state costs
+#
+# Routers log the costs they compute to the other routers as
+#   ROUTER_LS (info) Computed costs: {u'A': 1, u'C': 51L, u'B': 101L}
+# The interior routers' latest costs form a matrix. The costs are stable
+# when every pair of interior routers agrees on the cost between them.
+
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+
+import ast
+import re
+
+import common
+
+PEER_COST_REBOOT = -1
+PEER_COST_ABSENT = 0
+
+# one "'name': cost," entry of a computed costs dict
+COSTS_ENTRY = re.compile(r"""\s*(u?)(?:'([^'\\]*)'|"([^"\\]*)")\s*:\s*(-?\d+)L?\s*(?:,|$)""")
+
+
+def parse_costs(line):
+    '''
+    Get the costs dict from a computed costs log line.
+    The usual {'name': cost, ...} dict is read without the python parser.
+    Anything else is handed to ast.literal_eval.
+    :param line: log line text holding a dict
+    :return: dict of router name to cost. Raises like literal_eval if the dict is malformed.
+    '''
+    sti = line.find("{")
+    eni = line.rfind("}")
+    if sti >= 0 and eni > sti and line[eni + 1:].strip() == "":
+        body = line[sti + 1:eni]
+        res = {}
+        pos = 0
+        while pos < len(body):
+            m = COSTS_ENTRY.match(body, pos)
+            if m is None:
+                break
+            name = m.group(2) if m.group(3) is None else m.group(3)
+            if m.group(1) and common.IS_PY2:
+                try:
+                    name = name.decode("ascii")
+                except UnicodeDecodeError:
+                    break
+            res[name] = int(m.group(4))
+            pos = m.end()
+        else:
+            return res
+    return ast.literal_eval(line[sti:])
+
+
+class CostMatrix():
+    '''
+    The latest costs computed by each interior router.
+    The number of router pairs that do not agree is kept as rows change
+    so telling if the costs are stable does not look at the whole matrix.
+    The matrix also records how long the costs took to settle each time
+    a restart or a cost change upset them.
+    '''
+    def __init__(self, routers):
+        '''
+        :param routers: interior router container names
+        '''
+        self.routers = []
+        for rtr in routers:
+            if rtr not in self.routers:
+                self.routers.append(rtr)
+        # rows[a][b] is the cost from a to b
+        self.rows = {}
+        for rtr in self.routers:
+            self.rows[rtr] = self.new_row(PEER_COST_REBOOT)
+        # number of router pairs without an agreed cost
+        n = len(self.routers)
+        self.mismatched = n * (n - 1) // 2
+        # when the costs were last upset and the changes seen since then
+        self.unsettled_at = None
+        self.changes = 0
+        # (upset at, stable at, changes) for each time the costs settled
+        self.convergences = []
+
+    def new_row(self, val):
+        '''
+        :param val: PEER_COST_REBOOT when router reboots, PEER_COST_ABSENT when router log line processed
+        :return: a costs row with every router at val
+        '''
+        res = {}
+        for rtr in self.routers:
+            res[rtr] = val
+        return res
+
+    def agree(self, a, b):
+        '''
+        :return: True if routers a and b have the same usable cost to each other
+        '''
+        cost = self.rows[a][b]
+        return cost == self.rows[b][a] and cost > PEER_COST_ABSENT
+
+    def is_stable(self):
+        return self.mismatched == 0
+
+    def update(self, name, costs, at):
+        '''
+        Replace a router's row with the costs it computed
+        :param name: router container name. Routers that are not interior are ignored.
+        :param costs: dict of router name to cost as from parse_costs
+        :param at: datetime of the log line
+        :return:
+        '''
+        if name not in self.rows:
+            return
+        row = self.new_row(PEER_COST_ABSENT)
+        for rtr in self.routers:
+            if rtr in costs:
+                row[rtr] = costs[rtr]
+        self.set_row(name, row, at)
+
+    def restart(self, name, at):
+        '''
+        Forget a router's costs when it restarts
+        :param name: router container name
+        :param at: datetime of the restart
+        :return:
+        '''
+        if name not in self.rows:
+            return
+        self.set_row(name, self.new_row(PEER_COST_REBOOT), at)
+
+    def set_row(self, name, row, at):
+        was_stable = self.is_stable()
+        others = [rtr for rtr in self.routers if rtr != name]
+        before = [self.agree(name, rtr) for rtr in others]
+        self.rows[name] = row
+        for rtr, agreed in zip(others, before):
+            if agreed != self.agree(name, rtr):
+                self.mismatched += 1 if agreed else -1
+        if was_stable:
+            if self.is_stable():
+                return
+            self.unsettled_at = at
+            self.changes = 0
+        elif self.unsettled_at is None:
+            self.unsettled_at = at
+        self.changes += 1
+        if self.is_stable():
+            self.convergences.append((self.unsettled_at, at, self.changes))
+            self.unsettled_at = None
+
+
+if __name__ == "__main__":
+    import datetime
+    line = str(" Computed costs: {u'A': 1, u'C': 51L, 'B': 101, \"D\" : -1}\n")
+    costs = parse_costs(line)
+    assert costs == {'A': 1, 'C': 51, 'B': 101, 'D': -1}
+    if common.IS_PY2:
+        assert [type(k) for k in sorted(costs)] == [unicode, str, unicode, str]
+    # the forms the fast path does not take still parse
+    assert parse_costs(" Computed costs: {'A\\x41': 1}") == {'AA': 1}
+    assert parse_costs(" Computed costs: {}") == {}
+    try:
+        parse_costs(" Computed costs: {'A': 1 'B': 2}")
+        assert False
+    except SyntaxError:
+        pass
+
+    t = [datetime.datetime(2018, 10, 15, 10, 0, s) for s in range(10)]
+    m = CostMatrix(["A", "B", "C", "A"])
+    assert m.routers == ["A", "B", "C"] and m.mismatched == 3
+    m.update("A", {"B": 1, "C": 2}, t[0])
+    m.update("B", {"A": 1, "C": 1}, t[1])
+    assert m.mismatched == 2 and m.unsettled_at == t[0]
+    m.update("C", {"A": 2, "B": 1}, t[2])
+    assert m.is_stable() and m.convergences == [(t[0], t[2], 3)]
+    m.update("X", {"A": 5}, t[3])
+    m.update("C", {"A": 2, "B": 1}, t[3])
+    assert m.is_stable() and len(m.convergences) == 1
+    m.restart("B", t[4])
+    assert m.mismatched == 2 and m.unsettled_at == t[4]
+    m.update("B", {"A": 1, "C": 1}, t[6])
+    assert m.convergences[1] == (t[4], t[6], 2)
+    one = CostMatrix(["A"])
+    assert one.is_stable()
+    print("OK")
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Log sources
+#
+# A router log named on the command line is one file or a comma separated
+# rotated set of files such as
+#   qdrouterd.log.2.xz,qdrouterd.log.1.gz,qdrouterd.log
+# Each file, or segment, may be plain text or gzip, bz2, or xz compressed.
+# The segments are read as one log in the time order of their first lines.
+#
+# Log line offsets name the segment and the byte offset within the
+# decompressed segment: segment index * SEGMENT_SPAN + offset.
+# For a single file the offset is the plain file offset.
+
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+
+import bz2
+import gzip
+import os
+import sys
+
+import common
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+SEGMENT_SPAN = 1 << 48
+
+# first bytes of the compressed file formats
+MAGIC = [(b"\x1f\x8b", "gzip"), (b"BZh", "bz2"), (b"\xfd7zXZ\x00", "xz")]
+
+# how many lines of a segment to look through for its first timestamp
+TIMESTAMP_SEARCH_LINES = 1000
+
+
+def compression_of(fn):
+    '''
+    :param fn: file name
+    :return: "gzip", "bz2", "xz", or None for a plain file
+    '''
+    with open(fn, 'rb') as infile:
+        head = infile.read(6)
+    for magic, kind in MAGIC:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+def open_segment(fn, kind):
+    '''
+    Open a log file for reading decompressed bytes
+    :param fn: file name
+    :param kind: compression_of(fn)
+    :return: binary file object
+    '''
+    if kind is None:
+        return open(fn, 'rb')
+    if kind == "gzip":
+        return gzip.GzipFile(fn, 'rb')
+    if kind == "bz2":
+        return bz2.BZ2File(fn, 'rb')
+    if lzma is None:
+        sys.exit('ERROR: log file %s is xz compressed and this python has no lzma module' % fn)
+    return lzma.LZMAFile(fn, 'rb')
+
+
+def first_timestamp(fn, kind):
+    '''
+    :param fn: file name
+    :param kind: compression_of(fn)
+    :return: microseconds since 1970-01-01 of the first timestamped line, or None
+    '''
+    infile = open_segment(fn, kind)
+    try:
+        for i in range(TIMESTAMP_SEARCH_LINES):
+            line = infile.readline()
+            if not line:
+                break
+            ts = common.parse_timestamp(line if common.IS_PY2 else line.decode("utf-8", "replace"))
+            if ts is not None:
+                return ts[1]
+    finally:
+        infile.close()
+    return None
+
+
+class LogSource():
+    '''
+    The segments of one router log in time order
+    '''
+    def __init__(self, name):
+        '''
+        :param name: log file name or comma separated rotated file names
+        '''
+        self.name = name
+        fns = [fn for fn in name.split(",") if fn != ""]
+        for fn in fns:
+            if not os.path.exists(fn):
+                sys.exit('ERROR: log file %s was not found!' % fn)
+        kinds = [compression_of(fn) for fn in fns]
+        segments = list(zip(fns, kinds))
+        if len(segments) > 1:
+            # segments with no timestamp at all go last
+            times = [first_timestamp(fn, kind) for fn, kind in segments]
+            order = sorted(range(len(segments)),
+                           key=lambda i: (times[i] is None, times[i] if times[i] is not None else 0))
+            segments = [segments[i] for i in order]
+        # list of (file name, compression kind) in time order
+        self.segments = segments
+        # size on disk
+        self.size = sum(os.path.getsize(fn) for fn, kind in segments)
+        # the open readers of compressed segments, for read_line
+        self.readers = {}
+
+    def is_plain_file(self):
+        '''
+        :return: True if the log is one uncompressed file, which may be mapped and split at any line
+        '''
+        return len(self.segments) == 1 and self.segments[0][1] is None
+
+    def display_name(self):
+        '''
+        :return: absolute paths of the segments in time order
+        '''
+        return ", ".join([os.path.abspath(fn) for fn, kind in self.segments])
+
+    def read_line(self, offset):
+        '''
+        Read one line back from the log
+        :param offset: segment index * SEGMENT_SPAN + offset in the segment
+        :return: the line as bytes
+        '''
+        seg_i, seg_offset = divmod(offset, SEGMENT_SPAN)
+        fn, kind = self.segments[seg_i]
+        if kind is None:
+            with open(fn, 'rb') as infile:
+                infile.seek(seg_offset)
+                return infile.readline()
+        # A compressed segment can only seek by decompressing up to the
+        # offset, so its reader is kept open for reads further along.
+        reader = self.readers.get(seg_i)
+        if reader is None:
+            reader = open_segment(fn, kind)
+            self.readers[seg_i] = reader
+        reader.seek(seg_offset)
+        return reader.readline()
+
+
+# the LogSource for each log name seen by this process
+sources = {}
+
+
+def source_of(name):
+    '''
+    :param name: log file name or comma separated rotated file names
+    :return: LogSource for the name
+    '''
+    source = sources.get(name)
+    if source is None:
+        source = LogSource(name)
+        sources[name] = source
+    return source
+
+
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+    tmp = tempfile.mkdtemp()
+    try:
+        with open('test_data/A-two-instances.log', 'rb') as f:
+            lines = f.readlines()
+        half = len(lines) // 2
+        old_fn = os.path.join(tmp, "A.log.1.gz")
+        new_fn = os.path.join(tmp, "A.log")
+        with gzip.GzipFile(old_fn, 'wb') as f:
+            f.write(b"".join(lines[:half]))
+        with open(new_fn, 'wb') as f:
+            f.write(b"".join(lines[half:]))
+        bz_fn = os.path.join(tmp, "A.log.bz2")
+        bzf = bz2.BZ2File(bz_fn, 'wb')
+        bzf.write(b"".join(lines))
+        bzf.close()
+        assert compression_of(old_fn) == "gzip"
+        assert compression_of(new_fn) is None
+        assert compression_of(bz_fn) == "bz2"
+
+        # the newer segment named first still comes second
+        src = LogSource(new_fn + "," + old_fn)
+        assert [fn for fn, kind in src.segments] == [old_fn, new_fn]
+        assert not src.is_plain_file()
+        assert src.read_line(len(lines[0])) == lines[1]
+        assert src.read_line(SEGMENT_SPAN + len(lines[half])) == lines[half + 1]
+        assert src.read_line(0) == lines[0]
+        assert LogSource(new_fn).is_plain_file()
+        assert LogSource(bz_fn).read_line(len(lines[0]) + len(lines[1])) == lines[2]
+    finally:
+        shutil.rmtree(tmp)
+    print("OK")
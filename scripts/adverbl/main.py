@@ -21,7 +21,7 @@
 
 # Adverbl concepts
 # * Multiple log files may be displayed at the same time.
-#   Each log file gets a letter prefix: A, B, C, ...
+#   Each log file gets a letter prefix: A, B, C, ... Z, AA, AB, ...
 # * Log AMQP proton trace channel numbers get prefix
 #    [1] becomes [A-1]
 # * The log file line numbers are equivalent to a wireshark trace frame number.
@@ -33,17 +33,26 @@ from __future__ import division
 from __future__ import absolute_import
 from __future__ import print_function
 
-import ast
 import cgi
+import datetime
+import itertools
+import multiprocessing
 import os
 import sys
 import traceback
 
 import common
+import link_state
+import log_source
+import parse_cache
 import parser
 import router
 import text
 
+# modules shared with adverb.py live in the parent directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import adverb_profile
+
 
 def time_offset(ttest, t0):
     """
@@ -58,6 +67,33 @@ def time_offset(ttest, t0):
     return "%0.06f" % t
 
 
+def time_arg_us(text):
+    """
+    Convert a --start or --end time to microseconds since 1970.
+    :param text: 'YYYY-MM-DD HH:MM:SS' with an optional fraction of a second.
+                 'T' may stand in for the space.
+    :return: microseconds, or None if the text is not such a time
+    """
+    text = text.replace("T", " ", 1)
+    if len(text) < 19 or len(text) > 26:
+        return None
+    if len(text) == 19:
+        text += "."
+    ts = common.parse_timestamp(text + "0" * (26 - len(text)))
+    return None if ts is None else ts[1]
+
+
+def window_edge(at_us, if_none):
+    """
+    :param at_us: microseconds since 1970, or None
+    :param if_none: text to use for None
+    :return: the time as it appears in log lines
+    """
+    if at_us is None:
+        return if_none
+    return str(common.EPOCH + datetime.timedelta(microseconds=at_us))
+
+
 def show_noteworthy_line(plf, comn):
     """
     Given a log line, print the noteworthy display line
@@ -80,46 +116,134 @@ def main_except(argv):
     """
     Given a list of log file names, send the javascript web page to stdout
     """
+    profiler = adverb_profile.from_args("adverbl", argv)
+
+    usage = ('Usage: %s [--no-data] [--lazy] [--start=time] [--end=time] '
+             '[--router=letters] [--conn=ids] [--peer=names] [--performative=names] [--cache=dir] [--jobs=N] [--chunk-size=bytes] [--profile[=json-file]] [--profile-stage=stage[:prof-file]] '
+             'log-file-name [log-file-name ...]' % argv[0])
     if len(argv) < 2:
-        sys.exit('Usage: %s [--no-data] log-file-name [log-file-name ...]' % argv[0])
+        sys.exit(usage)
 
     # Instantiate a common block
     comn = common.Common()
 
-    # optparse - look for --no-data switch
-    if argv[1] == "--no-data":
-        comn.arg_index_data = False
+    # optparse - look for --no-data and --jobs switches
+    jobs = multiprocessing.cpu_count()
+    chunk_size = 64 * 1024 * 1024
+    # key=switch, val=LineFilter kind
+    filter_switches = {"--router": "router", "--conn": "connection",
+                       "--peer": "peer", "--performative": "performative"}
+    while len(argv) > 1 and argv[1].startswith("--"):
+        if argv[1] == "--no-data":
+            comn.arg_index_data = False
+        elif argv[1] == "--lazy":
+            comn.arg_lazy = True
+            comn.per_link_detail = False
+            comn.message_progress_tables = False
+        elif argv[1].startswith("--start=") or argv[1].startswith("--end="):
+            name, value = argv[1].split("=", 1)
+            at_us = time_arg_us(value)
+            if at_us is None:
+                sys.exit('ERROR: %s time %s is not YYYY-MM-DD HH:MM:SS[.ffffff]' % (name, value))
+            window = comn.arg_window if comn.arg_window is not None else (None, None)
+            comn.arg_window = (at_us, window[1]) if name == "--start" else (window[0], at_us)
+        elif argv[1].split("=", 1)[0] in filter_switches:
+            name, value = argv[1].split("=", 1)
+            if comn.arg_filter is None:
+                comn.arg_filter = parser.LineFilter()
+            comn.arg_filter.add(filter_switches[name], [p for p in value.split(",") if p != ""])
+        elif argv[1].startswith("--cache="):
+            comn.arg_cache = argv[1][len("--cache="):]
+        elif argv[1].startswith("--jobs="):
+            try:
+                jobs = int(argv[1][len("--jobs="):])
+            except ValueError:
+                sys.exit(usage)
+        elif argv[1].startswith("--chunk-size="):
+            try:
+                chunk_size = int(argv[1][len("--chunk-size="):])
+            except ValueError:
+                sys.exit(usage)
+        else:
+            break
         del argv[1]
+    if comn.arg_window is not None and None not in comn.arg_window and comn.arg_window[0] >= comn.arg_window[1]:
+        sys.exit('ERROR: --start time must be before --end time')
 
-    # process the log files and add the results to router_array
-    for log_i in range(0, len(sys.argv) - 1):
-        arg_log_file = sys.argv[log_i + 1]
+    for arg_log_file in sys.argv[1:]:
+        # exits if a file is not found
+        log_source.source_of(arg_log_file)
         comn.log_fns.append(arg_log_file)
         comn.n_logs += 1
 
-        if not os.path.exists(arg_log_file):
-            sys.exit('ERROR: log file %s was not found!' % arg_log_file)
-
-        # parse the log file
-        rtrs = parser.parse_log_file(arg_log_file, log_i, comn)
-        comn.routers.append(rtrs)
-
-        # marshall facts about the run
-        for rtr in rtrs:
-            rtr.discover_connection_facts(comn)
-
-    # Create lists of various things sorted by time
-    tree = []  # log line
-    ls_tree = []  # link state lines
-    rr_tree = []  # restart records
-    for rtrlist in comn.routers:
-        for rtr in rtrlist:
-            tree += rtr.lines
-            ls_tree += rtr.router_ls
-            rr_tree.append(rtr.restart_rec)
-    tree = sorted(tree, key=lambda lfl: lfl.datetime)
-    ls_tree = sorted(ls_tree, key=lambda lfl: lfl.datetime)
-    rr_tree = sorted(rr_tree, key=lambda lfl: lfl.datetime)
+    # With --cache the logs parsed by an earlier run are taken from the cache
+    cache = None
+    cached = [None] * comn.n_logs
+    if comn.arg_cache is not None:
+        cache = parse_cache.ParseCache(comn.arg_cache, comn)
+        cached = [cache.load(fn, log_i) for log_i, fn in enumerate(comn.log_fns)]
+    to_parse = [log_i for log_i in range(comn.n_logs) if cached[log_i] is None]
+
+    # Parse the log files in a process pool when there is more than one
+    # file or a file larger than chunk_size, which is parsed in pieces.
+    # Results are taken in log file order so that merged short names are
+    # numbered the same as by a serial parse.
+    pool = None
+    pending = [None] * comn.n_logs
+    try:
+        if jobs > 1 and (len(to_parse) > 1 or
+                         any(log_source.source_of(comn.log_fns[log_i]).size > chunk_size for log_i in to_parse)):
+            pool = multiprocessing.Pool(jobs)
+            for log_i in to_parse:
+                file_job = parser.log_chunk_jobs(comn.log_fns[log_i], log_i, comn.arg_index_data, pool, chunk_size,
+                                                 comn.arg_lazy, comn.arg_window, comn.arg_filter)
+                pending[log_i] = [pool.apply_async(parser.parse_log_chunk_job, (job,)) for job in file_job]
+
+        # process the log files and add the results to router_array
+        for log_i in range(comn.n_logs):
+            # parse the log file
+            profiler.begin("parse")
+            fn = comn.log_fns[log_i]
+            if cached[log_i] is not None:
+                rtrs = parser.adopt_parsed_chunks(cached[log_i], comn)
+            elif pending[log_i] is not None:
+                results = [res.get() for res in pending[log_i]]
+                if cache is not None:
+                    cache.store(fn, log_i, results)
+                rtrs = parser.adopt_parsed_chunks(results, comn)
+            elif cache is not None:
+                # parse with private name tables as a worker would so the result can be saved
+                results = [parser.parse_log_chunk_job(job) for job in
+                           parser.log_chunk_jobs(fn, log_i, comn.arg_index_data, None, None, comn.arg_lazy,
+                                                 comn.arg_window, comn.arg_filter)]
+                cache.store(fn, log_i, results)
+                rtrs = parser.adopt_parsed_chunks(results, comn)
+            else:
+                rtrs = parser.parse_log_file(fn, log_i, comn)
+            comn.routers.append(rtrs)
+
+            # marshall facts about the run
+            profiler.begin("details")
+            for rtr in rtrs:
+                rtr.discover_connection_facts(comn)
+    except:
+        if pool is not None:
+            pool.terminate()
+        raise
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    # Create time ordered views of various things.
+    # Each router's lists are already in time order; the views merge them.
+    profiler.begin("merge")
+    all_rtrs = [rtr for rtrlist in comn.routers for rtr in rtrlist]
+    tree = common.TimeLine([rtr.lines for rtr in all_rtrs])  # log line
+    ls_tree = common.TimeLine([rtr.router_ls for rtr in all_rtrs])  # link state lines
+    rr_tree = common.TimeLine([[rtr.restart_rec] for rtr in all_rtrs])  # restart records
+    if not comn.arg_lazy:
+        comn.noteworthy = common.NoteworthyIndex(tree)
 
     # Back-propagate a router name/version/mode to each list's router0.
     # Complain if container name or version changes between instances.
@@ -161,8 +285,11 @@ def main_except(argv):
             comn.conn_to_frame_map.update(rtr.conn_to_frame_map)
 
     # generate router-to-router connection peer relationships
+    comn.router_index = router.RouterIndex(comn.routers)
     peer_list = []
-    for plf in tree:
+    peer_set = set()
+    # lines left out by the filters still pair their connections
+    for plf in itertools.chain(tree, *[rtr.peer_opens for rtr in all_rtrs]):
         if plf.data.name == "open" and plf.data.direction_is_in():
             cid = plf.data.conn_id  # the router that generated this log file
             if "properties" in plf.data.described_type.dict:
@@ -170,11 +297,12 @@ def main_except(argv):
                                                                            "")  # router that sent the open
                 if peer_conn != "" and plf.data.conn_peer != "":
                     pid_peer = plf.data.conn_peer.strip('\"')
-                    rtr, rtridx = router.which_router_id_tod(comn.routers, pid_peer, plf.datetime)
+                    rtr, rtridx = comn.router_index.which_router_id_tod(pid_peer, plf.datetime)
                     if rtr is not None:
                         pid = rtr.conn_id(peer_conn)
-                        hit = sorted((cid, pid))
-                        if hit not in peer_list:
+                        hit = tuple(sorted((cid, pid)))
+                        if hit not in peer_set:
+                            peer_set.add(hit)
                             peer_list.append(hit)
 
     for (key, val) in peer_list:
@@ -191,6 +319,7 @@ def main_except(argv):
     #
     # Start producing the output stream
     #
+    profiler.begin("render")
     print(text.web_page_head())
 
     #
@@ -258,6 +387,21 @@ def main_except(argv):
     if not comn.arg_index_data:
         print("--no-data switch in effect. %d log lines skipped" % comn.data_skipped)
         print("<p><hr>")
+    if comn.arg_lazy:
+        print("--lazy switch in effect. AMQP frames are parsed only as far as the connection, "
+              "chronology, and link state tables need.")
+        print("<p><hr>")
+    if comn.arg_window is not None:
+        print("--start/--end switches in effect. Log lines from %s up to %s are shown." %
+              (window_edge(comn.arg_window[0], "the start of the logs"),
+               window_edge(comn.arg_window[1], "the end of the logs")))
+        print("<p><hr>")
+    if comn.arg_filter is not None:
+        skipped = comn.arg_filter.skipped
+        print("Filters in effect: %s. %d log lines filtered out (%s)." %
+              (cgi.escape(comn.arg_filter.describe()), sum(skipped.values()),
+               ", ".join(["%d by %s" % (skipped[kind], kind) for kind in comn.arg_filter.kinds])))
+        print("<p><hr>")
 
     # file(s) included in this doc
     print("<a name=\"c_logfiles\"></a>")
@@ -269,11 +413,11 @@ def main_except(argv):
         if len(rtrlist) > 0:
             print("<tr><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td></tr>" %
                   (common.log_letter_of(i), rtrlist[0].container_name, rtrlist[0].version, rtrlist[0].mode,
-                   str(len(rtrlist)), os.path.abspath(comn.log_fns[i])))
+                   str(len(rtrlist)), log_source.source_of(comn.log_fns[i]).display_name()))
         else:
             print("<tr><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td></tr>" %
                   (common.log_letter_of(i), text.nbsp(), text.nbsp(),
-                   str(len(rtrlist)), os.path.abspath(comn.log_fns[i])))
+                   str(len(rtrlist)), log_source.source_of(comn.log_fns[i]).display_name()))
     print("</table>")
     print("<hr>")
 
@@ -329,10 +473,15 @@ def main_except(argv):
                 id = rtr.conn_id(conn)  # this router's full connid 'A0_3'
                 peer = rtr.conn_peer_display.get(id, "")  # peer container id
                 peerconnid = comn.conn_peers_connid.get(id, "")
-                n_links = rtr.details.links_in_connection(id)
-                tLinks += n_links
-                errs = sum(1 for plf in rtr.conn_to_frame_map[id] if plf.data.amqp_error)
-                tErrs += errs
+                if comn.arg_lazy:
+                    # link and error counts need every frame parsed in full
+                    n_links = text.nbsp()
+                    errs = text.nbsp()
+                else:
+                    n_links = rtr.details.links_in_connection(id)
+                    tLinks += n_links
+                    errs = sum(1 for plf in rtr.conn_to_frame_map[id] if plf.data.amqp_error)
+                    tErrs += errs
                 stime = rtr.conn_open_time.get(id, text.nbsp())
                 if stime != text.nbsp():
                     stime = stime.datetime
@@ -343,13 +492,16 @@ def main_except(argv):
                 print("<td> <input type=\"checkbox\" id=\"cb_sel_%s\" " % id)
                 print("checked=\"true\" onclick=\"javascript:show_if_cb_sel_%s()\"> </td>" % (id))
                 print("<td>%s</td><td><a href=\"#cd_%s\">%s</a></td><td>%s</td><td>%s</td><td>%s</td><td>%s</td>"
-                      "<td>%d</td><td>%s</td><td>%d</td><td>%s</td><td>%s</td></tr>" %
+                      "<td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td></tr>" %
                       (rid, id, id, rtr.conn_dir[id], peerconnid, peer, rtr.conn_log_lines[id], n_links,
                        rtr.conn_xfer_bytes[id], errs, stime, etime))
                 tLines += rtr.conn_log_lines[id]
                 tBytes += rtr.conn_xfer_bytes[id]
+    if comn.arg_lazy:
+        tLinks = text.nbsp()
+        tErrs = text.nbsp()
     print(
-        "<td>Total</td><td>%d</td><td> </td><td> </td><td> </td><td> </td><td>%d</td><td>%d</td><td>%d</td><td>%d</td></tr>" %
+        "<td>Total</td><td>%d</td><td> </td><td> </td><td> </td><td> </td><td>%d</td><td>%s</td><td>%d</td><td>%s</td></tr>" %
         (tConn, tLines, tLinks, tBytes, tErrs))
     print("</table>")
 
@@ -396,6 +548,7 @@ def main_except(argv):
     print("<hr>")
 
     # connection details
+    profiler.begin("connection_details")
     print("<a name=\"c_conndetails\"></a>")
     print("<h3>Connection Details</h3>")
     if comn.per_link_detail:
@@ -407,132 +560,74 @@ def main_except(argv):
     print("<hr>")
 
     # noteworthy log lines: highlight errors and stuff
+    profiler.begin("noteworthy")
     print("<a name=\"c_noteworthy\"></a>")
     print("<h3>Noteworthy</h3>")
-    n_errors = 0
-    n_settled = 0
-    n_more = 0
-    n_resume = 0
-    n_aborted = 0
-    n_drain = 0
-    for plf in tree:
-        if plf.data.amqp_error:
-            n_errors += 1
-        if plf.data.transfer_settled:
-            n_settled += 1
-        if plf.data.transfer_more:
-            n_more += 1
-        if plf.data.transfer_resume:
-            n_resume += 1
-        if plf.data.transfer_aborted:
-            n_aborted += 1
-        if plf.data.flow_drain:
-            n_drain += 1
-    # amqp errors
-    print("<a href=\"javascript:toggle_node('noteworthy_errors')\">%s%s</a> AMQP errors: %d<br>" %
-          (text.lozenge(), text.nbsp(), n_errors))
-    print(" <div width=\"100%%\"; "
-          "style=\"display:none; font-weight: normal; margin-bottom: 2px; margin-left: 10px\" "
-          "id=\"noteworthy_errors\">")
-    for plf in tree:
-        if plf.data.amqp_error:
-            show_noteworthy_line(plf, comn)
-    print("</div>")
-    # transfers with settled=true
-    print("<a href=\"javascript:toggle_node('noteworthy_settled')\">%s%s</a> Presettled transfers: %d<br>" %
-          (text.lozenge(), text.nbsp(), n_settled))
-    print(" <div width=\"100%%\"; "
-          "style=\"display:none; font-weight: normal; margin-bottom: 2px; margin-left: 10px\" "
-          "id=\"noteworthy_settled\">")
-    for plf in tree:
-        if plf.data.transfer_settled:
-            show_noteworthy_line(plf, comn)
-    print("</div>")
-    # transfers with more=true
-    print("<a href=\"javascript:toggle_node('noteworthy_more')\">%s%s</a> Partial transfers with 'more' set: %d<br>" %
-          (text.lozenge(), text.nbsp(), n_more))
-    print(" <div width=\"100%%\"; "
-          "style=\"display:none; font-weight: normal; margin-bottom: 2px; margin-left: 10px\" "
-          "id=\"noteworthy_more\">")
-    for plf in tree:
-        if plf.data.transfer_more:
-            show_noteworthy_line(plf, comn)
-    print("</div>")
-    # transfers with resume=true, whatever that is
-    print("<a href=\"javascript:toggle_node('noteworthy_resume')\">%s%s</a> Resumed transfers: %d<br>" %
-          (text.lozenge(), text.nbsp(), n_resume))
-    print(" <div width=\"100%%\"; "
-          "style=\"display:none; font-weight: normal; margin-bottom: 2px; margin-left: 10px\" "
-          "id=\"noteworthy_resume\">")
-    for plf in tree:
-        if plf.data.transfer_resume:
-            show_noteworthy_line(plf, comn)
-    print("</div>")
-    # transfers with abort=true
-    print("<a href=\"javascript:toggle_node('noteworthy_aborts')\">%s%s</a> Aborted transfers: %d<br>" %
-          (text.lozenge(), text.nbsp(), n_aborted))
-    print(" <div width=\"100%%\"; "
-          "style=\"display:none; font-weight: normal; margin-bottom: 2px; margin-left: 10px\" "
-          "id=\"noteworthy_aborts\">")
-    for plf in tree:
-        if plf.data.transfer_aborted:
-            show_noteworthy_line(plf, comn)
-    print("</div>")
-    # flow with drain=true
-    print("<a href=\"javascript:toggle_node('noteworthy_drain')\">%s%s</a> Flow with 'drain' set: %d<br>" %
-          (text.lozenge(), text.nbsp(), n_drain))
-    print(" <div width=\"100%%\"; "
-          "style=\"display:none; font-weight: normal; margin-bottom: 2px; margin-left: 10px\" "
-          "id=\"noteworthy_drain\">")
-    for plf in tree:
-        if plf.data.flow_drain:
-            show_noteworthy_line(plf, comn)
-    print("</div>")
+    if comn.arg_lazy:
+        print("--lazy switch in effect. Noteworthy lines are not shown.<br>")
+    else:
+        for category, title, div_id in [("amqp_error", "AMQP errors", "noteworthy_errors"),
+                                        ("transfer_settled", "Presettled transfers", "noteworthy_settled"),
+                                        ("transfer_more", "Partial transfers with 'more' set", "noteworthy_more"),
+                                        ("transfer_resume", "Resumed transfers", "noteworthy_resume"),
+                                        ("transfer_aborted", "Aborted transfers", "noteworthy_aborts"),
+                                        ("flow_drain", "Flow with 'drain' set", "noteworthy_drain")]:
+            print("<a href=\"javascript:toggle_node('%s')\">%s%s</a> %s: %d<br>" %
+                  (div_id, text.lozenge(), text.nbsp(), title, comn.noteworthy.count(category)))
+            print(" <div width=\"100%%\"; "
+                  "style=\"display:none; font-weight: normal; margin-bottom: 2px; margin-left: 10px\" "
+                  "id=\"" + div_id + "\">")
+            for plf in comn.noteworthy.lines[category]:
+                show_noteworthy_line(plf, comn)
+            print("</div>")
     print("<hr>")
 
     # the proton log lines
+    profiler.begin("log_lines")
     # log lines in         f_A_116
     # log line details in  f_A_116_d
     print("<a name=\"c_logdata\"></a>")
     print("<h3>Log data</h3>")
-    for plf in tree:
-        l_dict = plf.data.described_type.dict
-        print("<div width=\"100%%\" style=\"display:block  margin-bottom: 2px\" id=\"%s\">" % plf.fid)
-        print("<a name=\"%s\"></a>" % plf.fid)
-        detailname = plf.fid + "_d"  # type: str
-        loz = "<a href=\"javascript:toggle_node('%s')\">%s%s</a>" % (detailname, text.lozenge(), text.nbsp())
-        rtr = plf.router
-        rid = comn.router_display_names[rtr.log_index]
-
-        peerconnid = "%s" % comn.conn_peers_connid.get(plf.data.conn_id, "")
-        peer = rtr.conn_peer_display.get(plf.data.conn_id, "")  # peer container id
-        print(loz, plf.datetime, ("%s#%d" % (plf.prefixi, plf.lineno)), rid, ("[%s]" % plf.data.conn_id),
-              plf.data.direction, ("[%s]" % peerconnid), peer,
-              plf.data.web_show_str, plf.data.disposition_display, "<br>")
-        print(" <div width=\"100%%\"; "
-              "style=\"display:none; font-weight: normal; margin-bottom: 2px; margin-left: 10px\" "
-              "id=\"%s\">" %
-              detailname)
-        for key in sorted(common.dict_iterkeys(l_dict)):
-            val = l_dict[key]
-            print("%s : %s <br>" % (key, cgi.escape(str(val))))
-        if plf.data.name == "transfer":
-            print("Header and annotations : %s <br>" % plf.data.transfer_hdr_annos)
-        print("</div>")
-        print("</div>")
+    if comn.arg_lazy:
+        print("--lazy switch in effect. Log data is not shown.<br>")
+    else:
+        for plf in tree:
+            l_dict = plf.data.described_type.dict
+            print("<div width=\"100%%\" style=\"display:block  margin-bottom: 2px\" id=\"%s\">" % plf.fid)
+            print("<a name=\"%s\"></a>" % plf.fid)
+            detailname = plf.fid + "_d"  # type: str
+            loz = "<a href=\"javascript:toggle_node('%s')\">%s%s</a>" % (detailname, text.lozenge(), text.nbsp())
+            rtr = plf.router
+            rid = comn.router_display_names[rtr.log_index]
+
+            peerconnid = "%s" % comn.conn_peers_connid.get(plf.data.conn_id, "")
+            peer = rtr.conn_peer_display.get(plf.data.conn_id, "")  # peer container id
+            print(loz, plf.datetime, ("%s#%d" % (plf.prefixi, plf.lineno)), rid, ("[%s]" % plf.data.conn_id),
+                  plf.data.direction, ("[%s]" % peerconnid), peer,
+                  plf.data.web_show_str, plf.data.disposition_display, "<br>")
+            print(" <div width=\"100%%\"; "
+                  "style=\"display:none; font-weight: normal; margin-bottom: 2px; margin-left: 10px\" "
+                  "id=\"%s\">" %
+                  detailname)
+            for key in sorted(common.dict_iterkeys(l_dict)):
+                val = l_dict[key]
+                print("%s : %s <br>" % (key, cgi.escape(str(val))))
+            if plf.data.name == "transfer":
+                print("Header and annotations : %s <br>" % plf.data.transfer_hdr_annos)
+            print("</div>")
+            print("</div>")
     print("<hr>")
 
     # data traversing network
+    profiler.begin("message_progress")
     print("<a name=\"c_messageprogress\"></a>")
     print("<h3>Message progress</h3>")
     if comn.message_progress_tables:
+      comn.transfers_by_name = common.merge_time_indexes([rtr.transfers_by_name for rtr in all_rtrs])
       for i in range(0, comn.shorteners.short_data_names.len()):
         sname = comn.shorteners.short_data_names.shortname(i)
-        size = 0
-        for plf in tree:
-            if plf.data.name == "transfer" and plf.transfer_short_name == sname:
-                size = plf.data.transfer_size
-                break
+        transfers = comn.transfers_by_name.get(sname, [])
+        size = transfers[0].data.transfer_size if len(transfers) > 0 else 0
         print("<a name=\"%s\"></a> <h4>%s (%s)" % (sname, sname, size))
         print(" <span> <a href=\"javascript:toggle_node('%s')\"> %s</a>" % ("data_" + sname, text.lozenge()))
         print(" <div width=\"100%%\"; style=\"display:none; font-weight: normal; margin-bottom: 2px\" id=\"%s\">" %
@@ -546,28 +641,27 @@ def main_except(argv):
             "<th>T delta</th> <th>T elapsed</th><th>Settlement</th><th>S elapsed</th></tr>")
         t0 = None
         tlast = None
-        for plf in tree:
-            if plf.data.name == "transfer" and plf.transfer_short_name == sname:
-                if t0 is None:
-                    t0 = plf.datetime
-                    tlast = plf.datetime
-                    delta = "0.000000"
-                    epsed = "0.000000"
-                else:
-                    delta = time_offset(plf.datetime, tlast)
-                    epsed = time_offset(plf.datetime, t0)
-                    tlast = plf.datetime
-                sepsed = ""
-                if plf.data.final_disposition is not None:
-                    sepsed = time_offset(plf.data.final_disposition.datetime, t0)
-                rid = plf.router.iname
-                peerconnid = "%s" % comn.conn_peers_connid.get(plf.data.conn_id, "")
-                peer = plf.router.conn_peer_display.get(plf.data.conn_id, "")  # peer container id
-                print("<tr><td>%s</td> <td>%s</td> <td>%s</td> <td>%s</td> <td>%s</td> <td>%s</td> "
-                      "<td>%s</td> <td>%s</td> <td>%s</td> <td>%s</td> <td>%s</td> </tr>" %
-                      (plf.adverbl_link_to(), plf.datetime, rid, plf.data.conn_id, plf.data.direction,
-                       peerconnid, peer, delta, epsed,
-                       plf.data.disposition_display, sepsed))
+        for plf in transfers:
+            if t0 is None:
+                t0 = plf.datetime
+                tlast = plf.datetime
+                delta = "0.000000"
+                epsed = "0.000000"
+            else:
+                delta = time_offset(plf.datetime, tlast)
+                epsed = time_offset(plf.datetime, t0)
+                tlast = plf.datetime
+            sepsed = ""
+            if plf.data.final_disposition is not None:
+                sepsed = time_offset(plf.data.final_disposition.datetime, t0)
+            rid = plf.router.iname
+            peerconnid = "%s" % comn.conn_peers_connid.get(plf.data.conn_id, "")
+            peer = plf.router.conn_peer_display.get(plf.data.conn_id, "")  # peer container id
+            print("<tr><td>%s</td> <td>%s</td> <td>%s</td> <td>%s</td> <td>%s</td> <td>%s</td> "
+                  "<td>%s</td> <td>%s</td> <td>%s</td> <td>%s</td> <td>%s</td> </tr>" %
+                  (plf.adverbl_link_to(), plf.datetime, rid, plf.data.conn_id, plf.data.direction,
+                   peerconnid, peer, delta, epsed,
+                   plf.data.disposition_display, sepsed))
         print("</table>")
 
     print("<hr>")
@@ -575,6 +669,7 @@ def main_except(argv):
     # link names traversing network
     print("<a name=\"c_linkprogress\"></a>")
     print("<h3>Link name propagation</h3>")
+    comn.attaches_by_name = common.merge_time_indexes([rtr.attaches_by_name for rtr in all_rtrs])
     for i in range(0, comn.shorteners.short_link_names.len()):
         if comn.shorteners.short_link_names.len() == 0:
             break
@@ -589,28 +684,28 @@ def main_except(argv):
               "<th>T delta</th> <th>T elapsed</th></tr>")
         t0 = None
         tlast = None
-        for plf in tree:
-            if plf.data.name == "attach" and plf.data.link_short_name == sname:
-                if t0 is None:
-                    t0 = plf.datetime
-                    delta = "0.000000"
-                    epsed = "0.000000"
-                else:
-                    delta = time_offset(plf.datetime, tlast)
-                    epsed = time_offset(plf.datetime, t0)
-                tlast = plf.datetime
-                rid = plf.router.iname
-                peerconnid = "%s" % comn.conn_peers_connid.get(plf.data.conn_id, "")
-                peer = plf.router.conn_peer_display.get(plf.data.conn_id, "")  # peer container id
-                print("<tr><td>%s</td> <td>%s</td> <td>%s</td> <td>%s</td> <td>%s</td> <td>%s</td> "
-                      "<td>%s</td> <td>%s</td> <td>%s</td></tr>" %
-                      (plf.adverbl_link_to(), plf.datetime, rid, plf.data.conn_id, plf.data.direction, peerconnid, peer,
-                       delta, epsed))
+        for plf in comn.attaches_by_name.get(sname, []):
+            if t0 is None:
+                t0 = plf.datetime
+                delta = "0.000000"
+                epsed = "0.000000"
+            else:
+                delta = time_offset(plf.datetime, tlast)
+                epsed = time_offset(plf.datetime, t0)
+            tlast = plf.datetime
+            rid = plf.router.iname
+            peerconnid = "%s" % comn.conn_peers_connid.get(plf.data.conn_id, "")
+            peer = plf.router.conn_peer_display.get(plf.data.conn_id, "")  # peer container id
+            print("<tr><td>%s</td> <td>%s</td> <td>%s</td> <td>%s</td> <td>%s</td> <td>%s</td> "
+                  "<td>%s</td> <td>%s</td> <td>%s</td></tr>" %
+                  (plf.adverbl_link_to(), plf.datetime, rid, plf.data.conn_id, plf.data.direction, peerconnid, peer,
+                   delta, epsed))
         print("</table>")
 
     print("<hr>")
 
     # short data index
+    profiler.begin("render")
     print("<a name=\"c_rtrdump\"></a>")
     comn.shorteners.short_rtr_names.htmlDump(False)
     print("<hr>")
@@ -628,6 +723,7 @@ def main_except(argv):
     print("<hr>")
 
     # link state info
+    profiler.begin("link_state")
     # merge link state and restart records into single time based list
     cl = []
     for rtrlist in comn.routers:
@@ -644,31 +740,15 @@ def main_except(argv):
     costs_pub = {}
     for i in range(0, comn.n_logs):
         costs_pub[comn.router_ids[i]] = []
+    known_ids = set(comn.router_ids)
 
-    # cur_costs is a 2D array of costs used to tell when cost calcs have stabilized
-    # Each incoming LS cost line replaces a row in this table
-    # cur_costs tracks only interior routers
+    # cost_matrix holds the latest cost row from each interior router and
+    # tells when cost calcs have stabilized
     interior_rtrs = []
     for rtrs in comn.routers:
-        if rtrs[0].is_interior():
+        if len(rtrs) > 0 and rtrs[0].is_interior():
             interior_rtrs.append(rtrs[0].container_name)
-
-    PEER_COST_REBOOT = -1
-    PEER_COST_ABSENT = 0
-    def new_costs_row(val):
-        """
-        return a costs row.
-        :param val: -1 when router reboots, 0 when router log line processed
-        :return:
-        """
-        res = {}
-        for rtr in interior_rtrs:
-            res[rtr] = val
-        return res
-
-    cur_costs = {}
-    for rtr in interior_rtrs:
-        cur_costs[rtr] = new_costs_row(PEER_COST_REBOOT)
+    cost_matrix = link_state.CostMatrix(interior_rtrs)
 
     print("<a name=\"c_ls\"></a>")
     print("<h3>Routing link state</h3>")
@@ -685,17 +765,12 @@ def main_except(argv):
             # Processing: Computed costs: {u'A': 1, u'C': 51L, u'B': 101L}
             print("<tr><td>%s</td> <td>%s</td>" % (plf.datetime, ("%s#%d" % (plf.router.iname, plf.lineno))))
             try:
-                line = plf.line
-                sti = line.find("{")
-                line = line[sti:]
-                l_dict = ast.literal_eval(line)
-                costs_row = new_costs_row(PEER_COST_ABSENT)
+                l_dict = link_state.parse_costs(plf.line)
                 for i in range(0, comn.n_logs):
                     if len(comn.routers[i]) > 0:
                         tst_name = comn.routers[i][0].container_name
                         if tst_name in l_dict:
                             val = l_dict[tst_name]
-                            costs_row[tst_name] = val
                         elif i == plf.router.log_index:
                             val = text.nbsp()
                         else:
@@ -706,27 +781,17 @@ def main_except(argv):
                 # track costs published when there is no column to put the number
                 tgts = costs_pub[c.router.router.container_name]
                 for k, v in common.dict_iteritems(l_dict):
-                    if k not in comn.router_ids:
+                    if k not in known_ids:
                         if k not in tgts:
                             tgts.append(k)  # this cost went unreported
                 # update this router's cost view in running table
                 if plf.router.is_interior():
-                    cur_costs[plf.router.container_name] = costs_row
+                    cost_matrix.update(plf.router.container_name, l_dict, plf.datetime)
             except:
                 pass
             print("</tr>")
             # if the costs are stable across all routers then put an indicator in table
-            costs_stable = True
-            for c_rtr in interior_rtrs:
-                for r_rtr in interior_rtrs:
-                    if r_rtr != c_rtr \
-                            and (cur_costs[r_rtr][c_rtr] != cur_costs[c_rtr][r_rtr] \
-                            or cur_costs[c_rtr][r_rtr] <= PEER_COST_ABSENT):
-                        costs_stable = False
-                        break
-                if not costs_stable:
-                    break
-            if costs_stable:
+            if cost_matrix.is_stable():
                 print("<tr><td><span style=\"background-color:green\">stable</span></td></tr>")
         else:
             # restart
@@ -736,7 +801,7 @@ def main_except(argv):
                 print("<td><span style=\"background-color:%s\">%s</span></td>" % (color, text.nbsp() * 2))
             print("</tr>")
             if c.router.is_interior():
-                cur_costs[c.router.container_name] = new_costs_row(PEER_COST_REBOOT)
+                cost_matrix.restart(c.router.container_name, c.datetime)
     print("</table>")
     print("<br>")
 
@@ -756,6 +821,20 @@ def main_except(argv):
         print("</table>")
         print("<br>")
 
+    # how long the costs took to settle after each restart or change
+    if len(cost_matrix.routers) > 1:
+        print("<h4>Link state convergence</h4>")
+        print("<table>")
+        print("<tr><th>Upset</th> <th>Stable</th> <th>Seconds</th> <th>Changes</th></tr>")
+        for upset, stable, changes in cost_matrix.convergences:
+            print("<tr><td>%s</td> <td>%s</td> <td>%s</td> <td>%d</td></tr>" %
+                  (upset, stable, time_offset(stable, upset), changes))
+        if cost_matrix.unsettled_at is not None:
+            print("<tr><td>%s</td> <td>not stable at end of logs</td> <td>%s</td> <td>%d</td></tr>" %
+                  (cost_matrix.unsettled_at, text.nbsp(), cost_matrix.changes))
+        print("</table>")
+        print("<br>")
+
     print("<a href=\"javascript:toggle_node('ls_costs')\">%s%s</a> Link state costs data<br>" %
           (text.lozenge(), text.nbsp()))
     print(" <div width=\"100%%\"; "
@@ -775,6 +854,9 @@ def main_except(argv):
 
     print("</body>")
 
+    profiler.begin(None)
+    profiler.report()
+
 
 def main(argv):
     try:
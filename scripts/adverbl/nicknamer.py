@@ -20,6 +20,12 @@
 #
 
 import cgi
+import os
+import sys
+
+# modules shared with adverb.py live in the parent directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import name_table
 
 class ShortNames():
     '''
@@ -31,7 +37,8 @@ class ShortNames():
     Each class has a prefix used when the table is dumped as HTML
     '''
     def __init__(self, prefixText, _threshold=25):
-        self.longnames = []
+        self.names = name_table.NameTable()
+        self.longnames = self.names.names
         self.prefix = prefixText
         self.threshold = _threshold
 
@@ -46,11 +53,7 @@ class ShortNames():
         '''
         if lname.startswith("\"") and lname.endswith("\""):
             lname = lname[1:-1]
-        try:
-            idx = self.longnames.index(lname)
-        except:
-            self.longnames.append(lname)
-            idx = self.longnames.index(lname)
+        idx = self.names.intern(lname)
         # return as-given if short enough
         if len(lname) < self.threshold:
             return lname
@@ -92,6 +95,34 @@ class ShortNames():
         '''
         return cgi.escape(self.longnames[idx]) if cgi_escape else self.longnames[idx]
 
+    def merge(self, other):
+        '''
+        Add the names from another table to this one.
+        Names not yet known are appended in the other table's order.
+        :param other: ShortNames with the same prefix, typically filled in by a worker process
+        :return: list mapping each index in other to the index of the same name here
+        '''
+        return [self.names.intern(name) for name in other.longnames]
+
+    def renumber(self, sname, other, remap):
+        '''
+        Given a name returned by other.translate(), return the name this table uses
+        :param sname: short name, without popup, from the other table
+        :param other: the table passed to merge()
+        :param remap: the list returned by merge()
+        :return: short name in this table's numbering
+        '''
+        if not sname.startswith(other.prefix + "_"):
+            return sname
+        try:
+            idx = int(sname[(len(other.prefix) + 1):])
+        except ValueError:
+            return sname
+        if idx >= len(other.longnames) or len(other.longnames[idx]) < other.threshold:
+            # a long name that happens to look like a short name
+            return sname
+        return self.shortname(remap[idx])
+
     def htmlDump(self, with_link=False):
         '''
         Print the name table as an unnumbered list to stdout
@@ -118,6 +149,33 @@ class Shorteners():
         self.short_peer_names = ShortNames("peer")
         self.short_rtr_names  = ShortNames("router")
 
+    def merge(self, other):
+        '''
+        Merge the tables of another Shorteners into these.
+        Merging worker tables in log file order numbers the names
+        exactly as parsing the files one after another would.
+        :param other: Shorteners
+        :return: dict key=table attribute name, val=index remap list from ShortNames.merge
+        '''
+        remaps = {}
+        for key in ["short_link_names", "short_addr_names", "short_data_names",
+                    "short_peer_names", "short_rtr_names"]:
+            remaps[key] = getattr(self, key).merge(getattr(other, key))
+        return remaps
+
 
 if __name__ == "__main__":
-    pass
+    main_names = ShortNames("link", 5)
+    main_names.translate("first_long_name")
+    main_names.translate("abc")
+    worker_names = ShortNames("link", 5)
+    w_second = worker_names.translate("second_long_name")
+    w_first = worker_names.translate("first_long_name")
+    w_short = worker_names.translate("xyz")
+    remap = main_names.merge(worker_names)
+    assert remap == [2, 0, 3]
+    assert main_names.renumber(w_second, worker_names, remap) == "link_2"
+    assert main_names.renumber(w_first, worker_names, remap) == "link_0"
+    assert main_names.renumber(w_short, worker_names, remap) == "xyz"
+    assert main_names.longnames == ["first_long_name", "abc", "second_long_name", "xyz"]
+    print("OK")
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Parsed log cache
+#
+# With --cache=DIR the parse_log_chunk_job results for each log are saved
+# in DIR as a zlib compressed pickle. A later run on the same log takes
+# the saved results instead of parsing the log again.
+#
+# A cache entry is found by its key:
+#  * the log name as given and the path, size, and modification time
+#    of each file of the log
+#  * the log's position on the command line, which gives its letter
+#  * the switches that change what is parsed: --no-data, --lazy,
+#    --start, --end, and the filters
+#  * the parser version: a hash of the source of the parsing modules
+#  * the python major version
+# Report switches that do not change the parse, such as whether the
+# per link details are shown, use the same entries.
+
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+
+import hashlib
+import os
+import sys
+import tempfile
+import zlib
+
+import log_source
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+# the modules whose code decides what a parse produces
+PARSER_MODULES = ["common.py", "log_source.py", "nicknamer.py", "parser.py", "router.py", "splitter.py"]
+
+
+def parser_version():
+    '''
+    :return: hex digest of the parsing modules' source
+    '''
+    digest = hashlib.sha1()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in PARSER_MODULES:
+        with open(os.path.join(here, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class ParseCache():
+    '''
+    A directory of saved parse results, one file per log
+    '''
+    def __init__(self, dirname, comn):
+        '''
+        :param dirname: cache directory. It is made if it does not exist.
+        :param comn: common block holding the parse switches
+        '''
+        self.dirname = dirname
+        if not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError as e:
+                sys.exit('ERROR: cache directory %s cannot be made: %s' % (dirname, e))
+        arg_filter = None
+        if comn.arg_filter is not None:
+            arg_filter = sorted([(kind, list(patterns)) for kind, patterns in comn.arg_filter.patterns.items()])
+        self.switches = (comn.arg_index_data, comn.arg_lazy, comn.arg_window, arg_filter)
+        self.version = parser_version()
+        # count of logs taken from the cache and parsed
+        self.hits = 0
+        self.misses = 0
+
+    def key_of(self, fn, log_index):
+        '''
+        :param fn: log name, a file name or comma separated rotated file names
+        :param log_index: position of the log on the command line
+        :return: the cache key as text
+        '''
+        files = []
+        for seg_fn, kind in log_source.source_of(fn).segments:
+            st = os.stat(seg_fn)
+            files.append((os.path.abspath(seg_fn), st.st_size, repr(st.st_mtime)))
+        return repr((fn, files, log_index, self.switches, self.version, sys.version_info[0]))
+
+    def path_of(self, key):
+        return os.path.join(self.dirname, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".cache")
+
+    def load(self, fn, log_index):
+        '''
+        :param fn: log name
+        :param log_index: position of the log on the command line
+        :return: the saved list of parse_log_chunk_job results, or None
+        '''
+        key = self.key_of(fn, log_index)
+        try:
+            with open(self.path_of(key), 'rb') as f:
+                saved_key, results = pickle.loads(zlib.decompress(f.read()))
+        except Exception:
+            # missing, unreadable, or written by an incompatible run
+            self.misses += 1
+            return None
+        if saved_key != key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return results
+
+    def store(self, fn, log_index, results):
+        '''
+        Save the parse of a log. This must be done before the results are adopted.
+        :param fn: log name
+        :param log_index: position of the log on the command line
+        :param results: list of parse_log_chunk_job results in file order
+        :return:
+        '''
+        key = self.key_of(fn, log_index)
+        data = zlib.compress(pickle.dumps((key, results), pickle.HIGHEST_PROTOCOL))
+        # write a temporary file and rename it so no reader sees half an entry
+        fd, tmp_fn = tempfile.mkstemp(dir=self.dirname, suffix=".tmp")
+        renamed = False
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.rename(tmp_fn, self.path_of(key))
+            renamed = True
+        finally:
+            # python2 raises IOError, not OSError, for a failed write
+            if not renamed:
+                os.remove(tmp_fn)
+
+
+if __name__ == "__main__":
+    import shutil
+    import common
+    import nicknamer
+    import parser
+    tmp = tempfile.mkdtemp()
+    try:
+        fn = os.path.join(tmp, "A.log")
+        shutil.copy('test_data/A-two-instances.log', fn)
+        comn = common.Common()
+        cache = ParseCache(os.path.join(tmp, "cache"), comn)
+        assert cache.load(fn, 0) is None
+        results = [parser.parse_log_chunk_job(parser.log_chunk_jobs(fn, 0, True)[0])]
+        cache.store(fn, 0, results)
+        saved = cache.load(fn, 0)
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert [len(r.lines) for r in saved[0][0]] == [len(r.lines) for r in results[0][0]]
+        assert [plf.line for plf in saved[0][0][1].lines] == [plf.line for plf in results[0][0][1].lines]
+        # another letter, other switches, or a changed file miss
+        assert cache.load(fn, 1) is None
+        comn2 = common.Common()
+        comn2.arg_index_data = False
+        assert ParseCache(cache.dirname, comn2).load(fn, 0) is None
+        with open(fn, 'ab') as f:
+            f.write(b"\n")
+        assert cache.load(fn, 0) is None
+        # the saved results adopt like fresh ones
+        comn3 = common.Common()
+        comn3.shorteners = nicknamer.Shorteners()
+        rtrs = parser.adopt_parsed_chunks(saved, comn3)
+        assert len(rtrs) == 2 and rtrs[1].lines[0].router is rtrs[1]
+        # a store that fails part way, as on a full disk, leaves no temporary file behind
+        class FullDisk(object):
+            def __init__(self, fd, mode):
+                os.close(fd)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                return False
+
+            def write(self, data):
+                raise IOError(28, "No space left on device")
+        fdopen = os.fdopen
+        os.fdopen = FullDisk
+        try:
+            cache.store(fn, 0, results)
+            assert False
+        except IOError:
+            pass
+        finally:
+            os.fdopen = fdopen
+        assert [n for n in os.listdir(cache.dirname) if n.endswith(".tmp")] == []
+    finally:
+        shutil.rmtree(tmp)
+    print("OK")
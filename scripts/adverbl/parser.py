@@ -25,6 +25,10 @@ from __future__ import absolute_import
 from __future__ import print_function
 
 from datetime import *
+import fnmatch
+import itertools
+import mmap
+import os
 import re
 import sys
 import traceback
@@ -32,6 +36,8 @@ import traceback
 import splitter
 import test_data as td
 import common
+import log_source
+import nicknamer
 import text
 import router
 
@@ -41,7 +47,18 @@ def colorize_bg(what):
     return what
 
 
-class LogLineData:
+class LogLineData(object):
+    # Facts are kept in slots, not an instance dict, as there is one
+    # LogLineData per log line.
+    __slots__ = ("web_show_str", "name", "conn_num", "conn_id", "conn_peer", "channel", "direction",
+                 "described_type", "handle", "delivery_id", "delivery_tag", "remote", "channel_handle",
+                 "channel_remote", "flow_deliverycnt", "flow_linkcredit", "flow_cnt_credit", "flow_drain",
+                 "transfer_id", "role", "is_receiver", "source", "target", "first", "last", "settled",
+                 "disposition_state", "snd_settle_mode", "rcv_settle_mode", "transfer_data", "transfer_bare",
+                 "transfer_hdr_annos", "transfer_size", "transfer_short_name", "transfer_settled",
+                 "transfer_more", "transfer_resume", "transfer_aborted", "link_short_name",
+                 "link_short_name_popup", "is_policy_trace", "is_server_info", "is_router_ls", "fid",
+                 "amqp_error", "link_class", "disposition_display", "final_disposition")
 
     def direction_is_in(self):
         return self.direction == text.direction_in()
@@ -100,13 +117,19 @@ class LogLineData:
         self.final_disposition = None
 
 
-class DescribedType:
+class DescribedType(object):
     """
     Given a line like:
         @typename(00) [key1=val1, ...]
     Extract the typename and create a map of the key-val pairs
     May recursively find embedded described types
     """
+    __slots__ = ("dict", "dtype", "dtype_name", "dtype_number", "line")
+
+    # Every line repeats the same few field names. Each distinct name is
+    # kept once, per string type so that the dict repr does not change.
+    # key=type, val=dict key=field name, val=field name
+    field_names = {}
 
     @staticmethod
     def is_dtype_name(name):
@@ -122,16 +145,20 @@ class DescribedType:
     @staticmethod
     def get_key_and_val(kvp):
         eqi = kvp.find('=')
-        return kvp[:eqi], kvp[eqi + 1:]
+        key = kvp[:eqi]
+        names = DescribedType.field_names.get(type(key))
+        if names is None:
+            names = DescribedType.field_names.setdefault(type(key), {})
+        return names.setdefault(key, key), kvp[eqi + 1:]
 
     @staticmethod
-    def dtype_name(name):
+    def name_of_dtype(name):
         if not DescribedType.is_dtype_name(name):
             raise ValueError("Name '%s' is not a described type name" % name)
         return name[1: name.find('(')]
 
     @staticmethod
-    def dtype_number(name):
+    def number_of_dtype(name):
         if not DescribedType.is_dtype_name(name):
             raise ValueError("Name '%s' is not a described type name" % name)
         return int(name[name.find('(') + 1: -1])
@@ -145,7 +172,10 @@ class DescribedType:
         return self._representation()
 
     def _representation(self):
-        return "DescribedType %s( %d ) : %s" % (self.dtype_name, self.dtype_number, self.dict)
+        # keys are sorted so that the text does not depend on dict history,
+        # which changes when a parsed line is sent back from a worker process
+        fields = ", ".join("%r: %r" % (key, self.dict[key]) for key in sorted(self.dict))
+        return "DescribedType %s( %d ) : {%s}" % (self.dtype_name, self.dtype_number, fields)
 
     def add_field_to_dict(self, f_text, expected_key=None):
         if '=' not in f_text:
@@ -209,15 +239,15 @@ class DescribedType:
         :return:
         """
         self.dtype = _dtype
-        self.oline = str(_line)
-        self.line = self.oline
-        self.dtype_name = DescribedType.dtype_name(self.dtype)
-        self.dtype_number = DescribedType.dtype_number(self.dtype)
+        self.line = str(_line)
+        self.dtype_name = DescribedType.name_of_dtype(self.dtype)
+        self.dtype_number = DescribedType.number_of_dtype(self.dtype)
 
         # Process transfers separately..
         # Transfer perfomatives will not call parse recursively while others might
         if self.dtype_name == "transfer":
             self.parseTransfer()
+            self.line = None
             return
 
         # strip leading '[' and trailing ']'
@@ -228,87 +258,202 @@ class DescribedType:
 
         # process fields
         fields = splitter.Splitter.split(self.line)
-        while len(fields) > 0 and len(fields[0]) > 0:
-            if '=' not in fields[0]:
-                raise ValueError("Field does not contain equal sign '%s'" % fields[0])
-            key, val = DescribedType.get_key_and_val(fields[0])
-            del fields[0]
+        self.line = None
+        self.parse_fields(fields, 0, len(fields))
+
+    def parse_fields(self, fields, i, end, first=None, last=None):
+        """
+        Walk fields[i:end] holding key=val [, key=val]... and fill in the dict.
+        Nested described types, PN_SYMBOL lists, and maps take up more than one
+        field. A nested type is parsed in place from its parent's fields list.
+        :param fields: list from Splitter.split
+        :param i: index of the first field
+        :param end: index past the last field
+        :param first: text of fields[i] without a nested type's opening bracket, or None
+        :param last: text of fields[end - 1] without a nested type's closing bracket, or None
+                     It has the string type the splitter would give the field ending a nested type.
+        :return:
+        """
+        start = i
+
+        def text_of(j):
+            if j == end - 1 and last is not None:
+                return last
+            if j == start and first is not None:
+                return first
+            return fields[j]
+
+        while i < end:
+            field = text_of(i)
+            if len(field) == 0:
+                if i == start or i == end - 1:
+                    # the bracket was all there was of this field
+                    i += 1
+                    continue
+                break
+            if '=' not in field:
+                raise ValueError("Field does not contain equal sign '%s'" % field)
+            key, val = DescribedType.get_key_and_val(field)
+            i += 1
             if DescribedType.is_dtype_name(val):
                 # recursing to process subtype
-                # pull subtype's data out of fields. The fields list belongs to parent.
-                subfields = []
-                if fields[0] == "[]":
+                subtype = DescribedType()
+                subtype.dtype = val
+                subtype.dtype_name = DescribedType.name_of_dtype(val)
+                subtype.dtype_number = DescribedType.number_of_dtype(val)
+                self.dict[key] = subtype
+                if i == end:
+                    raise ValueError("Described type %s has no fields" % val)
+                if text_of(i) == "[]":
                     # degenerate case of empty subtype closing parent type
                     #  @disposition .. state=@accepted(36) []]
-                    subfields.append("[]")
-                    del fields[0]
-                else:
-                    # While extracting this type's fields, include nested described types
-                    # and PN_SYMBOL data enclosed in brackets. Current type ends when close
-                    # bracket seen and nest level is zero.
-                    nest = 0
-                    while len(fields) > 0:
-                        if "=@" in fields[0] and "]" not in fields[0] and "=@:" not in fields[0]:
-                            nest += 1
-                        if nest == 0:
-                            if fields[0].endswith('],'):
-                                subfields.append(fields[0][:-2])
-                                subfields.append(']')
-                                del fields[0]
-                                break
-                            if fields[0].endswith(']'):
-                                subfields.append(fields[0][:-1])
-                                subfields.append(']')
-                                del fields[0]
-                                break
-                        elif fields[0].endswith('],') or fields[0].endswith(']'):
-                            nest -= 1
-                        if fields[0].endswith(']]'):
-                            subfields.append(fields[0])
-                            del fields[0]
+                    i += 1
+                    continue
+                # Find the end of subtype's fields, including nested described types
+                # and PN_SYMBOL data enclosed in brackets. Current type ends when close
+                # bracket seen and nest level is zero.
+                sub_start = i
+                trim = 0
+                # a subtype closed by its own ']]' or by the end of the fields
+                # holds its closing field as the end of its line
+                closes_line = False
+                nest = 0
+                while i < end:
+                    field = text_of(i)
+                    i += 1
+                    if "=@" in field and "]" not in field and "=@:" not in field:
+                        nest += 1
+                    if nest == 0:
+                        if field.endswith('],'):
+                            trim = 2
                             break
-                        subfields.append(fields[0])
-                        del fields[0]
-
-
-                subtype = DescribedType()
-                subtype.parse_dtype_line(val, ' '.join(subfields))
-                self.dict[key] = subtype
+                        if field.endswith(']'):
+                            trim = 1
+                            break
+                    elif field.endswith('],') or field.endswith(']'):
+                        nest -= 1
+                    if field.endswith(']]'):
+                        trim = 1
+                        closes_line = True
+                        break
+                sub_first = text_of(sub_start)
+                sub_last = text_of(i - 1)
+                if trim == 0 and sub_last.endswith(']'):
+                    trim = 1
+                    closes_line = True
+                if not sub_first.startswith('[') or trim == 0:
+                    raise ValueError("Described type not delimited with square brackets: '%s'" %
+                                     ' '.join(fields[sub_start:i]))
+                if i - sub_start == 1:
+                    sub_last = sub_last[1:-trim]
+                    sub_first = None
+                else:
+                    sub_last = sub_last[:-trim]
+                    sub_first = sub_first[1:]
+                subtype.parse_fields(fields, sub_start, i, sub_first,
+                                     splitter.Splitter.as_field(sub_last, closes_line))
             elif val.startswith("@PN_SYMBOL"):
                 # symbols may end in first field or some later field
-                while not val.endswith(']'):
-                    val += fields[0]
-                    del fields[0]
-                self.dict[key] = val
+                j = i
+                if not val.endswith(']'):
+                    while j < end and not text_of(j).endswith(']'):
+                        j += 1
+                    if j == end:
+                        raise ValueError("Symbol list %s is not closed" % val)
+                    j += 1
+                self.dict[key] = "".join([val] + [text_of(k) for k in range(i, j)]) if j > i else val
+                i = j
             elif val.startswith('{'):
                 # handle some embedded map: properties={:product=\"qpid-dispatch-router\", :version=\"1.3.0-SNAPSHOT\"}
-                # pull subtype's data out of fields. The fields list belongs to parent.
                 submap = {}
-                fields.insert(0, val)
-                skey, sval = DescribedType.get_key_and_val(fields[0][1:])
+                skey, sval = DescribedType.get_key_and_val(val[1:])
                 submap[skey] = sval
-                del fields[0]
-                while len(fields) > 0:
-                    if fields[0].endswith('},'):
-                        skey, sval = DescribedType.get_key_and_val(fields[0][:-2])
+                while i < end:
+                    field = text_of(i)
+                    i += 1
+                    if field.endswith('},'):
+                        skey, sval = DescribedType.get_key_and_val(field[:-2])
                         submap[skey] = sval
-                        del fields[0]
                         break
-                    if fields[0].endswith('}'):
-                        skey, sval = DescribedType.get_key_and_val(fields[0][:-1])
+                    if field.endswith('}'):
+                        skey, sval = DescribedType.get_key_and_val(field[:-1])
                         submap[skey] = sval
-                        del fields[0]
                         break
-                    skey, sval = DescribedType.get_key_and_val(fields[0])
+                    skey, sval = DescribedType.get_key_and_val(field)
                     submap[skey] = sval
-                    del fields[0]
                 self.dict[key] = submap
-
             else:
                 self.dict[key] = val
 
 
-class ParsedLogLine(object):
+def parse_timestamp_slowly(line):
+    """
+    Find the time of a log line that common.parse_timestamp turns away.
+    Lines with no datetime are presumed start-of-epoch.
+    :param line: log line
+    :return: tuple (datetime, microseconds since 1970-01-01)
+    """
+    try:
+        dt = datetime.strptime(line[:26], '%Y-%m-%d %H:%M:%S.%f')
+    except:
+        # old routers flub the timestamp and don't print leading zero in uS time
+        # 2018-11-18 11:31:08.269 should be 2018-11-18 11:31:08.000269
+        td = line[:26]
+        parts = td.split('.')
+        us = parts[1]
+        parts_us = us.split(' ')
+        if len(parts_us[0]) < 6:
+            parts_us[0] = '0' * (6 - len(parts_us[0])) + parts_us[0]
+        parts[1] = ' '.join(parts_us)
+        td = '.'.join(parts)
+        try:
+            dt = datetime.strptime(td[:26], '%Y-%m-%d %H:%M:%S.%f')
+        except:
+            dt = datetime(1970, 1, 1)
+    return dt, common.epoch_us_of(dt)
+
+
+class LogLineBase(object):
+    """
+    Where a log line came from: router prefix index, router instance,
+    line number, and byte offset in the log file.
+    """
+    __slots__ = ()
+
+    @property
+    def prefixi(self):
+        """
+        :return: router prefix and instance 'A0'
+        """
+        return common.log_letter_of(self.index) + str(self.instance)
+
+    @property
+    def fid(self):
+        """
+        :return: log line (frame) id as used in javascript code 'f_A0_100'
+        """
+        return "f_" + self.prefixi + "_" + str(self.lineno)
+
+    def read_line(self):
+        """
+        Read the original text of the line back from the log file.
+        Only the file offset is kept in memory.
+        :return: the log line, or None if the offset is not known
+        """
+        if self.offset < 0:
+            return None
+        line = log_source.source_of(self.router.fn).read_line(self.offset)
+        return line if common.IS_PY2 else line.decode("utf-8")
+
+    def adverbl_link_to(self):
+        """
+        :return: html link to the main adverbl data display for this line
+        """
+        return "<a href=\"#%s\">%s</a>" % (self.fid, "%s%d_%s" %
+                                           (common.log_letter_of(self.index), self.instance, str(self.lineno)))
+
+
+class ParsedLogLine(LogLineBase):
     """
     Grind through the log line and record some facts about it.
     * Constructor returns Null if the log line is to be ignored
@@ -319,6 +464,10 @@ class ParsedLogLine(object):
     ** line               the log line
     ** common             common block object
     """
+    # One of these per log line; slots keep it small.
+    __slots__ = ("index", "instance", "lineno", "offset", "comn", "router", "shorteners",
+                 "line", "data", "datetime", "epoch_us", "transfer_short_name")
+
     server_trace_key = "SERVER (trace) ["
     server_info_key = "SERVER (info) ["
     policy_trace_key = "POLICY (trace) ["
@@ -660,14 +809,39 @@ class ParsedLogLine(object):
             res.web_show_str += (" <span style=\"background-color:yellow\">error</span> "
                                  "%s %s" % (resdict["error"].dict["condition"], resdict["error"].dict["description"]))
 
-    def adverbl_link_to(self):
+    def adopt(self, comn, worker_shorteners, remaps):
         """
-        :return: html link to the main adverbl data display for this line
+        Move a line parsed in a worker process to the main common block.
+        Short names in the line's display strings are renumbered to the merged tables.
+        :param comn: main common block
+        :param worker_shorteners: the worker's Shorteners, already merged into comn.shorteners
+        :param remaps: the dict returned by Shorteners.merge
+        :return: None
         """
-        return "<a href=\"#%s\">%s</a>" % (self.fid, "%s%d_%s" %
-                                           (common.log_letter_of(self.index), self.instance, str(self.lineno)))
-
-    def __init__(self, _log_index, _instance, _lineno, _line, _comn, _router):
+        self.comn = comn
+        self.shorteners = comn.shorteners
+        res = self.data
+        if res.name == "attach":
+            names = self.shorteners.short_link_names
+            new_name = names.renumber(res.link_short_name, worker_shorteners.short_link_names,
+                                      remaps["short_link_names"])
+            if new_name != res.link_short_name:
+                new_popup = res.link_short_name_popup.replace(
+                    ">%s</span>" % res.link_short_name, ">%s</span>" % new_name)
+                res.web_show_str = res.web_show_str.replace(res.link_short_name_popup, new_popup)
+                res.link_short_name_popup = new_popup
+                res.link_short_name = new_name
+        elif res.name == "transfer" and hasattr(self, "transfer_short_name"):
+            names = self.shorteners.short_data_names
+            new_name = names.renumber(self.transfer_short_name, worker_shorteners.short_data_names,
+                                      remaps["short_data_names"])
+            if new_name != self.transfer_short_name:
+                res.web_show_str = res.web_show_str.replace(
+                    "<a href=\"#%s\">%s</a>" % (self.transfer_short_name, self.transfer_short_name),
+                    "<a href=\"#%s\">%s</a>" % (new_name, new_name))
+                self.transfer_short_name = new_name
+
+    def __init__(self, _log_index, _instance, _lineno, _line, _comn, _router, _offset=-1):
         """
         Process a naked qpid-dispatch log line
         A log line looks like this:
@@ -694,23 +868,23 @@ class ParsedLogLine(object):
         :param _line:
         :param _comn:
         :param _router:
+        :param _offset:  byte offset of the line in the log file, -1 if unknown
         """
         if not (ParsedLogLine.server_trace_key in _line or
                 (ParsedLogLine.policy_trace_key in _line and "lookup_user:" in _line) or  # open (not begin, attach)
                 ParsedLogLine.server_info_key in _line or
                 ParsedLogLine.router_ls_key in _line):
             raise ValueError("Line is not a candidate for parsing")
-        self.oline = _line  # original line
         self.index = _log_index  # router prefix 0 for A, 1 for B
         self.instance = _instance  # router instance in log file
         self.lineno = _lineno  # log line number
+        self.offset = _offset  # where the original line is in the log file
         self.comn = _comn
         self.router = _router
-        self.prefixi = common.log_letter_of(self.index) + str(self.instance)  # prefix+instance A0
-        self.fid = "f_" + self.prefixi + "_" + str(self.lineno)  # frame id A0_100
         self.shorteners = _comn.shorteners  # name shorteners
 
-        self.line = _line  # working line chopped, trimmed
+        # working line chopped, trimmed. Only ROUTER_LS lines keep it after parsing.
+        self.line = _line
 
         self.data = LogLineData()  # parsed line fact store
 
@@ -733,24 +907,13 @@ class ParsedLogLine(object):
 
         # Handle optional timestamp
         # This whole project is brain dead without a timestamp. Just sayin'.
+        # epoch_us is the same time as an integer for cheap comparisons.
         self.datetime = None
-        try:
-            self.datetime = datetime.strptime(self.line[:26], '%Y-%m-%d %H:%M:%S.%f')
-        except:
-            # old routers flub the timestamp and don't print leading zero in uS time
-            # 2018-11-18 11:31:08.269 should be 2018-11-18 11:31:08.000269
-            td = self.line[:26]
-            parts = td.split('.')
-            us = parts[1]
-            parts_us = us.split(' ')
-            if len(parts_us[0]) < 6:
-                parts_us[0] = '0' * (6 - len(parts_us[0])) + parts_us[0]
-            parts[1] = ' '.join(parts_us)
-            td = '.'.join(parts)
-            try:
-                self.datetime = datetime.strptime(td[:26], '%Y-%m-%d %H:%M:%S.%f')
-            except:
-                self.datetime = datetime(1970, 1, 1)
+        self.epoch_us = 0
+        ts = common.parse_timestamp(self.line)
+        if ts is None:
+            ts = parse_timestamp_slowly(self.line)
+        self.datetime, self.epoch_us = ts
 
         # extract connection number
         sti = self.line.find(self.server_trace_key)
@@ -801,6 +964,7 @@ class ParsedLogLine(object):
 
         # policy lines have no direction and described type fields
         if self.data.is_policy_trace or self.data.is_server_info:
+            self.line = None
             return
 
         # direction
@@ -843,6 +1007,612 @@ class ParsedLogLine(object):
             # data fron incoming line is now parsed out into facts in .data
             # Now cook the data to get useful displays
             self.extract_facts()
+        self.line = None
+
+
+class LogLineHeader(object):
+    """
+    The LogLineData facts that a LazyLogLine finds without parsing the
+    described type. Asking for any other fact parses the whole line.
+    """
+    __slots__ = ("name", "conn_num", "conn_id", "channel", "direction", "transfer_size",
+                 "is_policy_trace", "is_server_info", "is_router_ls", "log_line")
+
+    # facts of a line that does not parse
+    unparsed = LogLineData()
+
+    def __init__(self, _log_line):
+        self.name = ""
+        self.conn_num = ""
+        self.conn_id = ""
+        self.channel = ""
+        self.direction = ""
+        self.transfer_size = ""
+        self.is_policy_trace = False
+        self.is_server_info = False
+        self.is_router_ls = False
+        self.log_line = _log_line
+
+    def __getattr__(self, name):
+        # only called for facts not in the header
+        if name.startswith("__") or name == "log_line":
+            raise AttributeError(name)
+        plf = self.log_line.parsed()
+        return getattr(plf.data if plf is not None else LogLineHeader.unparsed, name)
+
+    def direction_is_in(self):
+        return self.direction == text.direction_in()
+
+    def direction_is_out(self):
+        return self.direction == text.direction_out()
+
+
+def line_header(_line):
+    """
+    Find the facts at the head of an AMQP log line the way ParsedLogLine does
+    :param _line: log line
+    :return: tuple (server trace, policy trace, or server info key, connection number,
+             channel, direction, performative name, the line after the direction)
+    :raise ValueError: if the line is not an AMQP line
+    """
+    if not (ParsedLogLine.server_trace_key in _line or
+            (ParsedLogLine.policy_trace_key in _line and "lookup_user:" in _line) or
+            ParsedLogLine.server_info_key in _line):
+        raise ValueError("Line is not a candidate for parsing")
+    key = ParsedLogLine.server_trace_key
+    sti = _line.find(key)
+    if sti < 0:
+        key = ParsedLogLine.policy_trace_key
+        sti = _line.find(key)
+        if sti < 0:
+            key = ParsedLogLine.server_info_key
+            sti = _line.find(key)
+    line = _line[sti + len(key):]
+    ste = line.find(']')
+    if ste < 0:
+        raise ValueError("'%s' not found in line %s" % ("]", _line))
+    conn_num = line[:ste]
+    line = line[ste + 1:]
+    if line.startswith(':'):
+        line = line[1:]
+    sti = line.find(' ')
+    if sti < 0:
+        raise ValueError("space not found after channel number at head of line %s" % (_line))
+    channel = line[:sti]
+    direction = ""
+    name = ""
+    if key == ParsedLogLine.server_trace_key:
+        line = line[sti + 1:].lstrip()
+        if line.startswith('<') or line.startswith('-'):
+            direction = line[:2]
+            line = line[3:]
+        dname = line.split()[0] if len(line) > 0 else ""
+        if DescribedType.is_dtype_name(dname):
+            name = DescribedType.name_of_dtype(dname)
+    return (key, conn_num, channel, direction, name, line)
+
+
+class LazyLogLine(LogLineBase):
+    """
+    A log line found by the first pass of lazy parsing. Only the header
+    facts are found up front: time, connection, channel, direction, and
+    performative name. The line is read back from the log file and parsed
+    in full the first time any other fact is needed.
+    """
+    __slots__ = ("index", "instance", "lineno", "offset", "comn", "router",
+                 "datetime", "epoch_us", "data", "full")
+
+    def __init__(self, _log_index, _instance, _lineno, _line, _comn, _router, _offset):
+        """
+        Find the header facts the way ParsedLogLine does
+        :param _log_index:   The router prefix index 0 for A, 1 for B, ...
+        :param _instance     The router instance
+        :param _lineno:
+        :param _line:
+        :param _comn:
+        :param _router:
+        :param _offset:  byte offset of the line in the log file
+        """
+        key, conn_num, channel, direction, name, line = line_header(_line)
+        self.index = _log_index
+        self.instance = _instance
+        self.lineno = _lineno
+        self.offset = _offset
+        self.comn = _comn
+        self.router = _router
+        self.full = None  # ParsedLogLine once parsed, False if it did not parse
+        self.data = LogLineHeader(self)
+        head = self.data
+
+        ts = common.parse_timestamp(_line)
+        if ts is None:
+            ts = parse_timestamp_slowly(_line)
+        self.datetime, self.epoch_us = ts
+
+        head.is_policy_trace = key == ParsedLogLine.policy_trace_key
+        head.is_server_info = key == ParsedLogLine.server_info_key
+        head.conn_num = conn_num
+        head.conn_id = self.prefixi + "_" + conn_num
+        head.channel = channel
+        head.direction = direction
+        head.name = name
+        if head.name == "transfer":
+            rz = re.compile(r'\] \(\d+\) \"').search(line)
+            head.transfer_size = line[rz.start() + 3: rz.end() - 3] if rz is not None else "0"
+
+    def parsed(self):
+        """
+        :return: the ParsedLogLine for this line, parsed the first time it is asked for;
+                 None if the line does not parse
+        """
+        if self.full is None:
+            self.full = False
+            try:
+                self.full = ParsedLogLine(self.index, self.instance, self.lineno, self.read_line(),
+                                          self.comn, self.router, self.offset)
+            except ValueError:
+                pass
+            except Exception as e:
+                sys.stderr.write("Failed to parse file '%s', line %d : %s\n" % (self.router.fn, self.lineno, e))
+        return self.full if self.full is not False else None
+
+    @property
+    def transfer_short_name(self):
+        plf = self.parsed()
+        if plf is None:
+            raise AttributeError("transfer_short_name")
+        return plf.transfer_short_name
+
+    def adopt(self, comn, worker_shorteners, remaps):
+        """
+        Move a line found in a worker process to the main common block.
+        The line is not parsed yet so it holds no short names.
+        """
+        self.comn = comn
+        if self.full:
+            self.full.adopt(comn, worker_shorteners, remaps)
+
+
+# log line keys that drive the router instance discovery in parse_log_lines
+KEY_SERVER_TRACE = "SERVER (trace) ["  # AMQP traffic
+KEY_CONTAINER_NAME = "SERVER (info) Container Name:"  # Normal 'router is starting' restart discovery line
+KEY_ROUTER_LS = "ROUTER_LS (info)"  # a log line placed in separate pool of lines
+KEY_VERSION = "ROUTER (info) Version:"  # router version line
+KEY_MODE = "ROUTER (info) Router started in "  # router mode
+
+
+def is_in_progress_router_line(line):
+    """
+    What if the log file has no record of the router starting?
+    This is an in_progress router and it is a pre-existing router instance
+    and not one found by restart discovery.
+    Any key or AMQP line indicates a router in-progress
+    """
+    return any(s in line for s in [KEY_SERVER_TRACE, KEY_ROUTER_LS]) or ("[" in line and "]" in line)
+
+
+# Every line that parse_log_lines acts on matches LOG_LINE_PREFILTER:
+# a key line, an in-progress router line, or a line with both brackets.
+# Lines that don't match are stepped over in the mapped log file and
+# never become strings.
+LOG_LINE_PREFILTER = re.compile(
+    b"|".join([re.escape(k.encode("ascii")) for k in
+               [KEY_CONTAINER_NAME, KEY_ROUTER_LS, KEY_VERSION, KEY_MODE, KEY_SERVER_TRACE]]) +
+    b"|\\[[^\\n]*\\]|\\][^\\n]*\\[")
+
+# The restart and router identity lines. Before a --start time these
+# are the only lines read after the first one that starts a router.
+HEADER_LINE_PREFILTER = re.compile(
+    b"|".join([re.escape(k.encode("ascii")) for k in [KEY_CONTAINER_NAME, KEY_VERSION, KEY_MODE]]))
+
+# With --no-data these lines are counted and then discarded
+DATA_LINE_KEYS = re.compile(" @transfer| @disposition| @flow|EMPTY FRAME")
+
+
+def count_newlines(buf, start, end):
+    """
+    Count the newlines in buf[start:end] a block at a time
+    :param buf: mapped log file
+    :param start: offset
+    :param end: offset
+    :return: count
+    """
+    n = 0
+    while start < end:
+        stop = min(end, start + 0x100000)
+        n += buf[start:stop].count(b"\n")
+        start = stop
+    return n
+
+
+def log_candidate_lines(buf, start, end, lineno=0, prefilter=LOG_LINE_PREFILTER):
+    """
+    Generate the lines in buf[start:end] that match a prefilter
+    :param buf: mapped log file
+    :param start: offset of the beginning of a line
+    :param end: offset at or past the start of the last line
+    :param lineno: count of lines in the file before start
+    :param prefilter: compiled regex
+    :return: generator of (line number, byte offset, line) tuples
+    """
+    search = prefilter.search
+    pos = start
+    while pos < end:
+        match = search(buf, pos, end)
+        if match is None:
+            return
+        line_start = buf.rfind(b"\n", pos, match.start()) + 1
+        if line_start == 0:
+            line_start = pos
+        line_end = buf.find(b"\n", match.end(), end) + 1
+        if line_end == 0:
+            line_end = end
+        if line_start > pos:
+            lineno += count_newlines(buf, pos, line_start)
+        lineno += 1
+        line = buf[line_start:line_end]
+        yield (lineno, line_start, line if common.IS_PY2 else line.decode("utf-8"))
+        pos = line_end
+
+
+def scan_mapped_file(fn, start=0, end=None, lineno=0, prefilter=LOG_LINE_PREFILTER):
+    """
+    Map a log file and generate the lines that begin in byte range [start, end)
+    and that parse_log_lines acts on.
+    :param fn: file name
+    :param start: offset of the first line
+    :param end: offset at or past the start of the last line, or None for the end of the file
+    :param lineno: count of lines in the file before start
+    :param prefilter: compiled regex that the lines match
+    :return: generator of (line number, byte offset, line) tuples
+    """
+    with open(fn, 'rb') as infile:
+        size = os.fstat(infile.fileno()).st_size
+        end = size if end is None else min(end, size)
+        if start >= end:
+            # an empty file can't be mapped
+            return
+        buf = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for item in log_candidate_lines(buf, start, end, lineno, prefilter):
+                yield item
+        finally:
+            buf.close()
+
+
+def scan_log_lines(fn, start=0, end=None, lineno=0):
+    """
+    Generate the lines of a log that parse_log_lines acts on.
+    A single uncompressed file is mapped and may be scanned in a byte range.
+    Compressed and rotated logs are decompressed a block at a time and
+    scanned whole, the segments one after another in time order.
+    :param fn: log name, a file name or comma separated rotated file names
+    :param start: offset of the first line in a single uncompressed file
+    :param end: offset at or past the start of the last line, or None for the end of the log
+    :param lineno: count of lines in the log before start
+    :return: generator of (line number, log_source offset, line) tuples
+    """
+    source = log_source.source_of(fn)
+    if source.is_plain_file():
+        for item in scan_mapped_file(source.segments[0][0], start, end, lineno):
+            yield item
+        return
+    for seg_i, (seg_fn, kind) in enumerate(source.segments):
+        base = seg_i * log_source.SEGMENT_SPAN
+        infile = log_source.open_segment(seg_fn, kind)
+        try:
+            block_offset = 0
+            while True:
+                block = infile.read(0x100000)
+                if not block:
+                    break
+                if not block.endswith(b"\n"):
+                    block += infile.readline()
+                for item in log_candidate_lines(block, 0, len(block), lineno):
+                    yield (item[0], base + block_offset + item[1], item[2])
+                lineno += block.count(b"\n")
+                if not block.endswith(b"\n"):
+                    # last line of the segment has no newline
+                    lineno += 1
+                block_offset += len(block)
+        finally:
+            infile.close()
+
+
+def count_log_lines(fn, start, end):
+    """
+    :param fn: file name
+    :param start: offset of the first line
+    :param end: offset at or past the start of the last line
+    :return: count of lines that begin in byte range [start, end)
+    """
+    with open(fn, 'rb') as infile:
+        if start >= end:
+            return 0
+        buf = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            n = count_newlines(buf, start, end)
+            if buf[end - 1:end] != b"\n":
+                # last line of the file has no newline
+                n += 1
+            return n
+        finally:
+            buf.close()
+
+
+def next_timestamped_line(buf, pos, size):
+    """
+    Find the first line that starts at or after pos and begins with a timestamp
+    :param buf: mapped log file
+    :param pos: offset
+    :param size: size of the file
+    :return: (line start, line end, microseconds since 1970), or (size, size, None) if there is none
+    """
+    if pos > 0 and buf[pos - 1:pos] != b"\n":
+        pos = buf.find(b"\n", pos, size) + 1
+        if pos == 0:
+            return (size, size, None)
+    while pos < size:
+        stop = buf.find(b"\n", pos, size) + 1
+        if stop == 0:
+            stop = size
+        head = buf[pos:min(stop, pos + 26)]
+        ts = common.parse_timestamp(head if common.IS_PY2 else head.decode("utf-8", "replace"))
+        if ts is not None:
+            return (pos, stop, ts[1])
+        pos = stop
+    return (size, size, None)
+
+
+def offset_of_time(buf, size, at_us):
+    """
+    Binary search a log file, taken to be in time order, for a time
+    :param buf: mapped log file
+    :param size: size of the file
+    :param at_us: microseconds since 1970
+    :return: offset of the line after the last line stamped before at_us
+    """
+    lo = 0
+    hi = size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        start, stop, ts = next_timestamped_line(buf, mid, size)
+        if ts is not None and ts < at_us:
+            lo = stop
+        else:
+            hi = mid
+    return lo
+
+
+def log_window_range(fn, window):
+    """
+    :param fn: uncompressed log file name
+    :param window: (start, end) microseconds since 1970, either may be None
+    :return: (start, end) byte offsets of the lines in the window
+    """
+    with open(fn, 'rb') as infile:
+        size = os.fstat(infile.fileno()).st_size
+        if size == 0:
+            return (0, 0)
+        buf = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            start = 0 if window[0] is None else offset_of_time(buf, size, window[0])
+            end = size if window[1] is None else offset_of_time(buf, size, window[1])
+            return (start, max(start, end))
+        finally:
+            buf.close()
+
+
+def outside_window(line, window):
+    """
+    :param line: log line
+    :param window: (start, end) microseconds since 1970, either may be None
+    :return: True if the line is stamped before start or at or after end
+    """
+    ts = common.parse_timestamp(line)
+    if ts is None:
+        return False
+    return (window[0] is not None and ts[1] < window[0]) or (window[1] is not None and ts[1] >= window[1])
+
+
+def scan_header_lines(fn, end):
+    """
+    Generate the lines before offset end of an uncompressed log file that
+    say which routers ran there: the first line that starts a router and
+    the restart and router identity lines after it.
+    :param fn: file name
+    :param end: offset of the first line not to scan
+    :return: generator of (line number, byte offset, line) tuples
+    """
+    for lineno, offset, line in scan_mapped_file(fn, 0, end):
+        yield (lineno, offset, line)
+        if KEY_CONTAINER_NAME in line or is_in_progress_router_line(line):
+            pos = offset + (len(line) if common.IS_PY2 else len(line.encode("utf-8")))
+            break
+    else:
+        return
+    for item in scan_mapped_file(fn, pos, end, lineno, HEADER_LINE_PREFILTER):
+        yield item
+
+
+def identity_lines_to_restart(lines):
+    """
+    :param lines: (line number, offset, line) tuples
+    :return: generator of the router identity lines up to the next restart line
+    """
+    for item in lines:
+        if KEY_CONTAINER_NAME in item[2]:
+            return
+        if KEY_VERSION in item[2] or KEY_MODE in item[2]:
+            yield item
+
+
+def lines_before_time(lines, end_us):
+    """
+    :param lines: (line number, offset, line) tuples in time order
+    :param end_us: microseconds since 1970, or None
+    :return: generator of the lines up to the first one stamped at or after end_us,
+             and then the identity lines of the router running at end_us
+    """
+    for item in lines:
+        if end_us is not None:
+            ts = common.parse_timestamp(item[2])
+            if ts is not None and ts[1] >= end_us:
+                for identity in identity_lines_to_restart(itertools.chain([item], lines)):
+                    yield identity
+                return
+        yield item
+
+
+def parse_log_window(fn, log_index, comn):
+    """
+    Parse the lines of a log in the comn.arg_window time window.
+    An uncompressed file is binary searched for the window. Before the
+    window only the lines from scan_header_lines are read and after it
+    only the identity lines of the router running at the window end.
+    A compressed or rotated log is read through and only the lines in
+    the window are parsed.
+    :param fn: log name, a file name or comma separated rotated file names
+    :param log_index: router id 0 for 'A', 1 for 'B', ...
+    :param comn: common data
+    :return: list of Routers
+    """
+    window = comn.arg_window
+    if not log_source.source_of(fn).is_plain_file():
+        return parse_log_lines(lines_before_time(scan_log_lines(fn), window[1]),
+                               fn, log_index, comn, window=window)
+    start, end = log_window_range(fn, window)
+    rtrs = parse_log_lines(scan_header_lines(fn, start), fn, log_index, comn, window=window)
+    # the router running when the window opens takes the window's lines
+    rtr = rtrs.pop() if len(rtrs) > 0 else None
+    instance = 0 if rtr is None else rtr.instance
+    lines = itertools.chain(
+        scan_mapped_file(fn, start, end, count_log_lines(fn, 0, start)),
+        identity_lines_to_restart(scan_mapped_file(fn, end, None, count_log_lines(fn, 0, end),
+                                                   HEADER_LINE_PREFILTER)))
+    return rtrs + parse_log_lines(lines, fn, log_index, comn, instance, rtr, window)
+
+
+# the peer container name in an open performative
+CONTAINER_ID = re.compile(r'container-id="?([^",\]]*)')
+
+
+class LineFilter():
+    '''
+    Parse time selection of AMQP log lines by router letter, connection id,
+    peer container name, and performative. A line is kept when it passes
+    each kind of filter that is given. It passes a kind of filter when any
+    of that kind's fnmatch patterns matches.
+    '''
+    kinds = ["router", "connection", "peer", "performative"]
+
+    def __init__(self):
+        # key=kind, val=list of patterns
+        self.patterns = {}
+
+        # key=kind, val=count of log lines left out by that kind of filter
+        self.skipped = {}
+        for kind in self.kinds:
+            self.skipped[kind] = 0
+
+        # peer filter decisions
+        #   key= conn_id, val= True if the connection's peer matches
+        self.peer_kept = {}
+
+        # lines of connections whose inbound open has not been seen
+        #   key= conn_id, val= list of log lines
+        self.pending = {}
+
+    def add(self, kind, patterns):
+        self.patterns.setdefault(kind, []).extend(patterns)
+
+    def fresh_copy(self):
+        '''
+        :return: a LineFilter with the same patterns and nothing counted or pending
+        '''
+        res = LineFilter()
+        for kind, patterns in self.patterns.items():
+            res.add(kind, patterns)
+        return res
+
+    def matches(self, kind, value):
+        '''
+        :return: True if there is no filter of this kind or a pattern matches the value
+        '''
+        patterns = self.patterns.get(kind)
+        return patterns is None or any(fnmatch.fnmatchcase(value, p) for p in patterns)
+
+    def failed_kind(self, letter, conn_id, name):
+        '''
+        :return: the first of the router, connection, and performative filters
+                 that a line fails, or None
+        '''
+        if not self.matches("router", letter):
+            return "router"
+        if not self.matches("connection", conn_id):
+            return "connection"
+        if not self.matches("performative", name):
+            return "performative"
+        return None
+
+    def describe(self):
+        '''
+        :return: the filters as text, 'connection A0_3; performative transfer, flow'
+        '''
+        return "; ".join(["%s %s" % (kind, ", ".join(self.patterns[kind]))
+                          for kind in self.kinds if kind in self.patterns])
+
+    def keeps(self, line, log_index, instance, rtr, make_line):
+        '''
+        Apply the filters to an AMQP line before it is parsed.
+        A line that waits on its connection's inbound open is built and
+        held until the peer is known. An inbound open that is filtered out
+        is built and kept in rtr.peer_opens for connection peer pairing.
+        :param line: log line
+        :param log_index: router id 0 for 'A', 1 for 'B', ...
+        :param instance: router instance number
+        :param rtr: Router that the line belongs to
+        :param make_line: function returning the log line object for the line
+        :return: True if the caller is to keep the line
+        '''
+        key, conn_num, channel, direction, name, rest = line_header(line)
+        letter = common.log_letter_of(log_index)
+        conn_id = letter + str(instance) + "_" + conn_num
+        inbound_open = name == "open" and direction == text.direction_in()
+        kind = self.failed_kind(letter, conn_id, name)
+        if kind is None and "peer" in self.patterns:
+            if inbound_open and conn_id not in self.peer_kept:
+                match = CONTAINER_ID.search(rest)
+                self.peer_kept[conn_id] = self.matches("peer", match.group(1) if match is not None else "")
+                for plf in self.pending.pop(conn_id, []):
+                    if self.peer_kept[conn_id]:
+                        plf.router.lines.append(plf)
+                    else:
+                        self.skipped["peer"] += 1
+            if conn_id not in self.peer_kept:
+                self.pending.setdefault(conn_id, []).append(make_line())
+                return False
+            if not self.peer_kept[conn_id]:
+                kind = "peer"
+        if kind is None:
+            return True
+        self.skipped[kind] += 1
+        if inbound_open:
+            rtr.peer_opens.append(make_line())
+        return False
+
+    def finish(self, rtrs):
+        '''
+        Drop the lines of connections that never showed a peer and put
+        back into log order the lines that waited for theirs.
+        :param rtrs: Routers of the lines
+        '''
+        for plfs in self.pending.values():
+            self.skipped["peer"] += len(plfs)
+        self.pending = {}
+        if "peer" in self.patterns:
+            for rtr in rtrs:
+                rtr.lines.sort(key=lambda plf: plf.lineno)
 
 
 def parse_log_file(fn, log_index, comn):
@@ -854,75 +1624,268 @@ def parse_log_file(fn, log_index, comn):
     :param comn: common data
     :return: list of Routers
     """
-    instance = 0
-    lineno = 0
-    search_for_in_progress = True
-    rtrs = []
-    rtr = None
-    key1 = "SERVER (trace) ["  # AMQP traffic
-    key2 = "SERVER (info) Container Name:"  # Normal 'router is starting' restart discovery line
-    key3 = "ROUTER_LS (info)"  # a log line placed in separate pool of lines
-    keys = [key1, key3]
-    key4 = "ROUTER (info) Version:"  # router version line
-    key5 = "ROUTER (info) Router started in " # router mode
-    with open(fn, 'r') as infile:
-        for line in infile:
-            if search_for_in_progress:
-                # What if the log file has no record of the router starting?
-                # This is an in_progress router and it is a pre-existing router instance
-                # and not one found by restart discovery.
-                # Any key or AMQP line indicates a router in-progress
-                if any(s in line for s in keys) or ("[" in line and "]" in line):
-                    assert rtr is None
-                    rtr = router.Router(fn, log_index, instance)
-                    rtrs.append(rtr)
-                    search_for_in_progress = False
-                    rtr.restart_rec = router.RestartRecord(rtr, line, lineno + 1)
-            lineno += 1
-            if key2 in line:
-                # This line closes the current router, if any, and opens a new one
-                if rtr is not None:
-                    instance += 1
+    if comn.arg_window is not None:
+        return parse_log_window(fn, log_index, comn)
+    return parse_log_lines(scan_log_lines(fn), fn, log_index, comn)
+
+
+def parse_log_lines(lines, fn, log_index, comn, instance=0, rtr=None, window=None):
+    """
+    Parse log lines into Routers.
+    The defaults are for lines read from the start of a file. A caller that
+    starts part way into a file gives the router instance number there and
+    a Router to hold the lines of the router running at that point, if any.
+    :param lines: iterable of (line number, byte offset, line) from scan_log_lines
+    :param fn: file name
+    :param log_index: router id 0 for 'A', 1 for 'B', ...
+    :param comn: common data
+    :param instance: router instance number at the first line
+    :param rtr: Router in progress at the first line, or None
+    :param window: (start, end) microseconds since 1970 of the lines to parse, or None for all
+    :return: list of Routers, starting with rtr if given
+    """
+    search_for_in_progress = rtr is None
+    rtrs = [] if rtr is None else [rtr]
+    key2 = KEY_CONTAINER_NAME
+    key3 = KEY_ROUTER_LS
+    key4 = KEY_VERSION
+    key5 = KEY_MODE
+    # AMQP lines are parsed now or, in lazy mode, just found
+    line_class = LazyLogLine if comn.arg_lazy else ParsedLogLine
+    line_filter = comn.arg_filter
+    for lineno, line_offset, line in lines:
+        if search_for_in_progress:
+            if is_in_progress_router_line(line):
+                assert rtr is None
                 rtr = router.Router(fn, log_index, instance)
                 rtrs.append(rtr)
-                rtr.restart_rec = router.RestartRecord(rtr, line, lineno)
                 search_for_in_progress = False
-                rtr.container_name = line[(line.find(key2) + len(key2)):].strip().split()[0]
-            elif key3 in line:
-                pl = ParsedLogLine(log_index, instance, lineno, line, comn, rtr)
+                rtr.restart_rec = router.RestartRecord(rtr, line, lineno)
+        if key2 in line:
+            # This line closes the current router, if any, and opens a new one
+            if rtr is not None:
+                instance += 1
+            rtr = router.Router(fn, log_index, instance)
+            rtrs.append(rtr)
+            rtr.restart_rec = router.RestartRecord(rtr, line, lineno)
+            search_for_in_progress = False
+            rtr.container_name = line[(line.find(key2) + len(key2)):].strip().split()[0]
+        elif window is not None and key4 not in line and key5 not in line and outside_window(line, window):
+            # outside the --start/--end window
+            pass
+        elif key3 in line:
+            if line_filter is not None and not line_filter.matches("router", common.log_letter_of(log_index)):
+                line_filter.skipped["router"] += 1
+            else:
+                pl = ParsedLogLine(log_index, instance, lineno, line, comn, rtr, line_offset)
                 if pl is not None:
                     if pl.data.is_router_ls:
                         rtr.router_ls.append(pl)
-            elif key4 in line:
-                rtr.version = line[(line.find(key4) + len(key4)):].strip().split()[0]
-            elif key5 in line:
-                rtr.mode = line[(line.find(key5) + len(key5)):].strip().split()[0].lower()
-            elif "[" in line and "]" in line:
-                try:
-                    if lineno == 130:
-                        pass
-                    do_this = comn.arg_index_data
-                    if not do_this:
-                        # not indexing data. maybe do this line anyway
-                        do_this = not any(s in line for s in [' @transfer', ' @disposition', ' @flow', 'EMPTY FRAME'])
-                    if do_this:
-                        pl = ParsedLogLine(log_index, instance, lineno, line, comn, rtr)
+        elif key4 in line:
+            rtr.version = line[(line.find(key4) + len(key4)):].strip().split()[0]
+        elif key5 in line:
+            rtr.mode = line[(line.find(key5) + len(key5)):].strip().split()[0].lower()
+        elif "[" in line and "]" in line:
+            try:
+                if lineno == 130:
+                    pass
+                do_this = comn.arg_index_data
+                if not do_this:
+                    # not indexing data. maybe do this line anyway
+                    do_this = DATA_LINE_KEYS.search(line) is None
+                if do_this:
+                    if line_filter is None or line_filter.keeps(line, log_index, instance, rtr, lambda: line_class(
+                            log_index, instance, lineno, line, comn, rtr, line_offset)):
+                        pl = line_class(log_index, instance, lineno, line, comn, rtr, line_offset)
                         if pl is not None:
                             rtr.lines.append(pl)
-                    else:
-                        comn.data_skipped += 1
-                except ValueError as ve:
-                    pass
-                except Exception as e:
-                    # t, v, tb = sys.exc_info()
-                    if hasattr(e, 'message'):
-                        sys.stderr.write("Failed to parse file '%s', line %d : %s\n" % (fn, lineno, e.message))
-                    else:
-                        sys.stderr.write("Failed to parse file '%s', line %d : %s\n" % (fn, lineno, e))
-                    # raise t, v, tb
-            else:
-                # ignore this log line
+                else:
+                    comn.data_skipped += 1
+            except ValueError as ve:
                 pass
+            except Exception as e:
+                # t, v, tb = sys.exc_info()
+                if hasattr(e, 'message'):
+                    sys.stderr.write("Failed to parse file '%s', line %d : %s\n" % (fn, lineno, e.message))
+                else:
+                    sys.stderr.write("Failed to parse file '%s', line %d : %s\n" % (fn, lineno, e))
+                # raise t, v, tb
+        else:
+            # ignore this log line
+            pass
+    if line_filter is not None:
+        line_filter.finish(rtrs)
+    return rtrs
+
+
+def log_chunk_ranges(fn, chunk_size):
+    """
+    Split a file into byte ranges of about chunk_size that start at the beginning of a line
+    :param fn: file name
+    :param chunk_size: bytes
+    :return: list of (start, end) offsets
+    """
+    size = os.path.getsize(fn)
+    offsets = [0]
+    with open(fn, 'rb') as infile:
+        pos = chunk_size
+        while pos < size:
+            # step to the start of the next line at or after pos
+            infile.seek(pos - 1)
+            infile.readline()
+            pos = infile.tell()
+            if pos >= size:
+                break
+            offsets.append(pos)
+            pos += chunk_size
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+
+def scan_log_chunk(job):
+    """
+    Process pool entry point: count the facts about a byte range
+    that the next range needs before it can be parsed.
+    :param job: tuple (file name, start, end)
+    :return: tuple (line count, True if an in-progress router line appears
+             at or before the first restart line, count of restart lines)
+    """
+    fn, start, end = job
+    starts_router = False
+    n_restarts = 0
+    for lineno, offset, line in scan_log_lines(fn, start, end):
+        if n_restarts == 0 and not starts_router and is_in_progress_router_line(line):
+            starts_router = True
+        if KEY_CONTAINER_NAME in line:
+            n_restarts += 1
+    n_lines = count_log_lines(fn, start, end)
+    return (n_lines, starts_router, n_restarts)
+
+
+def log_chunk_jobs(fn, log_index, arg_index_data, pool=None, chunk_size=None, arg_lazy=False, arg_window=None,
+                   arg_filter=None):
+    """
+    Plan the parse of one log file as jobs for parse_log_chunk_job.
+    An uncompressed file larger than chunk_size is split into byte ranges.
+    The ranges are scanned in the pool to find the line number, router
+    instance, and router in progress at the start of each range.
+    Compressed and rotated logs, logs parsed in a --start/--end window,
+    and logs filtered by peer, which waits on each connection's open,
+    are parsed as one job.
+    :param fn: log name, a file name or comma separated rotated file names
+    :param log_index: router id 0 for 'A', 1 for 'B', ...
+    :param arg_index_data: comn.arg_index_data
+    :param pool: multiprocessing pool for the scan
+    :param chunk_size: bytes, or None to parse the file as one job
+    :param arg_lazy: comn.arg_lazy
+    :param arg_window: comn.arg_window
+    :param arg_filter: comn.arg_filter
+    :return: list of job tuples in file order
+    """
+    source = log_source.source_of(fn)
+    if pool is None or chunk_size is None or not source.is_plain_file() or source.size <= chunk_size or \
+            arg_window is not None or (arg_filter is not None and "peer" in arg_filter.patterns):
+        return [(fn, log_index, arg_index_data, arg_lazy, arg_window, arg_filter, 0, None, 0, 0, False)]
+    ranges = log_chunk_ranges(fn, chunk_size)
+    scans = pool.map(scan_log_chunk, [(fn, start, end) for start, end in ranges])
+    jobs = []
+    lineno = 0
+    instance = 0
+    in_router = False
+    for (start, end), (n_lines, starts_router, n_restarts) in zip(ranges, scans):
+        jobs.append((fn, log_index, arg_index_data, arg_lazy, arg_window, arg_filter,
+                     start, end, lineno, instance, in_router))
+        # replay the router instance accounting of parse_log_lines
+        lineno += n_lines
+        if n_restarts > 0:
+            if in_router or starts_router:
+                instance += 1
+            instance += n_restarts - 1
+            in_router = True
+        elif starts_router:
+            in_router = True
+    return jobs
+
+
+def parse_log_chunk_job(job):
+    """
+    Process pool entry point: parse a byte range of a log file with private name tables.
+    :param job: tuple from log_chunk_jobs
+    :return: tuple (list of Routers, the worker's Shorteners, count of skipped data lines,
+             the worker's LineFilter or None)
+    """
+    fn, log_index, arg_index_data, arg_lazy, arg_window, arg_filter, start, end, lineno, instance, in_router = job
+    comn = common.Common()
+    comn.arg_index_data = arg_index_data
+    comn.arg_lazy = arg_lazy
+    comn.arg_window = arg_window
+    # a job run in the caller's process counts into its own copy of the filter
+    comn.arg_filter = arg_filter.fresh_copy() if arg_filter is not None else None
+    comn.shorteners = nicknamer.Shorteners()
+    comn.data_skipped = 0
+    if arg_window is not None:
+        rtrs = parse_log_window(fn, log_index, comn)
+    else:
+        # a router in progress at the start of the range gets a stand-in with no restart record
+        rtr = router.Router(fn, log_index, instance) if in_router else None
+        rtrs = parse_log_lines(scan_log_lines(fn, start, end, lineno), fn, log_index, comn, instance, rtr)
+    return (rtrs, comn.shorteners, comn.data_skipped, comn.arg_filter)
+
+
+def adopt_parsed_routers(result, comn):
+    """
+    Bring the result of parse_log_chunk_job into the main common block.
+    Results must be adopted in log file order for the short name
+    numbering to match a serial parse.
+    :param result: tuple returned by parse_log_chunk_job
+    :param comn: main common block
+    :return: list of Routers
+    """
+    rtrs, worker_shorteners, data_skipped, worker_filter = result
+    remaps = comn.shorteners.merge(worker_shorteners)
+    comn.data_skipped += data_skipped
+    if worker_filter is not None:
+        for kind in worker_filter.kinds:
+            comn.arg_filter.skipped[kind] += worker_filter.skipped[kind]
+    for rtr in rtrs:
+        for plf in rtr.lines:
+            plf.adopt(comn, worker_shorteners, remaps)
+        for plf in rtr.router_ls:
+            plf.adopt(comn, worker_shorteners, remaps)
+        for plf in rtr.peer_opens:
+            plf.adopt(comn, worker_shorteners, remaps)
+    return rtrs
+
+
+def adopt_parsed_chunks(results, comn):
+    """
+    Bring the results of the parse_log_chunk_jobs for one log file into the
+    main common block and join routers that were split between chunks.
+    :param results: parse_log_chunk_job results in file order
+    :param comn: main common block
+    :return: list of Routers
+    """
+    rtrs = []
+    for result in results:
+        chunk_rtrs = adopt_parsed_routers(result, comn)
+        if len(chunk_rtrs) > 0 and chunk_rtrs[0].restart_rec is None:
+            # stand-in for the router that was running when the chunk began
+            part = chunk_rtrs.pop(0)
+            rtr = rtrs[-1]
+            for plf in part.lines:
+                plf.router = rtr
+            for plf in part.router_ls:
+                plf.router = rtr
+            for plf in part.peer_opens:
+                plf.router = rtr
+            rtr.lines.extend(part.lines)
+            rtr.router_ls.extend(part.router_ls)
+            rtr.peer_opens.extend(part.peer_opens)
+            if part.version is not None:
+                rtr.version = part.version
+            if part.mode is not None:
+                rtr.mode = part.mode
+        rtrs.extend(chunk_rtrs)
     return rtrs
 
 
@@ -945,7 +1908,21 @@ if __name__ == "__main__":
     routers = parse_log_file('test_data/A-two-instances.log', 0, comn2)
     if len(routers) != 2:
         print("ERROR: Expected two router instances in log file")
-
+    with open('test_data/A-two-instances.log', 'r') as f:
+        file_lines = f.readlines()
+    for rtr in routers:
+        for plf in rtr.lines + rtr.router_ls:
+            assert plf.read_line() == file_lines[plf.lineno - 1]
+    # the prefilter finds every line that a key or bracket test would
+    expect = []
+    offset = 0
+    for i, line in enumerate(file_lines):
+        if any(k in line for k in [KEY_CONTAINER_NAME, KEY_ROUTER_LS, KEY_VERSION, KEY_MODE, KEY_SERVER_TRACE]) or \
+                ("[" in line and "]" in line):
+            expect.append((i + 1, offset, line))
+        offset += len(line)
+    assert list(scan_log_lines('test_data/A-two-instances.log')) == expect
+    assert count_log_lines('test_data/A-two-instances.log', 0, offset) == len(file_lines)
     t_b4_0 = datetime.strptime('2018-10-15 10:57:32.151673', '%Y-%m-%d %H:%M:%S.%f')
     t_in_0 = datetime.strptime('2018-10-15 10:57:32.338183', '%Y-%m-%d %H:%M:%S.%f')
     t_in_1 = datetime.strptime('2018-10-15 10:59:07.584498', '%Y-%m-%d %H:%M:%S.%f')
@@ -959,5 +1936,114 @@ if __name__ == "__main__":
     assert rtr is routers[1] and idx == 1
     rtr, idx = router.which_router_tod(routers, t_af_1)
     assert rtr is routers[1] and idx == 1
+    index = router.RouterIndex([routers])
+    assert index.which_router_id_tod(routers[0].container_name, t_in_1) == (routers[1], 1)
+    assert index.which_router_id_tod(routers[0].container_name, t_b4_0) == (routers[0], 0)
+    assert index.which_router_id_tod("no such router", t_in_1) == (None, 0)
+
+    # nested types, symbol lists, and maps each take up several fields
+    dt = DescribedType()
+    dt.parse_dtype_line("@attach(18)", '[name="x", source=@source(40) [address="a", durable=0, '
+                                       'capabilities=@PN_SYMBOL[:"c1", :"c2"]], properties={:p="q", :r="s"}, handle=0]')
+    assert sorted(dt.dict.keys()) == ["handle", "name", "properties", "source"]
+    assert dt.dict["source"].dtype_name == "source"
+    assert dt.dict["source"].dict["capabilities"] == '@PN_SYMBOL[:"c1":"c2"]'
+    assert dt.dict["source"].dict["durable"] == "0"
+    assert dt.dict["properties"] == {":p": '"q"', ":r": '"s"'}
+    assert dt.dict["handle"] == "0"
+
+    # parsing the file in byte ranges gives the same routers and lines
+    import multiprocessing
+    def router_facts(rtrs):
+        return [(r.instance, r.container_name, r.version, r.mode, r.restart_rec.lineno,
+                 [(plf.lineno, plf.data.conn_id, plf.data.web_show_str, plf.router is r) for plf in r.lines])
+                for r in rtrs]
+    comn3 = common.Common()
+    comn3.shorteners = nicknamer.Shorteners()
+    serial = parse_log_file('test_data/A-two-instances.log', 0, comn3)
+    comn4 = common.Common()
+    comn4.shorteners = nicknamer.Shorteners()
+    pool = multiprocessing.Pool(2)
+    jobs = log_chunk_jobs('test_data/A-two-instances.log', 0, True, pool, 1000)
+    chunked = adopt_parsed_chunks(pool.map(parse_log_chunk_job, jobs), comn4)
+    pool.close()
+    pool.join()
+    assert len(jobs) > 2
+    assert router_facts(chunked) == router_facts(serial)
+    assert comn4.shorteners.short_link_names.longnames == comn3.shorteners.short_link_names.longnames
+
+    # a --start/--end window parses the routers and lines the whole file has there
+    def in_window(plf, window):
+        return (window[0] is None or plf.epoch_us >= window[0]) and (window[1] is None or plf.epoch_us < window[1])
+    whole = router_facts(serial)
+    t_0 = common.epoch_us_of(t_in_0)
+    t_1 = common.epoch_us_of(t_in_1)
+    for window in [(t_0, None), (None, t_0), (t_0 + 1000000, t_1 + 2037000), (t_1 + 2037000, t_1 + 2040000),
+                   (t_1 + 3000000, None), (t_0 - 10000000, t_0 - 1000000)]:
+        comn6 = common.Common()
+        comn6.shorteners = nicknamer.Shorteners()
+        comn6.arg_window = window
+        windowed = parse_log_file('test_data/A-two-instances.log', 0, comn6)
+        expect = [(r.instance, r.container_name, r.version, r.mode, r.restart_rec.lineno,
+                   [(plf.lineno, plf.data.conn_id, plf.data.web_show_str, plf.router is r)
+                    for plf in r.lines if in_window(plf, window)])
+                  for r in serial[:len(windowed)]]
+        assert router_facts(windowed) == expect, window
+
+    # parse time filters keep the lines the whole file has for what they select
+    peers = {}
+    for r in serial:
+        for plf in r.lines:
+            if plf.data.name == "open" and plf.data.direction_is_in():
+                peers[plf.data.conn_id] = plf.data.conn_peer.strip('"')
+    for kind, patterns, keep in [("connection", ["A1_2"], lambda plf: plf.data.conn_id == "A1_2"),
+                                 ("peer", ["central-qdr-b*"],
+                                  lambda plf: peers.get(plf.data.conn_id) == "central-qdr-blue"),
+                                 ("performative", ["begin", "end"], lambda plf: plf.data.name in ["begin", "end"]),
+                                 ("router", ["B"], lambda plf: False)]:
+        comn8 = common.Common()
+        comn8.shorteners = nicknamer.Shorteners()
+        comn8.arg_filter = LineFilter()
+        comn8.arg_filter.add(kind, patterns)
+        filtered = parse_log_file('test_data/A-two-instances.log', 0, comn8)
+        expect = router_facts(serial)
+        for facts, r in zip(expect, serial):
+            facts[5][:] = [fact for fact, plf in zip(facts[5], r.lines) if keep(plf)]
+        assert router_facts(filtered) == expect, kind
+        assert comn8.arg_filter.skipped[kind] == sum(len(r.lines) for r in serial) - \
+            sum(len(facts[5]) for facts in expect), kind
+
+    # a rotated set of compressed and plain files parses as the one file
+    import gzip
+    import shutil
+    import tempfile
+    tmp = tempfile.mkdtemp()
+    try:
+        with open('test_data/A-two-instances.log', 'rb') as f:
+            raw_lines = f.readlines()
+        older = os.path.join(tmp, "A.log.1.gz")
+        newer = os.path.join(tmp, "A.log")
+        with gzip.GzipFile(older, 'wb') as f:
+            f.write(b"".join(raw_lines[:60]))
+        with open(newer, 'wb') as f:
+            f.write(b"".join(raw_lines[60:]))
+        comn5 = common.Common()
+        comn5.shorteners = nicknamer.Shorteners()
+        rotated = parse_log_file(newer + "," + older, 0, comn5)
+        assert router_facts(rotated) == router_facts(serial)
+        for rtr in rotated:
+            for plf in rtr.lines:
+                assert plf.read_line() == file_lines[plf.lineno - 1]
+        for window in [(t_0 + 1000000, t_1 + 2037000), (None, t_0)]:
+            comn6 = common.Common()
+            comn6.shorteners = nicknamer.Shorteners()
+            comn6.arg_window = window
+            comn7 = common.Common()
+            comn7.shorteners = nicknamer.Shorteners()
+            comn7.arg_window = window
+            assert router_facts(parse_log_file(newer + "," + older, 0, comn7)) == \
+                router_facts(parse_log_file('test_data/A-two-instances.log', 0, comn6))
+    finally:
+        shutil.rmtree(tmp)
 
     pass
@@ -33,6 +33,7 @@ from __future__ import division
 from __future__ import absolute_import
 from __future__ import print_function
 
+import bisect
 import sys
 import traceback
 import datetime
@@ -46,10 +47,15 @@ class RestartRecord():
         self.router = _router
         self.line = _line
         self.lineno = _lineno
-        try:
-            self.datetime = datetime.datetime.strptime(self.line[:26], '%Y-%m-%d %H:%M:%S.%f')
-        except:
-            self.datetime = datetime.datetime(1970, 1, 1)
+        ts = common.parse_timestamp(self.line)
+        if ts is not None:
+            self.datetime, self.epoch_us = ts
+        else:
+            try:
+                self.datetime = datetime.datetime.strptime(self.line[:26], '%Y-%m-%d %H:%M:%S.%f')
+            except:
+                self.datetime = datetime.datetime(1970, 1, 1)
+            self.epoch_us = common.epoch_us_of(self.datetime)
 
     def __repr__(self):
         return "%d instance %d start %s #%d" % (self.router.log_index, self.router.instance,
@@ -93,6 +99,16 @@ class Router():
         # connection_to_frame_map
         self.conn_to_frame_map = {}
 
+        # transfers_by_name - transfer log lines by message
+        #   key= message short name from short_data_names
+        #   val= list of transfer ParsedLogLines in log order
+        self.transfers_by_name = {}
+
+        # attaches_by_name - attach log lines by link name
+        #   key= link short name from short_link_names
+        #   val= list of attach ParsedLogLines in log order
+        self.attaches_by_name = {}
+
         # conn_peer - peer container long name
         #   key= connection id '1', '2'
         #   val= original peer container name
@@ -117,6 +133,11 @@ class Router():
         # router_ls - link state 'ROUTER_LS (info)' lines
         self.router_ls = []
 
+        # peer_opens - inbound open lines left out by the parse time
+        # filters, kept so that the connections that are kept still
+        # find their peers
+        self.peer_opens = []
+
         # open and close times
         self.conn_open_time = {}   # first log line with [N] seen
         self.conn_close_time = {}  # last close log line seen
@@ -137,10 +158,11 @@ class Router():
         :param comn:
         :return:
         '''
+        conn_nums = set(self.conn_list)
         for item in self.lines:
             conn_num = int(item.data.conn_num)
             id = item.data.conn_id           # full name A0_3
-            if conn_num not in self.conn_list:
+            if conn_num not in conn_nums:
                 cdir = ""
                 if item.data.direction != "":
                     cdir = item.data.direction
@@ -150,6 +172,7 @@ class Router():
                     elif "Accepting" in item.data.web_show_str:
                         cdir = text.direction_in()
                 self.conn_list.append(conn_num)
+                conn_nums.add(conn_num)
                 self.conn_to_frame_map[id] = []
                 self.conn_dir[id] = cdir
                 self.conn_log_lines[id] = 0   # line counter
@@ -169,11 +192,30 @@ class Router():
                 self.conn_close_time[id] = item
             # connection log-line count
             self.conn_log_lines[id] += 1
-            # transfer byte count
+            # transfer byte count, transfer and attach indexes
             if item.data.name == "transfer":
                 self.conn_xfer_bytes[id] += int(item.data.transfer_size)
+                if not comn.arg_lazy:
+                    sname = item.transfer_short_name
+                    if sname not in self.transfers_by_name:
+                        self.transfers_by_name[sname] = []
+                    self.transfers_by_name[sname].append(item)
+            elif item.data.name == "attach" and not comn.arg_lazy:
+                lname = item.data.link_short_name
+                if lname not in self.attaches_by_name:
+                    self.attaches_by_name[lname] = []
+                self.attaches_by_name[lname].append(item)
+        # peers of the kept connections whose open was filtered out
+        for item in self.peer_opens:
+            id = item.data.conn_id
+            if id in self.conn_dir and id not in self.conn_peer:
+                self.conn_peer[id] = item.data.conn_peer
+                self.conn_peer_display[id] = comn.shorteners.short_peer_names.translate(
+                    item.data.conn_peer, True)
         self.conn_list = sorted(self.conn_list)
-        self.details = amqp_detail.AllDetails(self, comn)
+        # details need every line parsed in full
+        if not comn.arg_lazy:
+            self.details = amqp_detail.AllDetails(self, comn)
 
     def conn_id(self, conn_num):
         '''
@@ -187,35 +229,58 @@ class Router():
         return self.mode == "interior"
 
 
-def which_router_tod(router_list, at_time):
+def restart_times(router_list):
+    '''
+    :param router_list: a list of Router objects, one log file's instances in log order
+    :return: list of the restart datetimes of the second and later instances
+    '''
+    return [rtr.restart_rec.datetime for rtr in router_list[1:]]
+
+def which_router_tod(router_list, at_time, times=None):
     '''
     Find a router in a list based on time of day
     :param router_list: a list of Router objects
     :param at_time: the datetime record identifying the router
+    :param times: restart_times(router_list), if the caller keeps it
     :return: tuple: (a router from the list or None, router index)
     '''
     if len(router_list) == 0:
         return (None, 0)
     if len(router_list) == 1:
         return (router_list[0], 0)
-    for i in range(1, len(router_list)):
-        if at_time < router_list[i].restart_rec.datetime:
-            return (router_list[i-1], i-1)
-    return (router_list[-1], len(router_list)-1)
+    if times is None:
+        times = restart_times(router_list)
+    i = bisect.bisect_right(times, at_time)
+    return (router_list[i], i)
 
-def which_router_id_tod(routers, id, at_time):
+class RouterIndex():
     '''
-    Find a router by container_name and time of day
-    :param routers: a list of router instance lists
-    :param id: the container name
-    :param at_time: datetime of interest
-    :return: the router that had that container name at that time; None if not found
+    Router instance lists by container name, for finding
+    which instance of a router was running at a given time.
     '''
-    for routerlist in routers:
-        if routerlist[0].container_name == id:
-            return which_router_tod(routerlist, at_time)
-    return (None, 0)
-
+    def __init__(self, routers):
+        '''
+        :param routers: a list of router instance lists
+        '''
+        # key= container name
+        # val= (router instance list, restart_times of the list)
+        # The first list with a name wins.
+        self.by_name = {}
+        for routerlist in routers:
+            if len(routerlist) > 0 and routerlist[0].container_name not in self.by_name:
+                self.by_name[routerlist[0].container_name] = (routerlist, restart_times(routerlist))
+
+    def which_router_id_tod(self, id, at_time):
+        '''
+        Find a router by container_name and time of day
+        :param id: the container name
+        :param at_time: datetime of interest
+        :return: tuple: (the router that had that container name at that time or None, router index)
+        '''
+        entry = self.by_name.get(id)
+        if entry is None:
+            return (None, 0)
+        return which_router_tod(entry[0], at_time, entry[1])
 
 
 if __name__ == "__main__":
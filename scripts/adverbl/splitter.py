@@ -24,11 +24,16 @@ from __future__ import division
 from __future__ import absolute_import
 from __future__ import print_function
 
+import re
+import sys
 import traceback
 import test_data as td
 
 
 class Splitter():
+    # runs of ordinary characters, runs of commas, runs of spaces, and single double quotes
+    token_re = re.compile(r'[^", ]+|,+| +|"')
+
     @staticmethod
     def split(line):
         """
@@ -37,15 +42,20 @@ class Splitter():
          * split on ', ' and on ' '.
            strip trailing commas between fields.
          * quoted fields must have both quotes
+        A comma is held pending until the next character shows whether it is kept.
+        A second comma in a row, a double quote, and a space inside quotes keep it.
+        A space outside quotes that ends a field drops it.
         :param line:
         :return:
         """
+        if '"' not in line and ',,' not in line:
+            return Splitter.split_unquoted(line)
         result = []
         indqs = False
         pending_comma = False
         res = ""
-        for i in range(len(line)):
-            c = line[i]
+        for token in Splitter.token_re.findall(line):
+            c = token[0]
             if c == '\"':
                 if pending_comma:
                     res += ','
@@ -53,31 +63,62 @@ class Splitter():
                 indqs = not indqs
                 res += c
             elif c == ',':
-                if pending_comma:
-                    res += c
+                res += token if pending_comma else token[1:]
                 pending_comma = True
             elif c == ' ':
                 if indqs:
                     if pending_comma:
                         res += ','
                         pending_comma = False
-                    res += c
+                    res += token
                 else:
                     if res != '':
-                        if pending_comma:
-                            pending_comma = False
+                        pending_comma = False
                         result.append(res)
                         res = ''
             else:
-                res += c
+                res += token
         if res != '':
             result.append(str(res))
         if indqs:
             raise ValueError("SPLIT ODD QUOTES: %s", line)
-        # print ("SPLIT: line: %s" % line)
-        # print ("SPLIT: flds: %s" % result)
         return result
 
+    @staticmethod
+    def split_unquoted(line):
+        """
+        Split a line with no double quotes and no adjacent commas.
+        Fields are the text between spaces. The first comma in a field is dropped
+        unless a comma is already pending from a field that came out empty.
+        :param line:
+        :return:
+        """
+        result = []
+        pending_comma = False
+        for field in line.split(' '):
+            res = field if pending_comma else field.replace(',', '', 1)
+            if res != '':
+                # "" + res gives the same string type as building res one character at a time
+                result.append("" + res)
+                pending_comma = False
+            elif ',' in field:
+                pending_comma = True
+        if res != '':
+            # the last field did not end at a space
+            result[-1] = str(result[-1])
+        return result
+
+    @staticmethod
+    def as_field(text, last):
+        """
+        Give text the string type that split gives a field.
+        Fields are built up as text except the last field of a line, which is str.
+        :param text: field text
+        :param last: True if the field ends the line
+        :return:
+        """
+        return str(text) if last else "" + text
+
 
 if __name__ == "__main__":
 
@@ -92,3 +133,11 @@ if __name__ == "__main__":
     except:
         traceback.print_exc(file=sys.stdout)
         pass
+
+    # fields and their string types must match the original splitter
+    import bench_splitter
+    samples = bench_splitter.sample_bodies()
+    bad = bench_splitter.check(samples) + \
+          bench_splitter.check(bench_splitter.synthetic_corpus(samples, 2000, 1))
+    if bad > 0:
+        sys.exit("ERROR: %d lines split differently" % bad)
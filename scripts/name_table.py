@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Name interning table shared by adverb_name_shortener.py and adverbl's
+# nicknamer.py.
+#
+# Each distinct name is numbered in order of first appearance. Names are
+# found by a dict lookup, so filling a table with n names costs O(n).
+# A caller holding bulky names, such as message payloads, may look them
+# up by a digest and store something smaller in the table.
+
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+
+
+class NameTable():
+    '''
+    Names numbered in order of first appearance
+    '''
+    def __init__(self):
+        # the names, by number
+        self.names = []
+        # key=name or caller's digest, val=number
+        self.numbers = {}
+
+    def intern(self, name, key=None):
+        '''
+        Number a name, adding it to the table if it is new
+        :param name: the name to store
+        :param key: the lookup key if not the name itself, such as a digest of the full name
+        :return: the name's number
+        '''
+        if key is None:
+            key = name
+        idx = self.numbers.get(key)
+        if idx is None:
+            idx = len(self.names)
+            self.numbers[key] = idx
+            self.names.append(name)
+        return idx
+
+    def number(self, key):
+        '''
+        :param key: a name or key given to intern()
+        :return: its number, or None if it is not in the table
+        '''
+        return self.numbers.get(key)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, idx):
+        return self.names[idx]
+
+
+if __name__ == "__main__":
+    t = NameTable()
+    assert t.intern("a") == 0
+    assert t.intern("b") == 1
+    assert t.intern("a") == 0
+    assert t.intern("preview...", key="digest1") == 2
+    assert t.intern("other preview", key="digest1") == 2
+    assert t.number("b") == 1 and t.number("preview...") is None
+    assert len(t) == 3 and t[2] == "preview..."
+    assert t.names == ["a", "b", "preview..."]
+    print("OK")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# adverb.py benchmark
+#
+# For each trace size a synthetic pdml file is generated by pdml_gen.py
+# and adverb.py processes it in a fresh python process. The process
+# reports wall and cpu seconds for each adverb.py stage (parse, classify,
+# discover, render) and its peak RSS. One JSON record per size is
+# written so results from different commits can be compared:
+#
+#   bench-adverb.py --sizes 1000,10000,100000 --output before.json
+#   ...change adverb.py...
+#   bench-adverb.py --sizes 1000,10000,100000 --baseline before.json
+#
+# A 1M frame trace is about 1.7GB of pdml and adverb.py holds all of it
+# in memory. Use --sizes 1000000 only on a machine with room to spare.
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pdml_gen
+
+cwd = os.path.dirname(os.path.abspath(__file__))
+STAGES = ["parse", "classify", "discover", "render"]
+
+
+def cpu_seconds():
+    t = os.times()
+    return t[0] + t[1]
+
+
+def run_one(pdml_file, display_xfer):
+    '''
+    Run adverb.py main_except in this process with stage timers attached.
+    The html goes to /dev/null.
+    :return: dict of stage timings and peak RSS
+    '''
+    sys.path.append(os.path.dirname(cwd))
+    import adverb
+
+    stages = {}
+    current = [None, 0.0, 0.0]
+    def on_stage(name):
+        now_wall, now_cpu = time.time(), cpu_seconds()
+        if current[0] is not None:
+            stages[current[0]] = {"wall": now_wall - current[1], "cpu": now_cpu - current[2]}
+        current[:] = [name, now_wall, now_cpu]
+    adverb.stage_callback = on_stage
+
+    sys.argv = ["adverb.py", pdml_file, os.path.basename(pdml_file), "5672", "true" if display_xfer else "false"]
+    saved_stdout = sys.stdout
+    start = time.time()
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            adverb.main_except(sys.argv)
+        finally:
+            sys.stdout = saved_stdout
+    return {"stages": stages,
+            "total_wall": time.time() - start,
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def bench_size(frames, args, workdir):
+    '''
+    Generate a trace and measure adverb.py on it in a child process
+    :return: result record
+    '''
+    pdml_file = os.path.join(workdir, "bench-%d.pdml" % frames)
+    with open(pdml_file, "w") as f:
+        written = pdml_gen.PdmlGenerator(f, display_name=os.path.basename(pdml_file),
+                                         **pdml_gen.generator_kwargs(args)).generate(frames)
+    cmd = [sys.executable, os.path.abspath(__file__), "--run-one", pdml_file]
+    if args.no_xfer:
+        cmd.append("--no-xfer")
+    result = json.loads(subprocess.check_output(cmd))
+    record = {"frames": written,
+              "pdml_bytes": os.path.getsize(pdml_file),
+              "params": pdml_gen.generator_kwargs(args),
+              "display_xfer": not args.no_xfer,
+              "python": platform.python_version(),
+              "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    record.update(result)
+    if not args.keep:
+        os.remove(pdml_file)
+    return record
+
+
+def show(record, baseline=None):
+    '''
+    Print one result as a table row on stderr, with ratios to a baseline if given
+    '''
+    def ratio(now, then):
+        if baseline is None or not then:
+            return ""
+        return " (x%.2f)" % (now / then)
+    line = "%9d frames" % record["frames"]
+    for stage in STAGES:
+        wall = record["stages"].get(stage, {}).get("wall", 0.0)
+        then = baseline["stages"].get(stage, {}).get("wall") if baseline else None
+        line += "  %s %.3fs%s" % (stage, wall, ratio(wall, then))
+    line += "  total %.3fs%s" % (record["total_wall"],
+                                 ratio(record["total_wall"], baseline["total_wall"] if baseline else None))
+    line += "  rss %dMB%s" % (record["peak_rss_kb"] // 1024,
+                              ratio(float(record["peak_rss_kb"]), baseline["peak_rss_kb"] if baseline else None))
+    sys.stderr.write(line + "\n")
+
+
+def main(argv):
+    p = argparse.ArgumentParser(description="Benchmark adverb.py on synthetic pdml traces")
+    p.add_argument("--sizes", default="1000,10000,100000",
+                   help="comma separated trace sizes in frames (default 1000,10000,100000)")
+    p.add_argument("--output", help="append JSON result lines to this file instead of stdout")
+    p.add_argument("--baseline", help="JSON lines from an earlier run; show ratios against it")
+    p.add_argument("--no-xfer", action="store_true", help="run without displayXferCorrelation")
+    p.add_argument("--keep", action="store_true", help="keep the generated pdml files")
+    p.add_argument("--workdir", help="directory for the generated pdml (default: a temp directory)")
+    p.add_argument("--run-one", metavar="PDML", help=argparse.SUPPRESS)
+    pdml_gen.add_generator_args(p)
+    args = p.parse_args(argv[1:])
+
+    if args.run_one:
+        json.dump(run_one(args.run_one, not args.no_xfer), sys.stdout)
+        return 0
+
+    baselines = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    baselines[record["frames"]] = record
+
+    workdir = args.workdir or tempfile.mkdtemp()
+    out = open(args.output, "a") if args.output else sys.stdout
+    try:
+        for frames in [int(x) for x in args.sizes.split(",")]:
+            record = bench_size(frames, args, workdir)
+            show(record, baselines.get(record["frames"]))
+            out.write(json.dumps(record, sort_keys=True) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if not args.workdir and not args.keep:
+            shutil.rmtree(workdir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
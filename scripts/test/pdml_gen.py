@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Synthetic pdml trace generator.
+#
+# Writes the pdml that 'tshark -T pdml -Y amqp' would produce for a
+# number of clients talking to a broker on port 5672. Only the fields
+# adverb.py looks at are generated so the files are about a quarter the
+# size of real ones.
+#
+# Each connection opens its sessions and sender links, then transfers
+# are spread round-robin over every link of every connection. The broker
+# settles the transfers in batched dispositions and grants credit as it
+# runs low. When the frame budget is spent everything is torn down.
+
+import argparse
+import binascii
+import sys
+
+BROKER_HOST = "10.0.0.1"
+BROKER_PORT = 5672
+HEADER = '''<?xml version="1.0"?>
+<pdml version="0" creator="adverb/pdml_gen" time="synthetic" capture_file="%s">
+'''
+FOOTER = '''</pdml>
+'''
+
+
+def fld(name, showname, show, value=None, children=None, indent=4):
+    '''
+    :return: one pdml field element, with optional child field text
+    '''
+    pad = " " * indent
+    attrs = 'name="%s" showname="%s" show="%s"' % (name, showname, show)
+    if value is not None:
+        attrs += ' value="%s"' % value
+    if children:
+        return '%s<field %s>\n%s%s</field>\n' % (pad, attrs, children, pad)
+    return '%s<field %s/>\n' % (pad, attrs)
+
+
+def arg(name, showname, show, value=None, children=None):
+    return fld("amqp.performative.arguments." + name, showname, show, value, children, indent=6)
+
+
+def amqp_proto(channel, perf_name, perf_code, args):
+    '''
+    :param channel: AMQP channel number
+    :param perf_name: performative name
+    :param perf_code: performative descriptor code, 16..24
+    :param args: pre-rendered argument fields
+    :return: an amqp proto element
+    '''
+    return ('  <proto name="amqp" showname="Advanced Message Queueing Protocol">\n' +
+            fld("amqp.channel", "Channel: %d" % channel, channel, "%04x" % channel) +
+            fld("amqp.performative", "Performative: %s (%d)" % (perf_name, perf_code), perf_code, "%02x" % perf_code) +
+            fld("amqp.method.arguments", "Arguments", "", "", args) +
+            '  </proto>\n')
+
+
+def init_proto():
+    return ('  <proto name="amqp" showname="Advanced Message Queueing Protocol">\n' +
+            fld("amqp.init.protocol", "Protocol: AMQP", "AMQP", "414d5150") +
+            fld("amqp.init.id", "Protocol-ID: 0", "0", "00") +
+            fld("amqp.init.version_major", "Version Major: 1", "1", "01") +
+            fld("amqp.init.version_minor", "Version Minor: 0", "0", "00") +
+            fld("amqp.init.version_revision", "Version-Revision: 0", "0", "00") +
+            '  </proto>\n')
+
+
+def open_proto(container):
+    return amqp_proto(0, "open", 16, arg("containerId", "Container-Id: %s" % container, container))
+
+
+def close_proto():
+    return amqp_proto(0, "close", 24, "")
+
+
+def begin_proto(channel, remote=None):
+    args = ""
+    if remote is not None:
+        args += arg("remoteChannel", "Remote-Channel: %d" % remote, remote)
+    args += arg("nextOutgoingId", "Next-Outgoing-Id: 0", 0)
+    args += arg("incomingWindow", "Incoming-Window: 2147483647", 2147483647)
+    args += arg("outgoingWindow", "Outgoing-Window: 2147483647", 2147483647)
+    return amqp_proto(channel, "begin", 17, args)
+
+
+def end_proto(channel):
+    return amqp_proto(channel, "end", 23, "")
+
+
+def role_arg(is_receiver):
+    if is_receiver:
+        return arg("role", "Role: receiver", 1, "41")
+    return arg("role", "Role: sender", 0, "42")
+
+
+def attach_proto(channel, handle, name, is_receiver, address):
+    addr = fld("amqp.performative.arguments.address.string", "Address: %s" % address, address, indent=8)
+    args = (arg("name", "Name: %s" % name, name) +
+            arg("handle", "Handle: %d" % handle, handle) +
+            role_arg(is_receiver) +
+            arg("source", "Source", "", "") +
+            arg("target", "Target", "", "", addr))
+    return amqp_proto(channel, "attach", 18, args)
+
+
+def detach_proto(channel, handle):
+    args = (arg("handle", "Handle: %d" % handle, handle) +
+            arg("closed", "Closed: True", 1, "41"))
+    return amqp_proto(channel, "detach", 22, args)
+
+
+def flow_proto(channel, handle, delivery_count, credit):
+    args = (arg("handle", "Handle: %d" % handle, handle) +
+            arg("deliveryCount", "Delivery-Count: %d" % delivery_count, delivery_count) +
+            arg("linkCredit", "Link-Credit: %d" % credit, credit))
+    return amqp_proto(channel, "flow", 19, args)
+
+
+def transfer_proto(channel, handle, delivery_id, payload_hex):
+    args = (arg("handle", "Handle: %d" % handle, handle) +
+            arg("deliveryId", "Delivery-Id: %d" % delivery_id, delivery_id) +
+            arg("deliveryTag", "Delivery-Tag: %08x" % delivery_id, delivery_id, "%08x" % delivery_id) +
+            arg("settled", "Settled: False", 0, "42") +
+            arg("more", "More: False", 0, "42"))
+    return ('  <proto name="amqp" showname="Advanced Message Queueing Protocol">\n' +
+            fld("amqp.channel", "Channel: %d" % channel, channel, "%04x" % channel) +
+            fld("amqp.performative", "Performative: transfer (20)", 20, "14") +
+            fld("amqp.method.arguments", "Arguments", "", "", args) +
+            fld("amqp.value", "AMQP-Value: %s" % payload_hex, "", payload_hex) +
+            '  </proto>\n')
+
+
+def disposition_proto(channel, first, last):
+    args = (role_arg(True) +
+            arg("first", "First: %d" % first, first) +
+            arg("last", "Last: %d" % last, last) +
+            arg("settled", "Settled: True", 1, "41") +
+            fld("amqp.delivery-state.accepted", "Accepted (list of 0 elements)", "", "", indent=6))
+    return amqp_proto(channel, "disposition", 21, args)
+
+
+class Connection():
+    '''
+    One client connection to the broker and its protocol state
+    '''
+    def __init__(self, index, n_sessions, n_links):
+        self.host = "10.0.%d.%d" % (1 + index // 250, 2 + index % 250)
+        self.port = 40000 + index
+        self.index = index
+        # [session][link] -> [deliveries sent, credit remaining]
+        self.links = [[[0, 0] for l in range(n_links)] for s in range(n_sessions)]
+        # [session] -> next delivery id, first unsettled delivery id
+        self.next_delivery = [0] * n_sessions
+        self.unsettled_first = [0] * n_sessions
+
+
+class PdmlGenerator():
+    '''
+    Synthetic trace writer
+    '''
+    def __init__(self, out, connections=1, sessions=1, links=1, rate=1000.0,
+                 disposition_batch=1, payload_size=16, credit=100, display_name="synthetic.pcapng"):
+        '''
+        :param out: writable file for the pdml
+        :param connections: number of client connections
+        :param sessions: sessions per connection
+        :param links: sender links per session
+        :param rate: frames per second, sets frame.time_relative
+        :param disposition_batch: transfers settled by each disposition
+        :param payload_size: transfer payload bytes
+        :param credit: link credit granted per flow
+        '''
+        self.out = out
+        self.conns = [Connection(i, sessions, links) for i in range(connections)]
+        self.n_sessions = sessions
+        self.n_links = links
+        self.rate = float(rate)
+        self.disposition_batch = max(1, disposition_batch)
+        self.credit = credit
+        self.payload_size = payload_size
+        self.display_name = display_name
+        self.frame_num = 0
+
+    def packet(self, conn, to_broker, protos):
+        self.frame_num += 1
+        t = self.frame_num / self.rate
+        if to_broker:
+            src, sport, dst, dport = conn.host, conn.port, BROKER_HOST, BROKER_PORT
+        else:
+            src, sport, dst, dport = BROKER_HOST, BROKER_PORT, conn.host, conn.port
+        self.out.write('<packet>\n'
+                       '  <proto name="frame" showname="Frame %d">\n' % self.frame_num +
+                       fld("frame.number", "Frame Number: %d" % self.frame_num, self.frame_num) +
+                       fld("frame.time_relative", "Time since reference or first frame: %.9f seconds" % t, "%.9f" % t) +
+                       '  </proto>\n'
+                       '  <proto name="ip" showname="Internet Protocol Version 4, Src: %s, Dst: %s">\n' % (src, dst) +
+                       fld("ip.src", "Source: %s" % src, src) +
+                       fld("ip.dst", "Destination: %s" % dst, dst) +
+                       '  </proto>\n'
+                       '  <proto name="tcp" showname="Transmission Control Protocol, Src Port: %d, Dst Port: %d">\n' % (sport, dport) +
+                       fld("tcp.srcport", "Source Port: %d" % sport, sport) +
+                       fld("tcp.dstport", "Destination Port: %d" % dport, dport) +
+                       fld("tcp.stream", "Stream index: %d" % conn.index, conn.index) +
+                       '  </proto>\n' +
+                       ''.join(protos) +
+                       '</packet>\n')
+
+    def payload(self, conn, s, delivery_id):
+        '''
+        :return: hex text of a unique message body of payload_size bytes
+        '''
+        body = ("msg-%d-%d-%d " % (conn.index, s, delivery_id)).ljust(self.payload_size, "a")
+        return binascii.hexlify(body[:self.payload_size].encode("ascii")).decode("ascii")
+
+    def link_name(self, conn, s, l):
+        return "link-%d-%d-%d" % (conn.index, s, l)
+
+    def setup_frames(self):
+        '''
+        :return: number of frames written by setup() and teardown()
+        '''
+        per_session = 2 + 3 * self.n_links
+        setup = len(self.conns) * (4 + self.n_sessions * per_session)
+        teardown = len(self.conns) * (2 + self.n_sessions * (2 + 2 * self.n_links))
+        return setup + teardown
+
+    def setup(self):
+        for conn in self.conns:
+            self.packet(conn, True, [init_proto()])
+            self.packet(conn, False, [init_proto()])
+            self.packet(conn, True, [open_proto("client-%d" % conn.index)])
+            self.packet(conn, False, [open_proto("broker")])
+            for s in range(self.n_sessions):
+                self.packet(conn, True, [begin_proto(s)])
+                self.packet(conn, False, [begin_proto(s, s)])
+                for l in range(self.n_links):
+                    name = self.link_name(conn, s, l)
+                    self.packet(conn, True, [attach_proto(s, l, name, False, "q%d" % l)])
+                    self.packet(conn, False, [attach_proto(s, l, name, True, "q%d" % l)])
+                    self.packet(conn, False, [flow_proto(s, l, 0, self.credit)])
+                    conn.links[s][l][1] = self.credit
+
+    def transfer(self, conn, s, l):
+        '''
+        Send one transfer on a link. Settle and replenish credit as needed.
+        :return: frames written
+        '''
+        link = conn.links[s][l]
+        written = 0
+        if link[1] == 0:
+            self.packet(conn, False, [flow_proto(s, l, link[0], self.credit)])
+            link[1] = self.credit
+            written += 1
+        delivery_id = conn.next_delivery[s]
+        self.packet(conn, True, [transfer_proto(s, l, delivery_id, self.payload(conn, s, delivery_id))])
+        written += 1
+        conn.next_delivery[s] += 1
+        link[0] += 1
+        link[1] -= 1
+        if conn.next_delivery[s] - conn.unsettled_first[s] >= self.disposition_batch:
+            self.packet(conn, False, [disposition_proto(s, conn.unsettled_first[s], delivery_id)])
+            conn.unsettled_first[s] = conn.next_delivery[s]
+            written += 1
+        return written
+
+    def teardown(self):
+        for conn in self.conns:
+            for s in range(self.n_sessions):
+                for l in range(self.n_links):
+                    self.packet(conn, True, [detach_proto(s, l)])
+                    self.packet(conn, False, [detach_proto(s, l)])
+                self.packet(conn, True, [end_proto(s)])
+                self.packet(conn, False, [end_proto(s)])
+            self.packet(conn, True, [close_proto()])
+            self.packet(conn, False, [close_proto()])
+
+    def generate(self, frames):
+        '''
+        Write a complete trace of about 'frames' packets
+        :param frames: target number of packets
+        :return: the number of packets written
+        '''
+        self.out.write(HEADER % self.display_name)
+        self.setup()
+        budget = frames - self.setup_frames()
+        targets = [(conn, s, l) for conn in self.conns
+                   for s in range(self.n_sessions) for l in range(self.n_links)]
+        i = 0
+        while budget > 0:
+            conn, s, l = targets[i % len(targets)]
+            budget -= self.transfer(conn, s, l)
+            i += 1
+        self.teardown()
+        self.out.write(FOOTER)
+        return self.frame_num
+
+
+def add_generator_args(parser):
+    '''
+    Generator options shared with the benchmark runner
+    '''
+    parser.add_argument("--connections", type=int, default=4, help="client connections (default 4)")
+    parser.add_argument("--sessions", type=int, default=1, help="sessions per connection (default 1)")
+    parser.add_argument("--links", type=int, default=2, help="links per session (default 2)")
+    parser.add_argument("--rate", type=float, default=1000.0, help="frames per second of capture time (default 1000)")
+    parser.add_argument("--disposition-batch", type=int, default=1, help="transfers settled per disposition (default 1)")
+    parser.add_argument("--payload-size", type=int, default=16, help="transfer payload bytes (default 16)")
+    parser.add_argument("--credit", type=int, default=100, help="credit granted per flow (default 100)")
+
+
+def generator_kwargs(args):
+    return dict(connections=args.connections, sessions=args.sessions, links=args.links,
+                rate=args.rate, disposition_batch=args.disposition_batch,
+                payload_size=args.payload_size, credit=args.credit)
+
+
+def main(argv):
+    p = argparse.ArgumentParser(description="Write a synthetic AMQP pdml trace for adverb.py")
+    p.add_argument("output", help="pdml file to write, '-' for stdout")
+    p.add_argument("--frames", type=int, default=1000, help="approximate number of frames (default 1000)")
+    add_generator_args(p)
+    args = p.parse_args(argv[1:])
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    n = PdmlGenerator(out, display_name=args.output, **generator_kwargs(args)).generate(args.frames)
+    if out is not sys.stdout:
+        out.close()
+        sys.stderr.write("%s: %d frames\n" % (args.output, n))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -238,5 +238,93 @@ class AmqpProtoDecodeTest(unittest.TestCase):
                 proto = get_amqp_proto(self.packets[packet_i], proto_i)
 
 
+class AmqpDiscoverFrameTest(unittest.TestCase):
+    def setUp(self):
+        self.tree = ET.parse(os.path.abspath(os.path.join(cwd, "data/t1-amqp.pdml")))
+        self.packets = self.tree.getroot().findall("packet")
+        self.global_vars = GlobalVars()
+        adverb.process_port_args("5672", self.global_vars)
+
+    def tearDown(self):
+        adverb.frame_history_depth = None
+        self.tree = None
+        self.packets = None
+        self.global_vars = None
+
+    def discover(self):
+        cid = adverb.connection_id(self.packets[0], self.global_vars)
+        conn_details = adverb.ConnectionDetail(cid)
+        for packet in self.packets:
+            adverb.amqp_discover_frame(packet, conn_details, self.global_vars)
+        return conn_details
+
+    def test_00_unbounded_history(self):
+        conn_details = self.discover()
+        self.assertEqual(1, len(conn_details.session_list))
+        session = conn_details.session_list[0]
+        self.assertTrue(len(session.frame_list) > 3)
+        self.assertEqual(3, len(session.link_list))
+
+    def test_01_bounded_history(self):
+        unbounded = self.discover()
+        adverb.frame_history_depth = 3
+        bounded = self.discover()
+        self.assertEqual(3, len(bounded.session_list[0].frame_list))
+        self.assertEqual(unbounded.session_list[0].frame_list[-3:],
+                         list(bounded.session_list[0].frame_list))
+        for link in bounded.session_list[0].link_list:
+            self.assertTrue(len(link.frame_list) <= 3)
+        self.assertEqual(unbounded.GetLinkEventCount(), bounded.GetLinkEventCount())
+
+
+class CreditTimelineTest(unittest.TestCase):
+    def test_00_no_credit_granted(self):
+        tl = adverb.CreditTimeline([0, 0, 0], [0.0, 1.0, 2.0])
+        self.assertEqual(0.0, tl.time_with_credit)
+        self.assertEqual(0.0, tl.time_with_no_credit)
+        self.assertEqual(0, tl.stall_episodes)
+
+    def test_01_stalls(self):
+        credits = [0, 2, 1, 0, -1, 3, 2, 0]
+        times = [0.0, 1.0, 2.0, 3.0, 4.0, 6.0, 7.0, 10.0]
+        tl = adverb.CreditTimeline(credits, times)
+        self.assertAlmostEqual(6.0, tl.time_with_credit)
+        self.assertAlmostEqual(3.0, tl.time_with_no_credit)
+        self.assertEqual(2, tl.stall_episodes)
+        self.assertAlmostEqual(3.0, tl.longest_stall)
+
+    def test_02_typed_history(self):
+        link = adverb.LinkDetail(None, 0, "name", 0.0)
+        link.link_credit = 5
+        link.RecordCredit(0.5)
+        self.assertEqual(adverb.CREDIT_TYPECODE, link.link_credit_history.typecode)
+        self.assertEqual('d', link.link_credit_times.typecode)
+        self.assertEqual(5, link.link_credit_history[0])
+
+    def test_03_unlimited_credit(self):
+        # a flow granting the largest uint32 credit is recorded and summarized
+        tree = ET.parse(os.path.abspath(os.path.join(cwd, "data/t1-amqp.pdml")))
+        packets = tree.getroot().findall("packet")
+        for field in tree.getroot().iter("field"):
+            if field.get("name") == "amqp.performative.arguments.linkCredit":
+                field.set("show", "4294967295")
+        global_vars = GlobalVars()
+        adverb.process_port_args("5672", global_vars)
+        conn_details = adverb.ConnectionDetail(adverb.connection_id(packets[0], global_vars))
+        for packet in packets:
+            adverb.amqp_discover_frame(packet, conn_details, global_vars)
+        links = [link for link in conn_details.session_list[0].link_list
+                 if 4294967295 in link.link_credit_history]
+        self.assertTrue(len(links) > 0)
+        for link in links:
+            self.assertTrue(min(link.link_credit_history) >= 0)
+            tl = link.GetCreditTimeline()
+            self.assertEqual(0, tl.stall_episodes)
+            self.assertEqual(0.0, tl.time_with_no_credit)
+            self.assertEqual(0.0, tl.longest_stall)
+            self.assertAlmostEqual(link.link_credit_times[-1] - link.link_credit_times[
+                list(link.link_credit_history).index(4294967295)], tl.time_with_credit)
+
+
 if __name__ == "__main__":
     unittest.main()